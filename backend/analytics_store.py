@@ -0,0 +1,234 @@
+import math
+import threading
+from collections import Counter, deque
+from datetime import datetime
+from typing import Dict, Iterable, List, Tuple
+
+from answer_cache import normalize_query
+from db import connect, transaction
+
+
+class SpaceSaving:
+    """Space-Saving heavy-hitters summary over at most `capacity` items.
+
+    Counts are over-estimates by at most the item's `error`; any item seen
+    more than total/capacity times is guaranteed to be present.
+    """
+
+    def __init__(self, capacity: int = 200):
+        self.capacity = capacity
+        self.counts: Dict[str, int] = {}
+        self.errors: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self.counts)
+
+    def add(self, item: str, count: int = 1, error: int = 0) -> None:
+        if item in self.counts:
+            self.counts[item] += count
+            self.errors[item] += error
+            return
+        if len(self.counts) >= self.capacity:
+            # Replace the least frequent item; the newcomer inherits its count as error
+            evicted = min(self.counts, key=self.counts.get)
+            floor = self.counts.pop(evicted)
+            self.errors.pop(evicted)
+            count, error = count + floor, error + floor
+        self.counts[item] = count
+        self.errors[item] = error
+
+    def top(self, n: int) -> List[Tuple[str, int, int]]:
+        """(item, count, error) for the n most frequent items."""
+        items = sorted(self.counts, key=lambda item: (-self.counts[item], item))[:n]
+        return [(item, self.counts[item], self.errors[item]) for item in items]
+
+
+class LatencyHistogram:
+    """Log-bucketed latency histogram (buckets grow by `growth`, ~9% by default).
+
+    Bucket i counts observations in (base * growth**(i-1), base * growth**i]
+    seconds, so percentiles are accurate to within one bucket width.
+    """
+
+    def __init__(self, base: float = 0.001, growth: float = 2 ** 0.125):
+        self.base = base
+        self.growth = growth
+        self.buckets: Counter = Counter()
+
+    def bucket(self, seconds: float) -> int:
+        if seconds <= self.base:
+            return 0
+        return math.ceil(math.log(seconds / self.base, self.growth))
+
+    def upper_bound(self, bucket: int) -> float:
+        return self.base * self.growth ** bucket
+
+    def observe(self, seconds: float, count: int = 1) -> None:
+        self.buckets[self.bucket(seconds)] += count
+
+    def percentile(self, q: float) -> float:
+        """Upper bound of the bucket holding the q-quantile (0 with no data)."""
+        total = sum(self.buckets.values())
+        if not total:
+            return 0.0
+        rank = q * total
+        seen = 0
+        for bucket in sorted(self.buckets):
+            seen += self.buckets[bucket]
+            if seen >= rank:
+                return round(self.upper_bound(bucket), 4)
+        return round(self.upper_bound(max(self.buckets)), 4)
+
+
+class AnalyticsStore:
+    """Bounded query analytics, aggregated in memory and persisted to SQLite.
+
+    Each worker records queries into in-memory aggregates (a count, a latency
+    histogram, a Space-Saving sketch of normalised questions, per-document
+    counters and a ring buffer of recent questions) and `flush()` merges them
+    into the shared database, where every table has a fixed size bound: the
+    most cited documents are kept as a Space-Saving sketch too. The
+    server calls `flush()` periodically; `snapshot()` flushes first, so other
+    workers' queries show up within one flush interval.
+    """
+
+    def __init__(self, path: str, recent_size: int = 100, top_capacity: int = 200):
+        self.recent_size = recent_size
+        self.top_capacity = top_capacity
+        self._lock = threading.Lock()
+        self.conn = connect(path)
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS analytics_totals (
+                id INTEGER PRIMARY KEY CHECK (id = 0),
+                total_queries INTEGER NOT NULL,
+                total_response_time REAL NOT NULL
+            );
+            INSERT OR IGNORE INTO analytics_totals VALUES (0, 0, 0);
+            CREATE TABLE IF NOT EXISTS analytics_recent (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                query TEXT NOT NULL,
+                timestamp TEXT NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS analytics_top_questions (
+                query TEXT PRIMARY KEY,
+                count INTEGER NOT NULL,
+                error INTEGER NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS analytics_latency (
+                bucket INTEGER PRIMARY KEY,
+                count INTEGER NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS analytics_documents (
+                name TEXT PRIMARY KEY,
+                count INTEGER NOT NULL,
+                error INTEGER NOT NULL DEFAULT 0
+            );
+        """)
+        self._reset_pending()
+
+    def close(self) -> None:
+        self.flush()
+        self.conn.close()
+
+    def _reset_pending(self) -> None:
+        self._queries = 0
+        self._response_time = 0.0
+        self._recent: deque = deque(maxlen=self.recent_size)
+        self._top = SpaceSaving(self.top_capacity)
+        self._latency = LatencyHistogram()
+        self._documents: Counter = Counter()
+
+    # -- recording ---------------------------------------------------
+    def record_query(self, query: str, sources: Iterable[str], response_time: float) -> None:
+        """Count a query in memory; it reaches the database on the next flush()."""
+        with self._lock:
+            self._queries += 1
+            self._response_time += response_time
+            self._recent.append((query, datetime.now().isoformat()))
+            self._top.add(normalize_query(query))
+            self._latency.observe(response_time)
+            self._documents.update(sources)
+
+    def flush(self) -> None:
+        """Merge this worker's pending aggregates into the shared tables."""
+        with self._lock:
+            if not self._queries:
+                return
+            with transaction(self.conn):
+                self._write(self._queries, self._response_time, self._recent, self._top, self._latency, self._documents)
+            self._reset_pending()
+
+    def _write(self, queries: int, response_time: float, recent: Iterable[Tuple[str, str]],
+               top: SpaceSaving, latency: LatencyHistogram, documents: Counter) -> None:
+        """Add aggregates to the shared tables (inside the caller's transaction)."""
+        self.conn.execute(
+            "UPDATE analytics_totals SET total_queries = total_queries + ?,"
+            " total_response_time = total_response_time + ? WHERE id = 0",
+            (queries, response_time),
+        )
+        self.conn.executemany("INSERT INTO analytics_recent (query, timestamp) VALUES (?, ?)", recent)
+        self.conn.execute(
+            "DELETE FROM analytics_recent WHERE id <= (SELECT MAX(id) FROM analytics_recent) - ?",
+            (self.recent_size,),
+        )
+        self._merge_top(top)
+        self.conn.executemany(
+            "INSERT INTO analytics_latency (bucket, count) VALUES (?, ?)"
+            " ON CONFLICT(bucket) DO UPDATE SET count = count + excluded.count",
+            latency.buckets.items(),
+        )
+        self._merge_sketch("analytics_documents", "name", [(name, count, 0) for name, count in documents.most_common()])
+
+    def _merge_top(self, pending: SpaceSaving) -> None:
+        """Merge a local Space-Saving sketch into the persisted one (same capacity)."""
+        self._merge_sketch("analytics_top_questions", "query", pending.top(len(pending)))
+
+    def _merge_sketch(self, table: str, column: str, pending: Iterable[Tuple[str, int, int]]) -> None:
+        """Add (item, count, error) entries to a persisted Space-Saving sketch of top_capacity items."""
+        if not pending:
+            return
+        merged = SpaceSaving(self.top_capacity)
+        for item, count, error in self.conn.execute(f"SELECT {column}, count, error FROM {table}"):
+            merged.add(item, count, error)
+        for item, count, error in pending:
+            merged.add(item, count, error)
+        self.conn.execute(f"DELETE FROM {table}")
+        self.conn.executemany(
+            f"INSERT INTO {table} ({column}, count, error) VALUES (?, ?, ?)",
+            merged.top(len(merged)),
+        )
+
+    # -- reads -------------------------------------------------------
+    def total_queries(self) -> int:
+        """Persisted total plus this worker's queries not flushed yet."""
+        persisted = self.conn.execute("SELECT total_queries FROM analytics_totals WHERE id = 0").fetchone()[0]
+        return persisted + self._queries
+
+    def snapshot(self, top_n: int = 10) -> dict:
+        """Totals, latency percentiles, top and recent questions; bounded in size."""
+        self.flush()
+        total_queries, total_time = self.conn.execute(
+            "SELECT total_queries, total_response_time FROM analytics_totals WHERE id = 0"
+        ).fetchone()
+        latency = LatencyHistogram()
+        for bucket, count in self.conn.execute("SELECT bucket, count FROM analytics_latency"):
+            latency.buckets[bucket] = count
+        top = self.conn.execute(
+            "SELECT query, count, error FROM analytics_top_questions ORDER BY count DESC, query LIMIT ?", (top_n,)
+        ).fetchall()
+        recent = self.conn.execute(
+            "SELECT query, timestamp FROM analytics_recent ORDER BY id DESC LIMIT ?", (self.recent_size,)
+        ).fetchall()
+        documents = self.conn.execute("SELECT name, count FROM analytics_documents ORDER BY count DESC, name").fetchall()
+        return {
+            "total_queries": total_queries,
+            "avg_response_time": total_time / total_queries if total_queries else 0,
+            "latency": {
+                "p50": latency.percentile(0.50),
+                "p95": latency.percentile(0.95),
+                "p99": latency.percentile(0.99),
+            },
+            "top_questions": [{"query": query, "count": count, "error": error} for query, count, error in top],
+            "recent_questions": [{"query": query, "timestamp": timestamp} for query, timestamp in recent],
+            "documents_used": dict(documents),
+        }
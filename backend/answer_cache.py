@@ -0,0 +1,112 @@
+import hashlib
+import re
+import sys
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Optional, Set, Tuple
+
+
+def normalize_query(query: str) -> str:
+    """Lowercase, strip punctuation and collapse whitespace."""
+    return " ".join(re.sub(r"[^\w\s]", " ", query.lower()).split())
+
+
+class AnswerCache:
+    """LRU + TTL cache for /query answers, bounded by entry count and bytes.
+
+    Keys combine the normalised query, the response language, the exact set
+    of chunks retrieval returned and, for follow-ups, the conversation so
+    far. Entries also remember which documents they were built from, so
+    uploading or deleting a document can drop every answer that depended
+    on it.
+    """
+
+    def __init__(self, max_entries: int = 1024, max_bytes: int = 16 * 1024 * 1024, ttl: float = 3600.0):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        # key -> (expires_at, size, value, doc_ids)
+        self._entries: "OrderedDict[str, Tuple[float, int, Any, Set[str]]]" = OrderedDict()
+        self._by_doc: Dict[str, Set[str]] = {}
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def make_key(query: str, language: str, chunk_keys: Iterable[Tuple[str, int]], history: str = "") -> str:
+        chunks = ",".join(f"{doc_id}:{position}" for doc_id, position in sorted(chunk_keys))
+        raw = f"{normalize_query(query)}\x00{language}\x00{chunks}"
+        if history:
+            raw += f"\x00{history}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                self._drop(key)
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return entry[2]
+
+    def put(self, key: str, value: Any, doc_ids: Iterable[str]) -> None:
+        if key in self._entries:
+            self._drop(key)
+        size = sys.getsizeof(key) + _sizeof(value)
+        if size > self.max_bytes:
+            return
+        doc_ids = set(doc_ids)
+        self._entries[key] = (time.monotonic() + self.ttl, size, value, doc_ids)
+        self.bytes += size
+        for doc_id in doc_ids:
+            self._by_doc.setdefault(doc_id, set()).add(key)
+        while len(self._entries) > self.max_entries or self.bytes > self.max_bytes:
+            self._drop(next(iter(self._entries)))
+
+    def invalidate_document(self, doc_id: str) -> int:
+        """Drop every answer built from the given document."""
+        keys = self._by_doc.pop(doc_id, set())
+        for key in keys:
+            self._drop(key)
+        return len(keys)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._by_doc.clear()
+        self.bytes = 0
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "entries": len(self._entries),
+            "bytes": self.bytes,
+        }
+
+    def _drop(self, key: str) -> None:
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        self.bytes -= entry[1]
+        for doc_id in entry[3]:
+            keys = self._by_doc.get(doc_id)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._by_doc[doc_id]
+
+
+def _sizeof(value: Any) -> int:
+    """Rough deep size of the JSON-like values stored in the cache."""
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(_sizeof(k) + _sizeof(v) for k, v in value.items())
+    if isinstance(value, (list, tuple, set)):
+        return sys.getsizeof(value) + sum(_sizeof(v) for v in value)
+    return sys.getsizeof(value)
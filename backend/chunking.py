@@ -0,0 +1,209 @@
+import re
+from typing import List, Optional, Tuple
+
+try:
+    import tiktoken
+except ImportError:  # optional: fall back to an estimate
+    tiktoken = None
+
+
+# (start, end, text) of a finished chunk; offsets are into the full document
+Chunk = Tuple[int, int, str]
+
+# Unit boundaries per file type. A unit runs up to the end of its match.
+UNIT_BREAKS = {
+    "text": re.compile(r"[.!?][ \n]|\n\n"),
+    "markdown": re.compile(r"[.!?][ \n]|\n\n|\n(?=#{1,6} )"),
+    "csv": re.compile(r"\n"),
+}
+MARKDOWN_HEADING = re.compile(r"#{1,6} ")
+
+# Characters a break match needs to see after it (for the heading look-ahead)
+_LOOKAHEAD = 7
+
+_ESTIMATE_RE = re.compile(r"\w+|[^\w\s]")
+_encoding = None
+
+
+def count_tokens(text: str) -> int:
+    """Number of gpt-4o tokens in text (estimated if tiktoken is not installed)."""
+    global _encoding
+    if tiktoken is not None:
+        if _encoding is None:
+            _encoding = tiktoken.get_encoding("o200k_base")
+        return len(_encoding.encode(text, disallowed_special=()))
+    # Roughly one token per word or punctuation mark, plus one per extra 8 characters
+    return sum(1 + len(piece) // 8 for piece in _ESTIMATE_RE.findall(text))
+
+
+def span_text(text: str) -> str:
+    """Normalise a raw chunk span (newlines become spaces, outer whitespace dropped)."""
+    return text.replace("\n", " ").strip()
+
+
+def chunk_mode(filename: str) -> str:
+    """Pick the chunking mode for an uploaded file."""
+    if filename.endswith(".csv"):
+        return "csv"
+    if filename.endswith(".md"):
+        return "markdown"
+    return "text"
+
+
+class TokenChunker:
+    """Single-pass chunker that sizes chunks in model tokens.
+
+    Text is split into units (sentences or paragraphs; rows for CSV) and
+    units are packed into chunks of at most `max_tokens`. Each new chunk
+    repeats up to `overlap_tokens` worth of trailing units from the previous
+    one. In Markdown a heading always starts a new chunk (without overlap).
+
+    Text can be fed in arbitrary blocks (e.g. as an upload is read) and
+    chunks are returned as soon as they are complete, as (start, end, text)
+    character offsets into the whole document. Only the text of the chunk
+    being built is buffered; units with no break in sight are cut at
+    whitespace so the buffer stays bounded. A unit longer than `max_tokens`
+    (e.g. a wide CSV row) is cut at the last whitespace that keeps each
+    piece within it, so no chunk exceeds `max_tokens`.
+    """
+
+    def __init__(self, max_tokens: int = 256, overlap_tokens: int = 32, mode: str = "text"):
+        self.max_tokens = max_tokens
+        self.overlap_tokens = min(overlap_tokens, max_tokens // 2)
+        self.mode = mode
+        self._breaks = UNIT_BREAKS[mode]
+        self._max_unit_chars = max_tokens * 4
+
+        self._buffer = ""
+        self._buffer_start = 0     # absolute offset of _buffer[0]
+        self._scan_from = 0        # absolute offset to resume looking for breaks
+        self._unit_start = 0
+        # Units of the chunk being built: (start, end, tokens)
+        self._units: List[Tuple[int, int, int]] = []
+        self._tokens = 0
+        self._fresh = 0            # units added since the last emitted chunk
+
+    def feed(self, text: str) -> List[Chunk]:
+        """Add the next block of text and return any chunks it completed."""
+        self._buffer += text
+        return self._scan(final=False)
+
+    def finish(self) -> List[Chunk]:
+        """Flush the final unit and chunk."""
+        chunks = self._scan(final=True)
+        buffer_end = self._buffer_start + len(self._buffer)
+        if buffer_end > self._unit_start:
+            self._add_unit(self._unit_start, buffer_end, chunks)
+        if self._fresh:
+            self._emit(chunks, overlap=False)
+        return chunks
+
+    def _scan(self, final: bool) -> List[Chunk]:
+        chunks: List[Chunk] = []
+        # Units added below may trim self._buffer, so scan a fixed reference
+        buffer, base = self._buffer, self._buffer_start
+        buffer_end = base + len(buffer)
+        deferred: Optional[int] = None
+
+        for match in self._breaks.finditer(buffer, self._scan_from - base):
+            end = base + match.end()
+            if not final and end + _LOOKAHEAD > buffer_end:
+                # Not enough text yet to tell whether a heading follows
+                deferred = base + match.start()
+                break
+            self._split_long(end, chunks)
+            self._add_unit(self._unit_start, end, chunks)
+            if self.mode == "markdown" and MARKDOWN_HEADING.match(buffer, match.end()) and self._fresh:
+                self._emit(chunks, overlap=False)
+
+        self._split_long(deferred if deferred is not None else buffer_end, chunks)
+        # Breaks (and heading look-aheads) may be completed by the next block
+        self._scan_from = deferred if deferred is not None else max(self._unit_start, buffer_end - _LOOKAHEAD)
+        return chunks
+
+    def _split_long(self, limit: int, chunks: List[Chunk]) -> None:
+        """Cut the unit running up to `limit` while it is too long to keep buffering."""
+        while limit - self._unit_start > self._max_unit_chars:
+            end, tokens = self._cut(self._unit_start, self._unit_start + self._max_unit_chars)
+            self._pack(self._unit_start, end, tokens, chunks)
+
+    def _cut(self, start: int, end: int) -> Tuple[int, int]:
+        """End and token count of the longest piece of [start, end) that fits in max_tokens.
+
+        Pieces end at whitespace where there is any; the window shrinks in
+        proportion to the measured overshoot until the piece fits.
+        """
+        base = self._buffer_start
+        window = self._buffer[start - base:end - base]
+        while True:
+            cut = max(window.rfind(" "), window.rfind("\n"))
+            piece = window[:cut + 1] if cut > 0 else window
+            tokens = count_tokens(piece)
+            if tokens <= self.max_tokens or len(piece) == 1:
+                return start + len(piece), tokens
+            window = piece[:max(1, min(len(piece) - 1, len(piece) * self.max_tokens // tokens))]
+
+    def _add_unit(self, start: int, end: int, chunks: List[Chunk]) -> None:
+        base = self._buffer_start
+        tokens = count_tokens(self._buffer[start - base:end - base])
+        while tokens > self.max_tokens:
+            cut, cut_tokens = self._cut(start, end)
+            self._pack(start, cut, cut_tokens, chunks)
+            start, base = cut, self._buffer_start
+            tokens = count_tokens(self._buffer[start - base:end - base])
+        self._pack(start, end, tokens, chunks)
+
+    def _pack(self, start: int, end: int, tokens: int, chunks: List[Chunk]) -> None:
+        """Add a unit of at most max_tokens to the chunk being built."""
+        if self._tokens + tokens > self.max_tokens:
+            if self._fresh:
+                self._emit(chunks, overlap=True)
+            if self._tokens + tokens > self.max_tokens:
+                # The carried-over overlap does not fit next to this unit
+                self._units, self._tokens = [], 0
+        self._units.append((start, end, tokens))
+        self._tokens += tokens
+        self._fresh += 1
+        self._unit_start = end
+        self._trim()
+
+    def _emit(self, chunks: List[Chunk], overlap: bool) -> None:
+        base = self._buffer_start
+        start, end = self._units[0][0], self._units[-1][1]
+        text = span_text(self._buffer[start - base:end - base])
+        if text:
+            chunks.append((start, end, text))
+
+        kept: List[Tuple[int, int, int]] = []
+        kept_tokens = 0
+        if overlap:
+            for unit in reversed(self._units[1:]):
+                if kept_tokens + unit[2] > self.overlap_tokens:
+                    break
+                kept.insert(0, unit)
+                kept_tokens += unit[2]
+        self._units, self._tokens, self._fresh = kept, kept_tokens, 0
+        self._trim()
+
+    def _trim(self) -> None:
+        """Drop buffered text that no chunk can include any more."""
+        keep_from = self._units[0][0] if self._units else self._unit_start
+        if keep_from > self._buffer_start:
+            self._buffer = self._buffer[keep_from - self._buffer_start:]
+            self._buffer_start = keep_from
+
+
+def chunk_document(text: str, mode: str = "text", max_tokens: int = 256, overlap_tokens: int = 32) -> List[Chunk]:
+    """Chunk a whole document in one go; see TokenChunker."""
+    chunker = TokenChunker(max_tokens, overlap_tokens, mode)
+    return chunker.feed(text) + chunker.finish()
+
+
+def chunk_spans(text: str, mode: str = "text", max_tokens: int = 256, overlap_tokens: int = 32) -> List[Tuple[int, int]]:
+    """(start, end) character offsets of a document's chunks."""
+    return [(start, end) for start, end, _ in chunk_document(text, mode, max_tokens, overlap_tokens)]
+
+
+def chunk_text(text: str, mode: str = "text", max_tokens: int = 256, overlap_tokens: int = 32) -> List[str]:
+    """Split text into manageable chunks."""
+    return [chunk for _, _, chunk in chunk_document(text, mode, max_tokens, overlap_tokens)]
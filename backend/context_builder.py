@@ -0,0 +1,59 @@
+import re
+from typing import FrozenSet, List, Sequence, Tuple
+
+from chunking import count_tokens
+
+
+_WORD_RE = re.compile(r"\w+")
+
+# Separator placed between chunks in the prompt context
+CONTEXT_SEPARATOR = "\n\n---\n\n"
+
+
+def shingles(text: str, size: int = 3) -> FrozenSet[int]:
+    """Hashed word n-grams of a text, for near-duplicate detection."""
+    words = _WORD_RE.findall(text.lower())
+    if len(words) < size:
+        return frozenset([hash(tuple(words))]) if words else frozenset()
+    return frozenset(hash(tuple(words[i:i + size])) for i in range(len(words) - size + 1))
+
+
+def similarity(a: FrozenSet[int], b: FrozenSet[int]) -> float:
+    """Jaccard similarity of two shingle sets."""
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def format_chunk(chunk: dict) -> str:
+    return f"[Source: {chunk['doc_name']}]\n{chunk['chunk']}"
+
+
+def format_context(chunks: Sequence[dict]) -> str:
+    return CONTEXT_SEPARATOR.join(format_chunk(chunk) for chunk in chunks)
+
+
+def build_context(chunks: Sequence[dict], max_tokens: int, duplicate_threshold: float = 0.8) -> Tuple[List[dict], int]:
+    """Pick retrieved chunks, best first, until `max_tokens` of context are used.
+
+    Chunks that are near-duplicates (shingle Jaccard similarity of at least
+    `duplicate_threshold`) of an already picked chunk, e.g. from a file that
+    was uploaded twice, are dropped. Chunks that do not fit in the remaining
+    budget are skipped so smaller, lower-ranked ones can still be used; the
+    best chunk is always kept. Returns the picked chunks and their token count.
+    """
+    separator_tokens = count_tokens(CONTEXT_SEPARATOR)
+    selected: List[dict] = []
+    selected_shingles: List[FrozenSet[int]] = []
+    used = 0
+    for chunk in chunks:
+        chunk_shingles = shingles(chunk["chunk"])
+        if any(similarity(chunk_shingles, seen) >= duplicate_threshold for seen in selected_shingles):
+            continue
+        tokens = count_tokens(format_chunk(chunk)) + (separator_tokens if selected else 0)
+        if selected and used + tokens > max_tokens:
+            continue
+        selected.append(chunk)
+        selected_shingles.append(chunk_shingles)
+        used += tokens
+    return selected, used
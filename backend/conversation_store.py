@@ -0,0 +1,175 @@
+import json
+import re
+import threading
+import time
+from typing import List, Optional, Tuple
+
+from chunking import count_tokens
+from db import connect, transaction
+
+
+# (turn number, question, answer); numbers increase per session
+Turn = Tuple[int, str, str]
+
+_WORD_RE = re.compile(r"\w+")
+
+# Words that point back at an earlier turn ("what about it?", "and their deadline?")
+FOLLOW_UP_WORDS = frozenset((
+    "it", "its", "this", "that", "these", "those", "they", "them", "their",
+    "he", "him", "his", "she", "her", "same", "above", "else",
+))
+FOLLOW_UP_OPENERS = frozenset(("and", "but", "or", "also", "so", "then"))
+
+
+def is_follow_up(question: str, max_words: int = 6) -> bool:
+    """True for questions that need the previous turn to make sense.
+
+    A heuristic: short questions, ones opening with a conjunction ("and for
+    contractors?") and ones referring back with a pronoun count; longer
+    self-contained questions do not.
+    """
+    words = _WORD_RE.findall(question.lower())
+    if not words:
+        return False
+    return len(words) <= max_words or words[0] in FOLLOW_UP_OPENERS or any(word in FOLLOW_UP_WORDS for word in words)
+
+
+class Conversation:
+    """One session's memory: a rolling summary plus the turns not folded into it yet."""
+
+    def __init__(self, session_id: str, summary: str = "", turns: Optional[List[Turn]] = None,
+                 pending: Optional[List[Turn]] = None):
+        self.session_id = session_id
+        self.summary = summary
+        # Recent turns, kept verbatim, oldest first
+        self.turns = turns or []
+        # Older turns waiting to be folded into the summary (still used verbatim until then)
+        self.pending = pending or []
+
+    def __bool__(self) -> bool:
+        return bool(self.summary or self.turns or self.pending)
+
+    @property
+    def last_question(self) -> Optional[str]:
+        turns = self.pending + self.turns
+        return turns[-1][1] if turns else None
+
+    def fit(self, max_tokens: int) -> Tuple[str, List[Turn], int]:
+        """The summary and the newest turns that fit in `max_tokens`, and their token count.
+
+        Turns are dropped oldest first; the summary is kept if it fits at all.
+        """
+        used = count_tokens(self.summary) if self.summary else 0
+        summary = self.summary
+        if used > max_tokens:
+            summary, used = "", 0
+        turns: List[Turn] = []
+        for turn in reversed(self.pending + self.turns):
+            tokens = count_tokens(turn[1]) + count_tokens(turn[2])
+            if used + tokens > max_tokens:
+                break
+            turns.append(turn)
+            used += tokens
+        turns.reverse()
+        return summary, turns, used
+
+
+class ConversationStore:
+    """Per-session conversation memory in SQLite, shared by all workers.
+
+    Each session keeps its last `recent_turns` turns verbatim. Older turns
+    move to a pending list until a summarizer folds them into the session's
+    rolling summary (`fold`); at most `recent_turns` turns wait there, the
+    oldest are dropped beyond that. Sessions idle for `idle_ttl` seconds, and
+    the least recently used ones beyond `max_sessions`, are deleted, so the
+    table stays bounded.
+    """
+
+    def __init__(self, path: str, recent_turns: int = 4, max_sessions: int = 10000, idle_ttl: float = 86400.0):
+        self.recent_turns = recent_turns
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        self._lock = threading.Lock()
+        self.conn = connect(path)
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS conversations (
+                session_id TEXT PRIMARY KEY,
+                summary TEXT NOT NULL,
+                summarized_through INTEGER NOT NULL,
+                turns TEXT NOT NULL,
+                pending TEXT NOT NULL,
+                updated_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS conversations_updated_at ON conversations (updated_at);
+        """)
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def get(self, session_id: str) -> Conversation:
+        row = self.conn.execute(
+            "SELECT summary, turns, pending, updated_at FROM conversations WHERE session_id = ?", (session_id,)
+        ).fetchone()
+        if row is None or row[3] < time.time() - self.idle_ttl:
+            return Conversation(session_id)
+        return Conversation(session_id, row[0], _load_turns(row[1]), _load_turns(row[2]))
+
+    def append(self, session_id: str, question: str, answer: str) -> bool:
+        """Record a turn. Returns True if the session has turns waiting to be summarized."""
+        now = time.time()
+        with self._lock:
+            with transaction(self.conn):
+                row = self.conn.execute(
+                    "SELECT summary, summarized_through, turns, pending, updated_at FROM conversations WHERE session_id = ?",
+                    (session_id,),
+                ).fetchone()
+                if row is None or row[4] < now - self.idle_ttl:
+                    row = ("", 0, "[]", "[]", now)
+                summary, summarized_through, turns, pending = row[0], row[1], _load_turns(row[2]), _load_turns(row[3])
+                number = max([turn[0] for turn in pending + turns], default=summarized_through) + 1
+                turns.append((number, question, answer))
+                if len(turns) > self.recent_turns:
+                    pending.extend(turns[:-self.recent_turns])
+                    turns = turns[-self.recent_turns:]
+                    pending = pending[-self.recent_turns:]
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO conversations (session_id, summary, summarized_through, turns, pending, updated_at)"
+                    " VALUES (?, ?, ?, ?, ?, ?)",
+                    (session_id, summary, summarized_through, json.dumps(turns), json.dumps(pending), now),
+                )
+                self._evict(now)
+        return bool(pending)
+
+    def fold(self, session_id: str, summary: str, through: int) -> None:
+        """Replace the summary with one covering every turn up to number `through`.
+
+        Ignored if the session already has a summary at least that recent
+        (e.g. another worker summarized the same turns first).
+        """
+        with self._lock:
+            with transaction(self.conn):
+                row = self.conn.execute(
+                    "SELECT summarized_through, pending FROM conversations WHERE session_id = ?", (session_id,)
+                ).fetchone()
+                if row is not None and row[0] < through:
+                    pending = [turn for turn in _load_turns(row[1]) if turn[0] > through]
+                    self.conn.execute(
+                        "UPDATE conversations SET summary = ?, summarized_through = ?, pending = ? WHERE session_id = ?",
+                        (summary, through, json.dumps(pending), session_id),
+                    )
+
+    def _evict(self, now: float) -> None:
+        """Drop idle sessions, then the least recently used ones beyond max_sessions."""
+        self.conn.execute("DELETE FROM conversations WHERE updated_at < ?", (now - self.idle_ttl,))
+        self.conn.execute(
+            "DELETE FROM conversations WHERE session_id IN"
+            " (SELECT session_id FROM conversations ORDER BY updated_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_sessions,),
+        )
+
+    def __len__(self) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM conversations").fetchone()[0]
+
+
+def _load_turns(raw: str) -> List[Turn]:
+    return [tuple(turn) for turn in json.loads(raw)]
@@ -0,0 +1,31 @@
+import sqlite3
+from contextlib import contextmanager
+from typing import Iterator
+
+
+def connect(path: str) -> sqlite3.Connection:
+    """Open the shared SQLite database (WAL, autocommit) for use from any thread.
+
+    Every store opens its own connection with these settings; writers
+    serialise through `transaction()` and their own thread locks.
+    """
+    conn = sqlite3.connect(path, timeout=30, check_same_thread=False, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    return conn
+
+
+@contextmanager
+def transaction(conn: sqlite3.Connection) -> Iterator[sqlite3.Connection]:
+    """BEGIN IMMEDIATE ... COMMIT, rolled back if the block raises.
+
+    IMMEDIATE takes the write lock up front, so read-then-write blocks are
+    atomic across worker processes. The caller holds its own thread lock.
+    """
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        yield conn
+        conn.execute("COMMIT")
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
@@ -0,0 +1,202 @@
+import threading
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from chunking import span_text
+from db import connect, transaction
+from search_index import ChunkKey
+
+
+# Metadata columns kept in memory (documents_db); content stays on disk
+METADATA_COLUMNS = ("id", "name", "collection", "content_hash", "upload_date", "chunk_count", "size", "summary", "summary_key")
+
+
+class CollectionFull(Exception):
+    """A document does not fit within its collection's limits."""
+
+
+class DocumentStore:
+    """Durable SQLite (WAL) storage for document content and chunk offsets.
+
+    Each document's content is stored once; chunks are only (start, end)
+    character offsets into it (overlapping chunks may share characters), so
+    chunk text is never duplicated, can be loaded lazily for the handful of
+    chunks a query actually returns, and can be cited by position.
+
+    Every write also appends to a `changes` log in the same transaction.
+    Worker processes sharing the database tail that log (`changes_since`)
+    to keep their in-memory indexes in step with each other.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self.conn = connect(path)
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS documents (
+                id TEXT PRIMARY KEY,
+                name TEXT NOT NULL,
+                collection TEXT NOT NULL DEFAULT 'default',
+                content TEXT NOT NULL,
+                content_hash TEXT NOT NULL,
+                upload_date TEXT NOT NULL,
+                chunk_count INTEGER NOT NULL,
+                size INTEGER NOT NULL,
+                summary TEXT,
+                summary_key TEXT
+            );
+            CREATE TABLE IF NOT EXISTS chunks (
+                doc_id TEXT NOT NULL,
+                position INTEGER NOT NULL,
+                start INTEGER NOT NULL,
+                "end" INTEGER NOT NULL,
+                PRIMARY KEY (doc_id, position)
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS changes (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                op TEXT NOT NULL,
+                doc_id TEXT NOT NULL
+            );
+        """)
+
+    def close(self) -> None:
+        self.conn.close()
+
+    # -- writes ------------------------------------------------------
+    def add_document(self, doc: dict, content: str, spans: Sequence[Tuple[int, int]],
+                     max_documents: int = 0, max_chunks: int = 0, evict: bool = False) -> List[str]:
+        """Store a document and its chunk offsets in one transaction.
+
+        With `max_documents` or `max_chunks` set (0 means unlimited), the
+        document's collection is checked in the same transaction, so uploads
+        from several workers cannot overshoot it together. If it is full, its
+        oldest documents are deleted when `evict` is set; otherwise (or if the
+        document does not fit at all) CollectionFull is raised and nothing is
+        stored. Returns the IDs of evicted documents.
+        """
+        with self._lock:
+            with transaction(self.conn):
+                evicted = self._make_room(doc, max_documents, max_chunks, evict) if max_documents or max_chunks else []
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO documents (id, name, collection, content, content_hash, upload_date, chunk_count, size)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (doc["id"], doc["name"], doc.get("collection", "default"), content, doc["content_hash"],
+                     doc["upload_date"], doc["chunk_count"], doc["size"]),
+                )
+                self.conn.execute("DELETE FROM chunks WHERE doc_id = ?", (doc["id"],))
+                self.conn.executemany(
+                    'INSERT INTO chunks (doc_id, position, start, "end") VALUES (?, ?, ?, ?)',
+                    ((doc["id"], position, start, end) for position, (start, end) in enumerate(spans)),
+                )
+                self._log_change("add", doc["id"])
+        return evicted
+
+    def _make_room(self, doc: dict, max_documents: int, max_chunks: int, evict: bool) -> List[str]:
+        collection = doc.get("collection", "default")
+        chunk_count = doc["chunk_count"]
+        if max_chunks and chunk_count > max_chunks:
+            raise CollectionFull(f"Document has {chunk_count} chunks; collection '{collection}' holds at most {max_chunks}.")
+        existing = self.conn.execute(
+            "SELECT id, chunk_count FROM documents WHERE collection = ? AND id != ? ORDER BY upload_date, id",
+            (collection, doc["id"]),
+        ).fetchall()
+        documents = len(existing)
+        chunks = sum(count for _, count in existing)
+
+        def fits() -> bool:
+            return (
+                (not max_documents or documents + 1 <= max_documents)
+                and (not max_chunks or chunks + chunk_count <= max_chunks)
+            )
+
+        evicted = []
+        for doc_id, count in existing:
+            if fits():
+                break
+            if not evict:
+                raise CollectionFull(
+                    f"Collection '{collection}' is full ({documents} documents, {chunks} chunks). "
+                    "Delete documents or raise its limits."
+                )
+            self._delete(doc_id)
+            evicted.append(doc_id)
+            documents -= 1
+            chunks -= count
+        return evicted
+
+    def delete_document(self, doc_id: str) -> None:
+        with self._lock:
+            with transaction(self.conn):
+                self._delete(doc_id)
+
+    def _delete(self, doc_id: str) -> None:
+        self.conn.execute("DELETE FROM chunks WHERE doc_id = ?", (doc_id,))
+        self.conn.execute("DELETE FROM documents WHERE id = ?", (doc_id,))
+        self._log_change("delete", doc_id)
+
+    def set_summary(self, doc_id: str, summary: str, summary_key: str) -> None:
+        with self._lock:
+            with transaction(self.conn):
+                self.conn.execute("UPDATE documents SET summary = ?, summary_key = ? WHERE id = ?", (summary, summary_key, doc_id))
+                self._log_change("summary", doc_id)
+
+    def _log_change(self, op: str, doc_id: str) -> None:
+        self.conn.execute("INSERT INTO changes (op, doc_id) VALUES (?, ?)", (op, doc_id))
+
+    # -- change log --------------------------------------------------
+    def latest_change(self) -> int:
+        row = self.conn.execute("SELECT MAX(seq) FROM changes").fetchone()
+        return row[0] or 0
+
+    def changes_since(self, seq: int) -> List[Tuple[int, str, str]]:
+        """(seq, op, doc_id) for every change after `seq`, oldest first."""
+        return self.conn.execute(
+            "SELECT seq, op, doc_id FROM changes WHERE seq > ? ORDER BY seq", (seq,)
+        ).fetchall()
+
+    # -- reads -------------------------------------------------------
+    def iter_metadata(self) -> Iterator[dict]:
+        """Yield every document's metadata (no content) in upload order."""
+        columns = ", ".join(METADATA_COLUMNS)
+        rows = self.conn.execute(f"SELECT {columns} FROM documents ORDER BY upload_date, id").fetchall()
+        for row in rows:
+            yield dict(zip(METADATA_COLUMNS, row))
+
+    def get_metadata(self, doc_id: str) -> Optional[dict]:
+        columns = ", ".join(METADATA_COLUMNS)
+        row = self.conn.execute(f"SELECT {columns} FROM documents WHERE id = ?", (doc_id,)).fetchone()
+        return dict(zip(METADATA_COLUMNS, row)) if row else None
+
+    def get_content(self, doc_id: str) -> Optional[str]:
+        row = self.conn.execute("SELECT content FROM documents WHERE id = ?", (doc_id,)).fetchone()
+        return row[0] if row else None
+
+    def get_content_range(self, doc_id: str, start: int, end: int) -> Optional[Tuple[str, int]]:
+        """Characters [start, end) of a document's content and its total length."""
+        row = self.conn.execute(
+            "SELECT substr(content, ? + 1, ?), length(content) FROM documents WHERE id = ?",
+            (start, max(end - start, 0), doc_id),
+        ).fetchone()
+        return (row[0], row[1]) if row else None
+
+    def get_chunks(self, keys: Iterable[ChunkKey]) -> Dict[ChunkKey, Tuple[int, int, str]]:
+        """Load (start, end, text) of only the requested chunks, sliced out of the stored content."""
+        keys = list(keys)
+        if not keys:
+            return {}
+        placeholders = " OR ".join("(c.doc_id = ? AND c.position = ?)" for _ in keys)
+        params = [value for key in keys for value in key]
+        rows = self.conn.execute(
+            'SELECT c.doc_id, c.position, c.start, c."end", substr(d.content, c.start + 1, c."end" - c.start)'
+            " FROM chunks c JOIN documents d ON d.id = c.doc_id"
+            f" WHERE {placeholders}",
+            params,
+        ).fetchall()
+        return {(doc_id, position): (start, end, span_text(text)) for doc_id, position, start, end, text in rows}
+
+    def get_document_chunks(self, doc_id: str) -> List[str]:
+        """All chunk texts of one document, from stored offsets (no re-chunking)."""
+        content = self.get_content(doc_id) or ""
+        rows = self.conn.execute(
+            'SELECT start, "end" FROM chunks WHERE doc_id = ? ORDER BY position', (doc_id,)
+        ).fetchall()
+        return [span_text(content[start:end]) for start, end in rows]
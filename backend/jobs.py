@@ -0,0 +1,164 @@
+import asyncio
+import hashlib
+import os
+import threading
+import uuid
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Awaitable, Callable, Optional
+
+from chunking import TokenChunker, chunk_mode
+from db import connect
+from search_index import tokenize
+
+
+JOB_COLUMNS = ("id", "filename", "status", "progress", "stage", "document_id", "chunk_count", "error", "created_at", "updated_at")
+
+
+class JobStore:
+    """Ingestion job status in SQLite, so /jobs/{id} answers on every worker."""
+
+    def __init__(self, path: str):
+        self._lock = threading.Lock()
+        self.conn = connect(path)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                filename TEXT NOT NULL,
+                status TEXT NOT NULL,
+                progress REAL NOT NULL,
+                stage TEXT,
+                document_id TEXT,
+                chunk_count INTEGER,
+                error TEXT,
+                created_at TEXT NOT NULL,
+                updated_at TEXT NOT NULL
+            )
+        """)
+
+    def close(self) -> None:
+        self.conn.close()
+
+    def create(self, filename: str) -> str:
+        job_id = f"job_{uuid.uuid4().hex[:16]}"
+        now = datetime.now().isoformat()
+        with self._lock:
+            self.conn.execute(
+                "INSERT INTO jobs (id, filename, status, progress, stage, created_at, updated_at)"
+                " VALUES (?, ?, 'queued', 0, 'queued', ?, ?)",
+                (job_id, filename, now, now),
+            )
+        return job_id
+
+    def update(self, job_id: str, **fields) -> None:
+        fields["updated_at"] = datetime.now().isoformat()
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        with self._lock:
+            self.conn.execute(f"UPDATE jobs SET {assignments} WHERE id = ?", (*fields.values(), job_id))
+
+    def get(self, job_id: str) -> Optional[dict]:
+        columns = ", ".join(JOB_COLUMNS)
+        row = self.conn.execute(f"SELECT {columns} FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return dict(zip(JOB_COLUMNS, row)) if row else None
+
+
+def process_upload_file(path: str, mode: str = "text", max_tokens: int = 256, overlap_tokens: int = 32, embedder=None) -> dict:
+    """Decode, chunk, tokenize and optionally embed a saved upload.
+
+    Runs in a worker process, so it only uses its arguments and returns
+    plain data; the caller merges the result into the live indexes.
+    """
+    with open(path, "rb") as f:
+        raw = f.read()
+    text = raw.decode("utf-8")
+
+    chunker = TokenChunker(max_tokens, overlap_tokens, mode)
+    chunks = chunker.feed(text) + chunker.finish()
+    texts = [chunk for _, _, chunk in chunks]
+    return {
+        "text": text,
+        "size": len(raw),
+        "content_hash": hashlib.sha256(raw).hexdigest(),
+        "spans": [(start, end) for start, end, _ in chunks],
+        "chunks": texts,
+        "terms": [Counter(tokenize(chunk)) for chunk in texts],
+        "vectors": embedder.embed(texts) if embedder is not None and texts else None,
+    }
+
+
+# Called in the server process with (job_id, filename, saved path, process_upload_file result, collection)
+JobHandler = Callable[[str, str, str, dict, str], Awaitable[dict]]
+
+
+class IngestQueue:
+    """Bounded queue of upload jobs drained by a process pool.
+
+    `submit` fails fast with asyncio.QueueFull when the queue cannot take
+    more work, so callers can push back on clients instead of piling up.
+    """
+
+    def __init__(self, job_store: JobStore, handler: JobHandler, max_queued: int = 100, processes: int = 2,
+                 max_tokens: int = 256, overlap_tokens: int = 32):
+        self.job_store = job_store
+        self.handler = handler
+        self.processes = processes
+        self.max_tokens = max_tokens
+        self.overlap_tokens = overlap_tokens
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_queued)
+        self.pool: Optional[ProcessPoolExecutor] = None
+        self.embedder = None
+        self._consumers = []
+
+    def start(self, embedder=None) -> None:
+        """Start the process pool and one consumer task per process.
+
+        `embedder` is used inside the worker processes, so it must be
+        picklable; pass None to leave embedding to the handler.
+        """
+        self.embedder = embedder
+        self.pool = ProcessPoolExecutor(max_workers=self.processes)
+        self._consumers = [asyncio.create_task(self._consume()) for _ in range(self.processes)]
+
+    async def stop(self) -> None:
+        for task in self._consumers:
+            task.cancel()
+        await asyncio.gather(*self._consumers, return_exceptions=True)
+        if self.pool is not None:
+            self.pool.shutdown(wait=False, cancel_futures=True)
+
+    @property
+    def free_slots(self) -> int:
+        return self.queue.maxsize - self.queue.qsize()
+
+    def submit(self, job_id: str, filename: str, path: str, collection: str = "default") -> None:
+        self.queue.put_nowait((job_id, filename, path, collection))
+
+    async def _consume(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            job_id, filename, path, collection = await self.queue.get()
+            try:
+                self.job_store.update(job_id, status="processing", stage="chunking", progress=0.1)
+                result = await loop.run_in_executor(
+                    self.pool, process_upload_file,
+                    path, chunk_mode(filename), self.max_tokens, self.overlap_tokens, self.embedder,
+                )
+                self.job_store.update(job_id, stage="indexing", progress=0.6)
+                outcome = await self.handler(job_id, filename, path, result, collection)
+                self.job_store.update(job_id, status="done", stage="done", progress=1.0, **outcome)
+            except asyncio.CancelledError:
+                self._fail(job_id, path, "Server shutting down.", stage="cancelled")
+                raise
+            except UnicodeDecodeError:
+                self._fail(job_id, path, "File is not valid UTF-8 text.")
+            except Exception as e:
+                print(f"Ingestion job {job_id} failed: {e}")
+                self._fail(job_id, path, str(e))
+            finally:
+                self.queue.task_done()
+
+    def _fail(self, job_id: str, path: str, error: str, stage: str = "failed") -> None:
+        self.job_store.update(job_id, status="failed", stage=stage, error=error)
+        if os.path.exists(path):
+            os.remove(path)
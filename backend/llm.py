@@ -0,0 +1,120 @@
+import asyncio
+import random
+from typing import AsyncIterator, Optional
+
+import httpx
+import openai
+
+
+# Errors worth retrying: rate limits, server-side failures and transport problems
+RETRYABLE_ERRORS = (
+    openai.RateLimitError,
+    openai.InternalServerError,
+    openai.APITimeoutError,
+    openai.APIConnectionError,
+)
+
+
+class LLMClient:
+    """Non-blocking chat completions with a concurrency cap, timeouts and retries.
+
+    Wraps an `openai.AsyncOpenAI` client so gpt-4o round-trips no longer hold
+    the event loop. At most `max_concurrency` calls are in flight at once;
+    each attempt is bounded by `timeout` seconds, and rate-limit / 5xx /
+    connection errors are retried with full-jitter exponential backoff.
+    All calls share one pooled HTTP client, sized by `limits`.
+    """
+
+    def __init__(
+        self,
+        api_key: str,
+        base_url: Optional[str] = None,
+        max_concurrency: int = 8,
+        timeout: float = 60.0,
+        max_retries: int = 3,
+        backoff_base: float = 0.5,
+        backoff_max: float = 8.0,
+        limits: Optional[httpx.Limits] = None,
+    ):
+        # Retries are handled here so they respect the semaphore and jitter
+        self.client = openai.AsyncOpenAI(
+            api_key=api_key, base_url=base_url, max_retries=0, timeout=timeout,
+            http_client=openai.DefaultAsyncHttpxClient(limits=limits) if limits is not None else None,
+        )
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.max_concurrency = max_concurrency
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+    def _backoff(self, attempt: int, error: Exception) -> float:
+        """Seconds to wait before the next attempt, honouring Retry-After when sent."""
+        response = getattr(error, "response", None)
+        retry_after = response.headers.get("retry-after") if response is not None else None
+        if retry_after:
+            try:
+                return min(float(retry_after), self.backoff_max)
+            except ValueError:
+                pass
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    async def _wait_before_retry(self, attempt: int, error: Exception) -> int:
+        """Sleep before retrying, or re-raise once retries are exhausted."""
+        if attempt >= self.max_retries:
+            raise error
+        delay = self._backoff(attempt, error)
+        attempt += 1
+        print(f"OpenAI call failed ({type(error).__name__}), retry {attempt}/{self.max_retries} in {delay:.2f}s")
+        await asyncio.sleep(delay)
+        return attempt
+
+    async def chat(self, **kwargs):
+        """Create a chat completion, retrying transient failures."""
+        attempt = 0
+        while True:
+            try:
+                async with self._semaphore:
+                    return await self.client.chat.completions.create(timeout=self.timeout, **kwargs)
+            except RETRYABLE_ERRORS as e:
+                attempt = await self._wait_before_retry(attempt, e)
+
+    async def stream_chat(self, usage: Optional[dict] = None, **kwargs) -> AsyncIterator[str]:
+        """Yield completion text as it is generated.
+
+        Only opening the stream is retried; once tokens have been sent to the
+        caller a failure is raised as-is. The concurrency slot is held until
+        the stream is finished or abandoned. If `usage` is given, the API is
+        asked for token usage and the dict is filled in when the stream ends.
+        """
+        if usage is not None:
+            kwargs["stream_options"] = {"include_usage": True}
+        attempt = 0
+        while True:
+            await self._semaphore.acquire()
+            try:
+                stream = await self.client.chat.completions.create(stream=True, timeout=self.timeout, **kwargs)
+                break
+            except RETRYABLE_ERRORS as e:
+                self._semaphore.release()
+                attempt = await self._wait_before_retry(attempt, e)
+            except BaseException:
+                self._semaphore.release()
+                raise
+
+        try:
+            async for chunk in stream:
+                if usage is not None and chunk.usage is not None:
+                    usage.update(
+                        prompt_tokens=chunk.usage.prompt_tokens,
+                        completion_tokens=chunk.usage.completion_tokens,
+                        total_tokens=chunk.usage.total_tokens,
+                    )
+                if chunk.choices and chunk.choices[0].delta.content:
+                    yield chunk.choices[0].delta.content
+        finally:
+            self._semaphore.release()
+            await stream.response.aclose()
+
+    async def close(self) -> None:
+        await self.client.close()
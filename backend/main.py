@@ -1,13 +1,38 @@
-from fastapi import FastAPI, File, UploadFile, HTTPException
+from fastapi import FastAPI, File, Form, UploadFile, HTTPException, Header, Response
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, JSONResponse, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import List, Optional, Sequence, Tuple
+import asyncio
+import base64
+import bisect
+import codecs
+import hashlib
+import httpx
+import json
 import openai
 import os
+import time
+from collections import Counter
 from datetime import datetime
+from functools import partial
 from dotenv import load_dotenv
+import numpy as np
+from analytics_store import AnalyticsStore
+from answer_cache import AnswerCache
+from chunking import TokenChunker, chunk_mode, chunk_text, count_tokens
+from context_builder import build_context, format_context
+from conversation_store import ConversationStore, Turn, is_follow_up
+from document_store import CollectionFull, DocumentStore
+from jobs import IngestQueue, JobStore
+from llm import LLMClient
+from retrieval import SEARCH_BACKENDS, build_reranker, reciprocal_rank_fusion, run_stages
+from metrics import MetricsRegistry, StageTimer
+from search_index import tokenize
+from shards import DEFAULT_COLLECTION, CollectionLimits, ShardRegistry, parse_collection_limits, valid_collection_name
+from single_flight import SingleFlight
+from vector_store import HashingEmbedder, build_embedder
 load_dotenv()
 
 
@@ -24,117 +49,235 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Global OpenAI client
+# OpenAI settings, read once at import: request handlers and probes never touch os.environ
+OPENAI_KEY_VARS = ("OPENAI_API_KEY", "openai_api_key", "OPENAI_KEY", "openai_key")
+openai_api_key: Optional[str] = next(
+    (os.environ[name].strip() for name in OPENAI_KEY_VARS if os.environ.get(name, "").strip()), None
+)
+OPENAI_BASE_URL = os.environ.get("OPENAI_BASE_URL") or None
+LLM_MAX_CONCURRENCY = int(os.environ.get("LLM_MAX_CONCURRENCY", 8))
+LLM_TIMEOUT = float(os.environ.get("LLM_TIMEOUT", 60))
+LLM_MAX_RETRIES = int(os.environ.get("LLM_MAX_RETRIES", 3))
+
+# Connection pool shared by every OpenAI call of a worker (one pool for the async
+# chat client, one for the sync client that computes embeddings in threads)
+HTTP_LIMITS = httpx.Limits(
+    max_connections=int(os.environ.get("HTTP_MAX_CONNECTIONS", 32)),
+    max_keepalive_connections=int(os.environ.get("HTTP_MAX_KEEPALIVE_CONNECTIONS", 16)),
+    keepalive_expiry=float(os.environ.get("HTTP_KEEPALIVE_EXPIRY", 30)),
+)
+
+# Global OpenAI client (sync; used for embeddings)
 client: Optional[openai.OpenAI] = None
 
-# Initialize OpenAI client
 def get_openai_client() -> Optional[openai.OpenAI]:
-    """Get or create OpenAI client instance."""
-    # Try multiple possible environment variable names
-    openai_api_key = (
-        os.environ.get("OPENAI_API_KEY") or
-        os.environ.get("openai_api_key") or
-        os.environ.get("OPENAI_KEY") or
-        os.environ.get("openai_key")
-    )
-    
-    if not openai_api_key:
-        print("ERROR: OPENAI_API_KEY environment variable not found!")
-        print(f"Checking all env vars: {list(os.environ.keys())[:30]}")
-        return None
-    
-    # Check if key is not empty
-    openai_api_key = openai_api_key.strip()
-    if not openai_api_key:
-        print("ERROR: OPENAI_API_KEY is empty after stripping!")
-        return None
-    
-    # Validate key format (should start with sk-)
-    if not openai_api_key.startswith("sk-"):
-        print(f"WARNING: API key doesn't start with 'sk-'. Starts with: {openai_api_key[:5]}")
-        # Still try to use it, might be valid
-    
-    try:
-        # Check for proxy-related environment variables that might cause issues
-        # Remove them temporarily if they exist
-        proxy_vars = ['HTTP_PROXY', 'HTTPS_PROXY', 'http_proxy', 'https_proxy', 'ALL_PROXY', 'all_proxy']
-        original_proxy_values = {}
-        for var in proxy_vars:
-            if var in os.environ:
-                original_proxy_values[var] = os.environ[var]
-                # Temporarily remove to avoid proxy issues
-                del os.environ[var]
-        
-        # Initialize client with only the API key - no proxies or other parameters
-        # This avoids the 'proxies' keyword argument error
-        client_instance = openai.OpenAI(api_key=openai_api_key)
-        
-        # Restore proxy environment variables if they were set
-        for var, value in original_proxy_values.items():
-            os.environ[var] = value
-        
-        print(f"✓ OpenAI client initialized successfully. API key starts with: {openai_api_key[:10]}...")
-        return client_instance
-    except openai.OpenAIError as e:
-        print(f"ERROR: OpenAI API error during client initialization: {e}")
-        print(f"Error type: {type(e).__name__}")
-        import traceback
-        traceback.print_exc()
-        return None
-    except Exception as e:
-        print(f"ERROR: Failed to initialize OpenAI client: {e}")
-        print(f"Error type: {type(e).__name__}")
-        import traceback
-        traceback.print_exc()
-        return None
+    """Get or create the sync OpenAI client; None if no API key is configured."""
+    global client
+    if client is None and openai_api_key:
+        client = openai.OpenAI(
+            api_key=openai_api_key,
+            base_url=OPENAI_BASE_URL,
+            timeout=LLM_TIMEOUT,
+            http_client=openai.DefaultHttpxClient(limits=HTTP_LIMITS),
+        )
+    return client
+
+# Shared async client for chat completions (created lazily, see llm.py)
+llm: Optional[LLMClient] = None
+
+def get_llm_client() -> Optional[LLMClient]:
+    """Get or create the async LLM client used by /query and /summarize."""
+    global llm
+    if llm is None and openai_api_key:
+        llm = LLMClient(
+            api_key=openai_api_key,
+            base_url=OPENAI_BASE_URL,
+            max_concurrency=LLM_MAX_CONCURRENCY,
+            timeout=LLM_TIMEOUT,
+            max_retries=LLM_MAX_RETRIES,
+            limits=HTTP_LIMITS,
+        )
+        print(f"✓ Async LLM client ready (max concurrency: {llm.max_concurrency}, timeout: {llm.timeout}s)")
+    return llm
+
+# Set once warm_up() has restored documents and warmed the indexes; until then
+# /health/ready answers 503 and other requests wait for it
+warmup_task: Optional[asyncio.Task] = None
+PROBE_PATHS = ("/health/live", "/health/ready")
 
 @app.on_event("startup")
 async def startup_event():
-    """Log startup information and initialize OpenAI client."""
-    global client
+    """Start background work; documents and indexes are loaded by warm_up() without blocking startup."""
     print("=" * 50)
     print("Application Startup")
     print("=" * 50)
-    
-    # Check all environment variables
-    all_env_vars = dict(os.environ)
-    print(f"Total environment variables: {len(all_env_vars)}")
-    
-    # Look for OpenAI key in various possible names
-    openai_api_key = None
-    possible_keys = ["OPENAI_API_KEY", "openai_api_key", "OPENAI_KEY", "openai_key"]
-    
-    for key in possible_keys:
-        if key in all_env_vars:
-            openai_api_key = all_env_vars[key]
-            print(f"✓ Found API key as: {key}")
-            break
-    
     if openai_api_key:
-        print(f"✓ OPENAI_API_KEY found (length: {len(openai_api_key)}, starts with: {openai_api_key[:10]}...)")
-        print(f"✓ Key value preview: {openai_api_key[:20]}...{openai_api_key[-10:]}")
+        print("✓ OpenAI API key configured")
     else:
-        print("✗ OPENAI_API_KEY not found in environment variables")
-        print(f"Available env vars with 'OPENAI' or 'API': {[k for k in all_env_vars.keys() if 'OPENAI' in k.upper() or 'API' in k.upper()]}")
-        print(f"All env var keys (first 20): {list(all_env_vars.keys())[:20]}")
+        print(f"✗ No OpenAI API key found (looked for {', '.join(OPENAI_KEY_VARS)}); /query and /summarize will fail")
     
-    # Initialize client
-    client = get_openai_client()
+    # Start background ingestion; the hashing embedder is cheap to run in the worker processes
+    global ingest_queue
+    ingest_queue = IngestQueue(
+        job_store, finish_ingest_job,
+        max_queued=INGEST_QUEUE_SIZE, processes=INGEST_PROCESSES,
+        max_tokens=CHUNK_MAX_TOKENS, overlap_tokens=CHUNK_OVERLAP_TOKENS
+    )
+    ingest_queue.start(embedder if isinstance(embedder, HashingEmbedder) else None)
+    print(f"✓ Ingestion queue ready ({INGEST_PROCESSES} worker processes, {INGEST_QUEUE_SIZE} slots)")
     
-    if client:
-        print("✓ OpenAI client initialized successfully")
-    else:
-        print("✗ OpenAI client not initialized - will retry on first request")
+    global flush_task, warmup_task
+    flush_task = asyncio.create_task(flush_aggregates_periodically())
+    warmup_task = asyncio.create_task(warm_up())
     print("=" * 50)
 
-# In-memory storage (temporary; can be replaced by DB later)
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop background tasks and close the OpenAI clients and database connections."""
+    if warmup_task is not None and not warmup_task.done():
+        warmup_task.cancel()
+    if ingest_queue is not None:
+        await ingest_queue.stop()
+    if flush_task is not None:
+        flush_task.cancel()
+    for task in list(background_tasks):
+        task.cancel()
+    if llm is not None:
+        await llm.close()
+    if client is not None:
+        client.close()
+    document_store.close()
+    analytics_store.close()
+    conversation_store.close()
+    metrics.close()
+    job_store.close()
+
+# Durable document content and chunk offsets (SQLite, WAL mode)
+document_store = DocumentStore(os.environ.get("DOCUMENT_STORE_PATH", "documents.db"))
+
+# In-memory document metadata (no content; that stays in document_store)
 documents_db = {}
-analytics_db = {
-    "total_queries": 0,
-    "avg_response_time": 0,
-    "top_questions": [],
-    "documents_used": {}
-}
+
+# Last document_store change-log entry this worker has applied
+last_change_seq = 0
+# One sync at a time, so a change is never applied twice
+sync_lock = asyncio.Lock()
+
+# documents_db keys in listing order, as of the change-log entry they were built at
+document_order: Tuple[int, List[Tuple[str, str]]] = (-1, [])
+
+# /documents pagination and projection, and the most content one range request returns
+DOCUMENT_PAGE_SIZE = 100
+MAX_DOCUMENT_PAGE_SIZE = 1000
+DOCUMENT_FIELDS = ("id", "name", "collection", "size", "chunk_count", "upload_date", "has_summary", "content_hash", "summary")
+DEFAULT_DOCUMENT_FIELDS = ("id", "name", "collection", "size", "chunk_count", "upload_date", "has_summary")
+MAX_CONTENT_RANGE = 256 * 1024
+
+# Query analytics: aggregated in memory per worker, merged into the shared database every ANALYTICS_FLUSH_INTERVAL seconds
+analytics_store = AnalyticsStore(
+    document_store.path,
+    recent_size=int(os.environ.get("ANALYTICS_RECENT_QUERIES", 100)),
+    top_capacity=int(os.environ.get("ANALYTICS_TOP_CAPACITY", 200)),
+)
+ANALYTICS_FLUSH_INTERVAL = float(os.environ.get("ANALYTICS_FLUSH_INTERVAL", 5))
+flush_task: Optional[asyncio.Task] = None
+
+# Latency histograms for /metrics (merged across workers like the analytics), and
+# whether to also send per-stage timings to clients in a Server-Timing header
+metrics = MetricsRegistry(document_store.path)
+request_seconds = metrics.histogram("rag_http_request_seconds", "Time to produce a response (until headers), by route.", "route")
+query_stage_seconds = metrics.histogram("rag_query_stage_seconds", "Time spent in each /query stage.", "stage")
+upload_stage_seconds = metrics.histogram("rag_upload_stage_seconds", "Time spent in each /upload stage.", "stage")
+SERVER_TIMING = os.environ.get("SERVER_TIMING", "false").lower() in ("1", "true", "yes")
+
+# Background ingestion: job status is shared, the queue and process pool are per worker
+job_store = JobStore(document_store.path)
+ingest_queue: Optional[IngestQueue] = None
+INGEST_QUEUE_SIZE = int(os.environ.get("INGEST_QUEUE_SIZE", 100))
+INGEST_PROCESSES = int(os.environ.get("INGEST_PROCESSES", 2))
+
+# Embedder for the vector store: "hashing" (offline feature hashing) or "openai"
+EMBEDDER = os.environ.get("EMBEDDER", "hashing").lower()
+
+# Retrieval backend: "bm25" (inverted index), "vector" (embedding store) or
+# "hybrid" (both in parallel, fused with reciprocal-rank fusion). Hybrid is the
+# default only with a learned embedder; hashed vectors mostly add noise to BM25.
+SEARCH_BACKEND = os.environ.get("SEARCH_BACKEND", "hybrid" if EMBEDDER == "openai" else "bm25").lower()
+if SEARCH_BACKEND not in SEARCH_BACKENDS:
+    raise ValueError(f"Unknown SEARCH_BACKEND '{SEARCH_BACKEND}'. Use one of: {', '.join(SEARCH_BACKENDS)}.")
+RETRIEVAL_CANDIDATES = int(os.environ.get("RETRIEVAL_CANDIDATES", 50))
+RETRIEVAL_BUDGET = float(os.environ.get("RETRIEVAL_BUDGET_MS", 250)) / 1000
+RRF_K = int(os.environ.get("RRF_K", 60))
+
+# Optional CPU re-ranker over the fused top RERANK_CANDIDATES: "none", "overlap" or "cross-encoder"
+reranker = build_reranker(os.environ.get("RERANKER", "none").lower(), os.environ.get("RERANKER_MODEL"))
+RERANK_CANDIDATES = int(os.environ.get("RERANK_CANDIDATES", 20))
+RERANK_BUDGET = float(os.environ.get("RERANK_BUDGET_MS", 300)) / 1000
+
+# One index shard per collection: an inverted index over its chunks, kept in sync
+# with documents_db, and an embedding index memory-mapped from disk so restarts
+# don't re-embed. Queries only search the collections they name.
+embedder = build_embedder(EMBEDDER, get_openai_client)
+default_collection_limits = CollectionLimits(
+    max_documents=int(os.environ.get("COLLECTION_MAX_DOCUMENTS", 0)),
+    max_chunks=int(os.environ.get("COLLECTION_MAX_CHUNKS", 0)),
+    eviction=os.environ.get("COLLECTION_EVICTION", "reject").lower(),
+)
+shards = ShardRegistry(
+    os.environ.get("VECTOR_INDEX_DIR", "index"),
+    embedder,
+    limits=parse_collection_limits(os.environ.get("COLLECTION_LIMITS", ""), default_collection_limits),
+    default_limits=default_collection_limits,
+)
+
+# Cached /query answers, keyed on normalized query, language and retrieved chunks
+answer_cache = AnswerCache(
+    max_entries=int(os.environ.get("ANSWER_CACHE_MAX_ENTRIES", 1024)),
+    max_bytes=int(float(os.environ.get("ANSWER_CACHE_SIZE_MB", 16)) * 1024 * 1024),
+    ttl=float(os.environ.get("ANSWER_CACHE_TTL", 3600)),
+)
+
+# Identical /query and /summarize calls already in flight share one gpt-4o call
+# (per worker; keyed like the answer cache, and on document content for summaries)
+query_flights = SingleFlight("query")
+summary_flights = SingleFlight("summarize")
+
+# Conversation memory per session_id: the last CONVERSATION_RECENT_TURNS turns verbatim,
+# older ones folded into a rolling summary in the background; idle and least
+# recently used sessions are dropped. HISTORY_MAX_TOKENS of it go into each prompt.
+conversation_store = ConversationStore(
+    document_store.path,
+    recent_turns=int(os.environ.get("CONVERSATION_RECENT_TURNS", 4)),
+    max_sessions=int(os.environ.get("CONVERSATION_MAX_SESSIONS", 10000)),
+    idle_ttl=float(os.environ.get("CONVERSATION_IDLE_TTL", 86400)),
+)
+HISTORY_MAX_TOKENS = int(os.environ.get("HISTORY_MAX_TOKENS", 1000))
+# Questions of at most this many words are treated as follow-ups to the previous turn
+FOLLOW_UP_MAX_WORDS = int(os.environ.get("FOLLOW_UP_MAX_WORDS", 6))
+CONVERSATION_SUMMARY_TOKENS = int(os.environ.get("CONVERSATION_SUMMARY_TOKENS", 300))
+conversation_flights = SingleFlight("conversation-summary")
+background_tasks: set = set()
+
+# Chunk size and overlap between neighbouring chunks, in model tokens
+CHUNK_MAX_TOKENS = int(os.environ.get("CHUNK_MAX_TOKENS", 256))
+CHUNK_OVERLAP_TOKENS = int(os.environ.get("CHUNK_OVERLAP_TOKENS", 32))
+
+# /query context: chunks retrieved, prompt tokens they may fill, and the
+# shingle similarity above which a chunk counts as a near-duplicate
+QUERY_CANDIDATES = int(os.environ.get("QUERY_CANDIDATES", 10))
+CONTEXT_MAX_TOKENS = int(os.environ.get("CONTEXT_MAX_TOKENS", 3000))
+CONTEXT_DUPLICATE_THRESHOLD = float(os.environ.get("CONTEXT_DUPLICATE_THRESHOLD", 0.8))
+
+# Uploads are streamed in blocks of this size and rejected above MAX_UPLOAD_MB
+UPLOAD_BLOCK_SIZE = 64 * 1024
+MAX_UPLOAD_BYTES = int(float(os.environ.get("MAX_UPLOAD_MB", 50)) * 1024 * 1024)
+# Room for the multipart boundaries and form fields around the file itself
+UPLOAD_FORM_OVERHEAD = 64 * 1024
+
+# Summaries: characters sent per gpt-4o call, and documents summarized at once by /summarize/batch
+SUMMARY_SECTION_CHARS = 8000
+SUMMARY_MODES = ("auto", "truncate")
+SUMMARY_BATCH_CONCURRENCY = int(os.environ.get("SUMMARY_BATCH_CONCURRENCY", 4))
 
 # -----------------------------
 # 📘 Pydantic Models
@@ -143,218 +286,980 @@ class QueryRequest(BaseModel):
     query: str
     language: str = "en"
     session_id: str
+    collections: List[str] = [DEFAULT_COLLECTION]
+
+class Citation(BaseModel):
+    doc_id: str
+    doc_name: str
+    position: int
+    start: int
+    end: int
+
+class TokenUsage(BaseModel):
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    total_tokens: int = 0
+    context_tokens: int = 0
+    history_tokens: int = 0
 
 class QueryResponse(BaseModel):
     response: str
     sources: List[str]
     response_time: float
+    citations: List[Citation] = []
+    usage: TokenUsage = TokenUsage()
 
 class SummaryRequest(BaseModel):
     document_id: str
+    mode: str = "auto"
+
+class BatchSummaryRequest(BaseModel):
+    document_ids: List[str]
+    mode: str = "auto"
 
 
 # -----------------------------
 # 🧠 Helper Functions
 # -----------------------------
-def chunk_text(text: str, chunk_size: int = 1000) -> List[str]:
-    """Split text into manageable chunks."""
-    sentences = text.replace('\n', ' ').split('. ')
-    chunks = []
-    current_chunk = ""
-    
-    for sentence in sentences:
-        if len(current_chunk) + len(sentence) > chunk_size and current_chunk:
-            chunks.append(current_chunk.strip())
-            current_chunk = sentence
-        else:
-            current_chunk += sentence + ". "
-    
-    if current_chunk:
-        chunks.append(current_chunk.strip())
-    
-    return chunks
-
-
-def semantic_search(query: str, documents: dict, top_k: int = 5) -> List[dict]:
-    """Simple keyword-based search (replace with embeddings later)."""
-    query_words = set(query.lower().split())
-    all_chunks = []
-    
-    for doc_id, doc in documents.items():
-        for chunk in doc["chunks"]:
-            chunk_words = set(chunk.lower().split())
-            score = len(query_words.intersection(chunk_words))
-            if score > 0:
-                all_chunks.append({
-                    "chunk": chunk,
-                    "doc_name": doc["name"],
-                    "doc_id": doc_id,
-                    "score": score
-                })
-    
-    all_chunks.sort(key=lambda x: x["score"], reverse=True)
-    return all_chunks[:top_k]
+async def semantic_search(query: str, documents: dict, top_k: int = 5, timer: Optional[StageTimer] = None,
+                          collections: Sequence[str] = (DEFAULT_COLLECTION,)) -> List[dict]:
+    """Retrieve the top_k chunks from the given collections with the configured
+    backend (BM25, embeddings or hybrid).
+    
+    Only the collections' own shards are searched. Every candidate stage
+    (backend x shard) runs in a worker thread, in parallel, within
+    RETRIEVAL_BUDGET; a stage that overruns is left out (best effort).
+    Several rankings are merged with reciprocal-rank fusion, then optionally
+    re-ordered by the re-ranker within RERANK_BUDGET. Only the returned
+    chunks' text is loaded from the store.
+    """
+    candidates = max(top_k, RETRIEVAL_CANDIDATES)
+    stages = {}
+    for shard in filter(None, map(shards.find, collections)):
+        if SEARCH_BACKEND in ("bm25", "hybrid"):
+            stages[f"lexical:{shard.name}"] = partial(shard.index.search, query, top_k=candidates)
+        if SEARCH_BACKEND in ("vector", "hybrid"):
+            stages[f"vector:{shard.name}"] = partial(shard.vectors.search, query, top_k=candidates)
+    stage_hits, stage_durations = await run_stages(stages, RETRIEVAL_BUDGET)
+    
+    # Shards run in parallel, so a backend takes as long as its slowest shard
+    durations = {}
+    for name, seconds in stage_durations.items():
+        backend = name.split(":", 1)[0]
+        durations[backend] = max(durations.get(backend, 0.0), seconds)
+    
+    fusion_start = time.perf_counter()
+    rankings = [[(key, score) for key, score in stage_hits[name] if key[0] in documents] for name in stages if name in stage_hits]
+    if len(rankings) <= 1:
+        hits = rankings[0] if rankings else []
+    else:
+        hits = reciprocal_rank_fusion([[key for key, _ in ranking] for ranking in rankings], k=RRF_K)
+    durations["fusion"] = time.perf_counter() - fusion_start
+    
+    if reranker is not None and len(hits) > 1:
+        hits = hits[:RERANK_CANDIDATES]
+        texts = document_store.get_chunks(key for key, _ in hits)
+        hits = [(key, score) for key, score in hits if key in texts]
+        rerank_start = time.perf_counter()
+        try:
+            scores = await asyncio.wait_for(
+                asyncio.to_thread(reranker.score, query, [texts[key][2] for key, _ in hits]),
+                timeout=RERANK_BUDGET
+            )
+            hits = sorted(((key, round(score, 4)) for (key, _), score in zip(hits, scores)), key=lambda hit: -hit[1])
+        except asyncio.TimeoutError:
+            print(f"Re-ranking exceeded its {RERANK_BUDGET * 1000:.0f} ms budget; keeping the fused order")
+        except Exception as e:
+            print(f"WARNING: Re-ranking failed, keeping the fused order: {e}")
+        durations["rerank"] = time.perf_counter() - rerank_start
+        hits = hits[:top_k]
+    else:
+        hits = hits[:top_k]
+        texts = document_store.get_chunks(key for key, _ in hits)
+    
+    if timer is not None:
+        for name, seconds in durations.items():
+            timer.add(name, seconds)
+    
+    results = []
+    for (doc_id, position), score in hits:
+        if (doc_id, position) not in texts:
+            continue
+        start, end, chunk = texts[(doc_id, position)]
+        results.append({
+            "chunk": chunk,
+            "doc_name": documents[doc_id]["name"],
+            "doc_id": doc_id,
+            "position": position,
+            "start": start,
+            "end": end,
+            "score": score
+        })
+    return results
+
+
+def load_persisted_documents() -> None:
+    """Rebuild documents_db and the search indexes from the document store.
+    
+    Chunk boundaries come from stored offsets, so nothing is re-chunked, and
+    embeddings already in the memory-mapped vector store are reused.
+    """
+    global last_change_seq
+    # Read the log position first: anything logged meanwhile is re-applied by sync_changes
+    last_change_seq = document_store.latest_change()
+    for doc in document_store.iter_metadata():
+        documents_db[doc["id"]] = doc
+        shard = shards.get(doc["collection"])
+        chunks = document_store.get_document_chunks(doc["id"])
+        shard.index.add_document(doc["id"], chunks)
+        if doc["id"] not in shard.vectors.doc_rows:
+            shard.vectors.add_document(doc["id"], chunks)
+    
+    # The default collection always exists (and owns any index from before collections)
+    shards.get(DEFAULT_COLLECTION)
+    
+    # Drop vectors of documents that no longer exist
+    for shard in shards:
+        for doc_id in list(shard.vectors.doc_rows):
+            if doc_id not in documents_db and document_store.get_metadata(doc_id) is None:
+                shard.vectors.remove_document(doc_id)
+    chunk_count = sum(len(shard.index) for shard in shards)
+    print(f"✓ Restored {len(documents_db)} documents ({chunk_count} chunks, {len(shards)} collections) from {document_store.path}")
+
+
+async def warm_up() -> None:
+    """Restore documents, warm the indexes and create the OpenAI clients, then become ready.
+    
+    Runs in the background after startup so liveness probes are answered
+    at once; the index work happens in a worker thread.
+    """
+    start = time.perf_counter()
+    try:
+        await asyncio.to_thread(load_persisted_documents)
+        await asyncio.to_thread(shards.warm)
+    except Exception as e:
+        print(f"ERROR: Warm-up failed, not ready: {e}")
+        raise
+    if reranker is not None:
+        try:
+            await asyncio.to_thread(reranker.score, "warm up", ["warm up"])
+        except Exception as e:
+            print(f"WARNING: Could not warm up the {reranker.name} re-ranker: {e}")
+    count_tokens("warm up")
+    get_openai_client()
+    get_llm_client()
+    print(f"✓ Ready after {time.perf_counter() - start:.2f}s warm-up")
+
+
+def is_ready() -> bool:
+    """True once warm_up() has finished successfully."""
+    return (
+        warmup_task is not None and warmup_task.done()
+        and not warmup_task.cancelled() and warmup_task.exception() is None
+    )
+
+
+def read_changes(since: int) -> List[Tuple[int, str, str, Optional[dict], Optional[List[Counter]]]]:
+    """Changes logged after `since`, with the metadata and chunk term counts needed to apply them.
+    
+    Runs in a worker thread: loading and tokenizing documents added by
+    other workers is the slow part of a sync.
+    """
+    shards.refresh()
+    loaded = []
+    for seq, op, doc_id in document_store.changes_since(since):
+        doc = terms = None
+        if op != "delete":
+            doc = document_store.get_metadata(doc_id)
+            if doc is not None and doc_id not in documents_db:
+                terms = [Counter(tokenize(chunk)) for chunk in document_store.get_document_chunks(doc_id)]
+        loaded.append((seq, op, doc_id, doc, terms))
+    return loaded
+
+
+async def sync_changes() -> None:
+    """Apply document changes made by other worker processes since the last sync."""
+    global last_change_seq
+    if document_store.latest_change() == last_change_seq:
+        return
+    async with sync_lock:
+        changes = await asyncio.to_thread(read_changes, last_change_seq)
+        for seq, op, doc_id, doc, terms in changes:
+            if op == "delete":
+                if doc_id in documents_db:
+                    shards.get(documents_db[doc_id]["collection"]).index.remove_document(doc_id)
+                    answer_cache.invalidate_document(doc_id)
+                    del documents_db[doc_id]
+            elif doc is not None and (doc_id in documents_db or terms is not None):
+                # "add" or "summary": pick up the current metadata (no terms: deleted here meanwhile)
+                if doc_id not in documents_db:
+                    index = shards.get(doc["collection"]).index
+                    for position, counts in enumerate(terms):
+                        index.add_chunk_terms(doc_id, position, counts)
+                documents_db[doc_id] = doc
+            last_change_seq = seq
+
+
+def chunk_citations(relevant_chunks: List[dict]) -> List[dict]:
+    """Where each retrieved chunk sits in its source document (character offsets)."""
+    return [
+        {key: chunk[key] for key in ("doc_id", "doc_name", "position", "start", "end")}
+        for chunk in relevant_chunks
+    ]
+
+
+def ordered_documents() -> List[Tuple[str, str]]:
+    """(upload_date, id) of every document in listing order, re-sorted only after a change."""
+    global document_order
+    if document_order[0] != last_change_seq:
+        document_order = (last_change_seq, sorted((doc["upload_date"], doc_id) for doc_id, doc in documents_db.items()))
+    return document_order[1]
+
+
+def encode_cursor(key: Tuple[str, str]) -> str:
+    return base64.urlsafe_b64encode("\x00".join(key).encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: str) -> Tuple[str, str]:
+    try:
+        upload_date, doc_id = base64.urlsafe_b64decode(cursor.encode("ascii")).decode("utf-8").split("\x00")
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor.")
+    return upload_date, doc_id
+
+
+def project_document(doc: dict, fields: Tuple[str, ...]) -> dict:
+    view = {field: doc.get(field) for field in fields if field != "has_summary"}
+    if "has_summary" in fields:
+        view["has_summary"] = bool(doc.get("summary"))
+    return view
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates or f"W/{etag}" in candidates
+
+
+def collection_documents(collection: str) -> List[dict]:
+    """Metadata of a collection's documents, oldest first."""
+    return sorted(
+        (doc for doc in documents_db.values() if doc["collection"] == collection),
+        key=lambda doc: (doc["upload_date"], doc["id"])
+    )
+
+
+def validate_collection(collection: str) -> str:
+    if not valid_collection_name(collection):
+        raise HTTPException(
+            status_code=400,
+            detail=f"Invalid collection name '{collection}'. Use up to 64 letters, digits, '_', '.' or '-'."
+        )
+    return collection
+
+
+def check_collection_room(collection: str, chunk_count: int = 0) -> None:
+    """Fail fast (HTTP 409) on an upload that cannot fit in its collection.
+    
+    Only a pre-check against this worker's view; the limits are enforced,
+    and "oldest" evictions made, by commit_document inside the store
+    transaction. With no `chunk_count` (before the file has been read) only
+    the document count is checked.
+    """
+    limits = shards.limits_for(collection)
+    if limits.max_chunks and chunk_count > limits.max_chunks:
+        raise HTTPException(
+            status_code=409,
+            detail=f"Document has {chunk_count} chunks; collection '{collection}' holds at most {limits.max_chunks}."
+        )
+    if limits.eviction == "oldest" or (not limits.max_documents and not limits.max_chunks):
+        return
+    existing = collection_documents(collection)
+    documents = len(existing)
+    chunks = sum(doc["chunk_count"] for doc in existing)
+    if (limits.max_documents and documents + 1 > limits.max_documents) or (limits.max_chunks and chunks + chunk_count > limits.max_chunks):
+        raise HTTPException(
+            status_code=409,
+            detail=f"Collection '{collection}' is full ({documents} documents, {chunks} chunks). Delete documents or raise its limits."
+        )
+
+
+def query_collections(request: QueryRequest) -> List[str]:
+    """The request's collections, deduplicated; 404 for unknown ones, 400 if none has documents."""
+    collections = list(dict.fromkeys(validate_collection(name) for name in request.collections))
+    if not collections:
+        raise HTTPException(status_code=400, detail="Select at least one collection.")
+    unknown = [name for name in collections if name not in shards]
+    if unknown:
+        raise HTTPException(status_code=404, detail=f"Unknown collections: {', '.join(unknown)}.")
+    if not any(len(shards.get(name).index) for name in collections):
+        raise HTTPException(status_code=400, detail="No documents uploaded.")
+    return collections
+
+
+async def forget_document(doc_id: str, collection: str) -> None:
+    """Drop a document from documents_db, its shard and the caches (the store is left alone)."""
+    documents_db.pop(doc_id, None)
+    shard = shards.get(collection)
+    shard.index.remove_document(doc_id)
+    answer_cache.invalidate_document(doc_id)
+    # Tombstoning can trigger a compaction; keep it off the event loop
+    await asyncio.to_thread(shard.vectors.remove_document, doc_id)
+
+
+async def remove_document(doc_id: str) -> None:
+    """Delete a document from its shard, the caches, the store and documents_db."""
+    doc = documents_db.get(doc_id)
+    if doc is None:
+        return
+    await forget_document(doc_id, doc["collection"])
+    document_store.delete_document(doc_id)
+
+
+async def commit_document(doc: dict, text: str, spans: List[Tuple[int, int]], vectors: Optional[np.ndarray]) -> List[str]:
+    """Store an indexed document, publishing it to documents_db and the other workers.
+    
+    The collection's limits are checked in the store transaction, so they
+    hold across workers: a document that does not fit raises HTTP 409 and
+    leaves nothing behind, and with the "oldest" policy the documents
+    evicted to make room are only dropped once the new one is committed.
+    Returns the IDs of evicted documents.
+    """
+    collection = doc["collection"]
+    shard = shards.get(collection)
+    limits = shards.limits_for(collection)
+    if vectors is not None and len(vectors):
+        await asyncio.to_thread(shard.vectors.add_vectors, doc["id"], vectors)
+    try:
+        # Committing to the store publishes the document to the other workers
+        evicted = document_store.add_document(
+            doc, text, spans, limits.max_documents, limits.max_chunks, evict=limits.eviction == "oldest"
+        )
+    except CollectionFull as e:
+        await asyncio.to_thread(shard.vectors.remove_document, doc["id"])
+        raise HTTPException(status_code=409, detail=str(e))
+    except Exception:
+        await asyncio.to_thread(shard.vectors.remove_document, doc["id"])
+        raise
+    documents_db[doc["id"]] = doc
+    
+    for doc_id in evicted:
+        await forget_document(doc_id, collection)
+    if evicted:
+        print(f"Evicted {len(evicted)} documents from collection '{collection}' to stay within its limits")
+    return evicted
+
+
+def read_text_file(path: str) -> str:
+    """A saved upload's text, with newlines untouched so chunk offsets line up."""
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        return f.read()
+
+
+async def save_upload_file(file: UploadFile, path: str) -> int:
+    """Copy an upload to disk in blocks, enforcing MAX_UPLOAD_BYTES. Returns the size."""
+    size = 0
+    with open(path, "wb") as f:
+        while True:
+            block = await file.read(UPLOAD_BLOCK_SIZE)
+            if not block:
+                break
+            size += len(block)
+            if size > MAX_UPLOAD_BYTES:
+                raise HTTPException(status_code=413, detail=f"{file.filename} is larger than the {MAX_UPLOAD_BYTES // (1024 * 1024)} MB upload limit.")
+            await asyncio.to_thread(f.write, block)
+    return size
+
+
+async def finish_ingest_job(job_id: str, filename: str, path: str, result: dict, collection: str) -> dict:
+    """Merge an upload processed by an ingestion worker into its collection's shard (IngestQueue handler)."""
+    doc_id = f"doc_{datetime.now().timestamp()}"
+    shard = shards.get(collection)
+    for position, counts in enumerate(result["terms"]):
+        shard.index.add_chunk_terms(doc_id, position, counts)
+    try:
+        check_collection_room(collection, len(result["spans"]))
+        vectors = result["vectors"]
+        if vectors is None and result["chunks"]:
+            job_store.update(job_id, stage="embedding", progress=0.8)
+            vectors = await asyncio.to_thread(shard.vectors.embed, result["chunks"])
+        doc = {
+            "id": doc_id,
+            "name": filename,
+            "collection": collection,
+            "content_hash": result["content_hash"],
+            "upload_date": datetime.now().isoformat(),
+            "chunk_count": len(result["spans"]),
+            "size": result["size"]
+        }
+        await commit_document(doc, result["text"], result["spans"], vectors)
+    except HTTPException as e:
+        shard.index.remove_document(doc_id)
+        raise RuntimeError(e.detail)
+    except BaseException:
+        shard.index.remove_document(doc_id)
+        raise
+    
+    os.replace(path, f"uploads/{filename}")
+    return {"document_id": doc_id, "chunk_count": len(result["spans"])}
+
+
+async def retrieve_context(query: str, timer: StageTimer, collections: Sequence[str]) -> Tuple[List[dict], int]:
+    """Retrieve candidate chunks from the collections and fit them into the CONTEXT_MAX_TOKENS budget.
+    
+    Returns the chunks to send, in relevance order, and their token count.
+    """
+    with timer.stage("retrieval"):
+        candidates = await semantic_search(query, documents_db, top_k=QUERY_CANDIDATES, timer=timer, collections=collections)
+    with timer.stage("context"):
+        return build_context(candidates, CONTEXT_MAX_TOKENS, CONTEXT_DUPLICATE_THRESHOLD)
+
+
+def build_query_messages(request: QueryRequest, relevant_chunks: List[dict],
+                         history: Tuple[str, List[Turn]] = ("", [])) -> List[dict]:
+    """Build the chat messages for a query from its retrieved chunks and the
+    session's conversation so far (rolling summary, then recent turns)."""
+    context = format_context(relevant_chunks)
+    
+    # Language instruction
+    language_map = {
+        "en": "English",
+        "es": "Spanish",
+        "fr": "French",
+        "de": "German",
+        "hi": "Hindi",
+        "zh": "Chinese",
+        "ja": "Japanese"
+    }
+    
+    language_instruction = ""
+    if request.language != "en":
+        language_instruction = f"\n\nIMPORTANT: Respond in {language_map.get(request.language, 'English')}."
+    
+    system_prompt = f"""You are an Enterprise Knowledge Assistant. Answer questions based ONLY on the provided context from company documents. 
+If the answer cannot be found in the context, say so clearly. Always cite which document your answer comes from.{language_instruction}
+If no relevant information is found, politely inform the user that the information is not available in the uploaded documents."""
+    
+    summary, turns = history
+    messages = [{"role": "system", "content": system_prompt}]
+    if summary:
+        messages.append({"role": "system", "content": f"Summary of the earlier conversation:\n{summary}"})
+    for _, question, answer in turns:
+        messages.append({"role": "user", "content": question})
+        messages.append({"role": "assistant", "content": answer})
+    messages.append({"role": "user", "content": f"Context:\n{context}\n\nQuestion: {request.query}"})
+    return messages
+
+
+async def retrieve_with_history(request: QueryRequest, timer: StageTimer,
+                                collections: Sequence[str]) -> Tuple[List[dict], int, str, List[Turn], int]:
+    """Retrieve for a query, bringing in the session's history only for follow-ups.
+    
+    Follow-ups ("and for contractors?") are searched together with the
+    previous question, so they find the same material; other questions are
+    searched on their own, and only fall back to that when they find
+    nothing. History (fitted into HISTORY_MAX_TOKENS) is only sent, and only
+    part of the answer-cache key, for questions searched that way, so a
+    standalone question gets the same chunks and cached answer in any session.
+    
+    Returns the chunks, their token count, and the summary, turns and token
+    count of the history to send.
+    """
+    with timer.stage("history"):
+        conversation = conversation_store.get(request.session_id) if request.session_id else None
+    if not conversation or not is_follow_up(request.query, FOLLOW_UP_MAX_WORDS):
+        relevant_chunks, context_tokens = await retrieve_context(request.query, timer, collections)
+        if relevant_chunks or not conversation:
+            return relevant_chunks, context_tokens, "", [], 0
+    with timer.stage("history"):
+        summary, turns, history_tokens = conversation.fit(HISTORY_MAX_TOKENS)
+    relevant_chunks, context_tokens = await retrieve_context(f"{request.query}\n{conversation.last_question}", timer, collections)
+    return relevant_chunks, context_tokens, summary, turns, history_tokens
+
+
+def history_key(summary: str, turns: List[Turn]) -> str:
+    """Identifies the history an answer was given with, for the answer cache."""
+    return json.dumps([summary, turns]) if summary or turns else ""
+
+
+def remember_turn(session_id: str, question: str, answer: str) -> None:
+    """Add a turn to the session's memory, summarizing older turns in the background."""
+    if not session_id:
+        return
+    if conversation_store.append(session_id, question, answer):
+        task = asyncio.create_task(conversation_flights.run(session_id, lambda: summarize_conversation(session_id)))
+        background_tasks.add(task)
+        task.add_done_callback(background_tasks.discard)
+
+
+async def summarize_conversation(session_id: str) -> None:
+    """Fold a session's pending turns into its rolling summary."""
+    conversation = conversation_store.get(session_id)
+    if not conversation.pending or get_llm_client() is None:
+        return
+    exchanges = "\n\n".join(f"User: {question}\nAssistant: {answer}" for _, question, answer in conversation.pending)
+    try:
+        response = await get_llm_client().chat(
+            model="gpt-4o",
+            messages=[
+                {"role": "user", "content": f"Update the running summary of this conversation with the new exchanges. Keep the topics, facts, names and open questions the user may refer back to, in at most {CONVERSATION_SUMMARY_TOKENS // 2} words.\n\nSummary so far:\n{conversation.summary or '(none)'}\n\nNew exchanges:\n{exchanges}"}
+            ],
+            max_tokens=CONVERSATION_SUMMARY_TOKENS
+        )
+    except Exception as e:
+        # The turns stay pending (and in the prompt) until a later summary succeeds
+        print(f"WARNING: Could not summarize conversation {session_id}: {e}")
+        return
+    conversation_store.fold(session_id, response.choices[0].message.content.strip(), conversation.pending[-1][0])
+
+
+def ensure_openai_client(endpoint: str) -> None:
+    """Make sure the OpenAI client is configured, raising an HTTP 500 if not."""
+    if get_openai_client() is None:
+        print(f"{endpoint}: no OpenAI API key configured")
+        raise HTTPException(
+            status_code=500,
+            detail=f"OPENAI_API_KEY not found. Please set one of {', '.join(OPENAI_KEY_VARS)} and restart the server."
+        )
+
+
+def record_query_analytics(query: str, sources: List[str], response_time: float) -> None:
+    """Update the shared analytics after a query has been answered."""
+    analytics_store.record_query(query, sources, response_time)
+
+
+async def flush_aggregates_periodically() -> None:
+    """Persist this worker's analytics and metrics every ANALYTICS_FLUSH_INTERVAL seconds."""
+    while True:
+        await asyncio.sleep(ANALYTICS_FLUSH_INTERVAL)
+        try:
+            await asyncio.to_thread(analytics_store.flush)
+            await asyncio.to_thread(metrics.flush)
+        except Exception as e:
+            print(f"WARNING: Could not persist analytics: {e}")
+
+
+def add_server_timing(response: Response, timer: StageTimer) -> None:
+    """Send the request's stage timings to the client, if SERVER_TIMING is enabled."""
+    if SERVER_TIMING and timer.stages:
+        response.headers["Server-Timing"] = timer.server_timing()
+
+
+def sse_event(event: str, data: dict) -> str:
+    """Format one Server-Sent Events message."""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def validate_summary_mode(mode: str) -> None:
+    if mode not in SUMMARY_MODES:
+        raise HTTPException(status_code=400, detail=f"Unknown summary mode '{mode}'. Use one of: {', '.join(SUMMARY_MODES)}.")
+
+
+def split_for_summary(text: str, limit: int = SUMMARY_SECTION_CHARS) -> List[str]:
+    """Group chunks of a document into sections of at most `limit` characters."""
+    sections = []
+    current = []
+    current_len = 0
+    for chunk in chunk_text(text, overlap_tokens=0):
+        # Oversized chunks (no sentence breaks) are cut hard
+        pieces = [chunk[i:i + limit] for i in range(0, len(chunk), limit)] or [chunk]
+        for piece in pieces:
+            if current and current_len + len(piece) > limit:
+                sections.append(" ".join(current))
+                current, current_len = [], 0
+            current.append(piece)
+            current_len += len(piece) + 1
+    if current:
+        sections.append(" ".join(current))
+    return sections
+
+
+async def summarize_text(text: str, mode: str = "auto") -> str:
+    """Summarize text in 3-5 bullet points.
+    
+    In "auto" mode text longer than one section is map-reduced: every section
+    is summarized concurrently (bounded by the LLM client's concurrency cap)
+    and the partial summaries are then summarized together. "truncate" keeps
+    the old behaviour of only sending the first section.
+    """
+    llm_client = get_llm_client()
+    
+    if mode == "truncate" or len(text) <= SUMMARY_SECTION_CHARS:
+        response = await llm_client.chat(
+            model="gpt-4o",
+            messages=[
+                {"role": "user", "content": f"Please summarize this document in 3-5 bullet points:\n\n{text[:SUMMARY_SECTION_CHARS]}"}
+            ],
+            max_tokens=1000
+        )
+        return response.choices[0].message.content
+    
+    # Map: summarize each section
+    responses = await asyncio.gather(*[
+        llm_client.chat(
+            model="gpt-4o",
+            messages=[
+                {"role": "user", "content": f"Summarize this section of a longer document in a few sentences, keeping the key facts:\n\n{section}"}
+            ],
+            max_tokens=400
+        )
+        for section in split_for_summary(text)
+    ])
+    partials = "\n\n".join(response.choices[0].message.content for response in responses)
+    
+    # Reduce: very long documents may need another round
+    if len(partials) > SUMMARY_SECTION_CHARS:
+        return await summarize_text(partials, mode)
+    response = await llm_client.chat(
+        model="gpt-4o",
+        messages=[
+            {"role": "user", "content": f"These are summaries of consecutive sections of one document. Please summarize the whole document in 3-5 bullet points:\n\n{partials}"}
+        ],
+        max_tokens=1000
+    )
+    return response.choices[0].message.content
+
+
+async def summarize_stored_document(document_id: str, mode: str = "auto") -> dict:
+    """Summarize a stored document, reusing its summary while the content hash is unchanged.
+    
+    Concurrent requests for the same document content share one summarization.
+    """
+    doc = documents_db.get(document_id)
+    if doc is None:
+        raise HTTPException(status_code=404, detail="Document not found.")
+    
+    summary_key = f"{doc['content_hash']}:{mode}"
+    if doc.get("summary") and doc.get("summary_key") == summary_key:
+        return {"success": True, "summary": doc["summary"], "cached": True}
+    
+    async def summarize() -> str:
+        summary = await summarize_text(document_store.get_content(document_id) or "", mode)
+        doc["summary"] = summary
+        doc["summary_key"] = summary_key
+        document_store.set_summary(document_id, summary, summary_key)
+        return summary
+    
+    try:
+        summary, coalesced = await summary_flights.run(f"{document_id}:{summary_key}", summarize)
+    except openai.AuthenticationError as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"OpenAI authentication failed: {str(e)}. Please check your API key."
+        )
+    except openai.APIError as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"OpenAI API error: {str(e)}"
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error calling OpenAI API: {str(e)}"
+        )
+    
+    return {"success": True, "summary": summary, "cached": False, "coalesced": coalesced}
 
 
 # -----------------------------
 # 🚀 API Routes
 # -----------------------------
+@app.middleware("http")
+async def sync_worker_state(request, call_next):
+    """Catch up with uploads/deletes from other workers before handling a request.
+    
+    Requests that arrive during warm-up wait for it instead of seeing an
+    empty index; probes skip all of this.
+    """
+    if request.url.path in PROBE_PATHS:
+        return await call_next(request)
+    if warmup_task is not None:
+        await asyncio.shield(warmup_task)
+    await sync_changes()
+    return await call_next(request)
+
+
+@app.middleware("http")
+async def time_requests(request, call_next):
+    """Record each request's latency under its route template (e.g. /jobs/{job_id})."""
+    start = time.perf_counter()
+    response = await call_next(request)
+    route = request.scope.get("route")
+    metrics.observe(request_seconds, route.path if route is not None else "unmatched", time.perf_counter() - start)
+    return response
+
+
+@app.middleware("http")
+async def limit_upload_size(request, call_next):
+    """Reject an /upload whose declared size is over MAX_UPLOAD_BYTES before its body is read.
+    
+    The multipart body is spooled in full before the handler runs, so the
+    handler's own check would only fire after the whole file arrived.
+    """
+    if request.url.path == "/upload":
+        length = request.headers.get("content-length")
+        if length is not None and length.isdigit() and int(length) > MAX_UPLOAD_BYTES + UPLOAD_FORM_OVERHEAD:
+            return JSONResponse(
+                status_code=413,
+                content={"detail": f"File is larger than the {MAX_UPLOAD_BYTES // (1024 * 1024)} MB upload limit."}
+            )
+    return await call_next(request)
+
+
 @app.get("/api")
 async def root():
     return {"message": "Enterprise Knowledge Assistant API (OpenAI)", "status": "running"}
 
 
 @app.post("/upload")
-async def upload_document(file: UploadFile = File(...)):
-    """Upload and process a document."""
+async def upload_document(response: Response, file: UploadFile = File(...), collection: str = Form(DEFAULT_COLLECTION)):
+    """Upload and process a document into a collection (its own index shard).
+    
+    The upload is read in UPLOAD_BLOCK_SIZE blocks: each block is written to
+    disk off the event loop, decoded incrementally and fed to the chunker, and
+    chunks are indexed as soon as they are complete. Time spent in each stage
+    (read, write, parse, chunk, index, embed, store) is recorded for /metrics.
+    """
+    timer = StageTimer(metrics, upload_stage_seconds)
     try:
         # Only allow text-based files
         if not file.filename.endswith((".txt", ".md", ".csv")):
             raise HTTPException(status_code=400, detail="Only text-based files (.txt, .md, .csv) are supported.")
-        
-        content = await file.read()
-        text = content.decode('utf-8')
-
-        # Save file locally (optional)
-        os.makedirs("uploads", exist_ok=True)
-        with open(f"uploads/{file.filename}", "w", encoding="utf-8") as f:
-            f.write(text)
+        if file.size is not None and file.size > MAX_UPLOAD_BYTES:
+            raise HTTPException(status_code=413, detail=f"File is larger than the {MAX_UPLOAD_BYTES // (1024 * 1024)} MB upload limit.")
+        validate_collection(collection)
+        # Reject uploads to a full collection before reading, indexing or embedding anything
+        check_collection_room(collection)
         
         doc_id = f"doc_{datetime.now().timestamp()}"
-        chunks = chunk_text(text)
+        shard = shards.get(collection)
+        limits = shards.limits_for(collection)
+        decoder = codecs.getincrementaldecoder("utf-8")()
+        hasher = hashlib.sha256()
+        chunker = TokenChunker(CHUNK_MAX_TOKENS, CHUNK_OVERLAP_TOKENS, chunk_mode(file.filename))
+        spans = []
+        size = 0
         
-        documents_db[doc_id] = {
-            "id": doc_id,
-            "name": file.filename,
-            "content": text,
-            "chunks": chunks,
-            "upload_date": datetime.now().isoformat(),
-            "chunk_count": len(chunks)
-        }
+        # Chunks waiting to be embedded, and the embeddings computed so far
+        pending = []
+        vector_batches = []
+        
+        async def index_chunks(chunks, final=False):
+            with timer.stage("index"):
+                for start, end, chunk in chunks:
+                    shard.index.add_chunk(doc_id, len(spans), chunk)
+                    spans.append((start, end))
+                    pending.append(chunk)
+            if limits.max_chunks and len(spans) > limits.max_chunks:
+                # Too big for the collection even when empty; stop before embedding more
+                check_collection_room(collection, len(spans))
+            if pending and (final or len(pending) >= shard.vectors.batch_size):
+                with timer.stage("embed"):
+                    vector_batches.append(await asyncio.to_thread(shard.vectors.embed, list(pending)))
+                pending.clear()
+        
+        # Save file locally (optional); written to a temp name until the upload is complete
+        os.makedirs("uploads", exist_ok=True)
+        upload_path = f"uploads/{file.filename}"
+        partial_path = f"{upload_path}.{doc_id}.part"
+        try:
+            with open(partial_path, "wb") as f:
+                while True:
+                    with timer.stage("read"):
+                        block = await file.read(UPLOAD_BLOCK_SIZE)
+                    if not block:
+                        break
+                    size += len(block)
+                    if size > MAX_UPLOAD_BYTES:
+                        raise HTTPException(status_code=413, detail=f"File is larger than the {MAX_UPLOAD_BYTES // (1024 * 1024)} MB upload limit.")
+                    with timer.stage("write"):
+                        hasher.update(block)
+                        await asyncio.to_thread(f.write, block)
+                    
+                    with timer.stage("parse"):
+                        text = decoder.decode(block)
+                    with timer.stage("chunk"):
+                        chunks = chunker.feed(text)
+                    await index_chunks(chunks)
+            
+            with timer.stage("parse"):
+                text = decoder.decode(b"", final=True)
+            with timer.stage("chunk"):
+                chunks = chunker.feed(text) + chunker.finish()
+            await index_chunks(chunks, final=True)
+            doc = {
+                "id": doc_id,
+                "name": file.filename,
+                "collection": collection,
+                "content_hash": hasher.hexdigest(),
+                "upload_date": datetime.now().isoformat(),
+                "chunk_count": len(spans),
+                "size": size
+            }
+            with timer.stage("store"):
+                check_collection_room(collection, len(spans))
+                # The content is stored from the saved file, so blocks are never kept in memory
+                content = await asyncio.to_thread(read_text_file, partial_path)
+                evicted = await commit_document(doc, content, spans, np.vstack(vector_batches) if vector_batches else None)
+            os.replace(partial_path, upload_path)
+        except BaseException:
+            shard.index.remove_document(doc_id)
+            if os.path.exists(partial_path):
+                os.remove(partial_path)
+            raise
+        timer.finish()
+        add_server_timing(response, timer)
         
         return {
             "success": True,
             "document_id": doc_id,
-            "chunk_count": len(chunks),
-            "filename": file.filename
+            "collection": collection,
+            "chunk_count": len(spans),
+            "filename": file.filename,
+            "evicted": evicted
         }
+    except HTTPException:
+        raise
+    except UnicodeDecodeError:
+        raise HTTPException(status_code=400, detail="File is not valid UTF-8 text.")
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/upload/batch", status_code=202)
+async def upload_documents_batch(files: List[UploadFile] = File(...), collection: str = Form(DEFAULT_COLLECTION)):
+    """Queue several documents for background ingestion into a collection.
+    
+    Files are saved and handed to the ingestion worker pool; the response
+    carries one job ID per file, to be polled at /jobs/{job_id}. Returns 429
+    when the ingestion queue cannot take the whole batch.
+    """
+    validate_collection(collection)
+    for file in files:
+        if not file.filename.endswith((".txt", ".md", ".csv")):
+            raise HTTPException(status_code=400, detail=f"{file.filename}: only text-based files (.txt, .md, .csv) are supported.")
+    if ingest_queue is None:
+        raise HTTPException(status_code=503, detail="Ingestion workers are not running.")
+    if ingest_queue.free_slots < len(files):
+        raise HTTPException(
+            status_code=429,
+            detail=f"Ingestion queue is full ({ingest_queue.queue.qsize()} jobs waiting). Please retry later.",
+            headers={"Retry-After": "5"}
+        )
+    
+    os.makedirs("uploads", exist_ok=True)
+    jobs = []
+    for file in files:
+        job_id = job_store.create(file.filename)
+        path = f"uploads/{file.filename}.{job_id}.part"
+        try:
+            await save_upload_file(file, path)
+            ingest_queue.submit(job_id, file.filename, path, collection)
+        except (HTTPException, asyncio.QueueFull) as e:
+            error = e.detail if isinstance(e, HTTPException) else "Ingestion queue is full."
+            job_store.update(job_id, status="failed", stage="rejected", error=error)
+            if os.path.exists(path):
+                os.remove(path)
+            jobs.append({"job_id": job_id, "filename": file.filename, "status": "failed", "error": error})
+            continue
+        jobs.append({"job_id": job_id, "filename": file.filename, "status": "queued"})
+    
+    return {"jobs": jobs}
+
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Status and progress of a background ingestion job."""
+    job = job_store.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found.")
+    return job
+
+
 @app.post("/query", response_model=QueryResponse)
-async def query_documents(request: QueryRequest):
-    """Query the uploaded documents."""
-    global client
-    start_time = datetime.now()
+async def query_documents(request: QueryRequest, http_response: Response):
+    """Query the uploaded documents.
     
-    if not documents_db:
-        raise HTTPException(status_code=400, detail="No documents uploaded.")
+    For follow-up questions the session's conversation so far is sent along
+    (and used to retrieve), and every answered turn is added to it. History loading,
+    retrieval, context building, cache lookup, the LLM call and the
+    analytics update are timed separately for /metrics (and Server-Timing).
+    """
+    start_time = time.perf_counter()
+    timer = StageTimer(metrics, query_stage_seconds)
+    collections = query_collections(request)
     
     try:
-        # Search relevant chunks
-        relevant_chunks = semantic_search(request.query, documents_db, top_k=5)
+        # Search relevant chunks, keeping as many as fit the context budget
+        relevant_chunks, context_tokens, summary, turns, history_tokens = await retrieve_with_history(request, timer, collections)
         
-        if not relevant_chunks:
+        # Without history there is nothing to answer from
+        if not relevant_chunks and not (summary or turns):
             return QueryResponse(
                 response="I couldn't find relevant information in the documents.",
                 sources=[],
                 response_time=0
             )
         
-        # Build context
-        context = "\n\n---\n\n".join([
-            f"[Source: {chunk['doc_name']}]\n{chunk['chunk']}"
-            for chunk in relevant_chunks
-        ])
-        
-        # Language instruction
-        language_map = {
-            "en": "English",
-            "es": "Spanish",
-            "fr": "French",
-            "de": "German",
-            "hi": "Hindi",
-            "zh": "Chinese",
-            "ja": "Japanese"
-        }
+        sources = list(set([chunk["doc_name"] for chunk in relevant_chunks]))
+        citations = chunk_citations(relevant_chunks)
         
-        language_instruction = ""
-        if request.language != "en":
-            language_instruction = f"\n\nIMPORTANT: Respond in {language_map.get(request.language, 'English')}."
+        # Serve repeated questions over the same chunks (and history) from the answer cache
+        cache_key = AnswerCache.make_key(
+            request.query, request.language,
+            [(chunk["doc_id"], chunk["position"]) for chunk in relevant_chunks],
+            history_key(summary, turns)
+        )
+        with timer.stage("cache"):
+            cached = answer_cache.get(cache_key)
+        if cached is not None:
+            with timer.stage("history"):
+                remember_turn(request.session_id, request.query, cached["response"])
+            response_time = time.perf_counter() - start_time
+            with timer.stage("analytics"):
+                record_query_analytics(request.query, cached["sources"], response_time)
+            timer.finish()
+            add_server_timing(http_response, timer)
+            return QueryResponse(
+                response=cached["response"],
+                sources=cached["sources"],
+                response_time=response_time,
+                citations=citations,
+                usage=TokenUsage(context_tokens=context_tokens, history_tokens=history_tokens)
+            )
         
-        system_prompt = f"""You are an Enterprise Knowledge Assistant. Answer questions based ONLY on the provided context from company documents. 
-If the answer cannot be found in the context, say so clearly. Always cite which document your answer comes from.{language_instruction}
-If no relevant information is found, politely inform the user that the information is not available in the uploaded documents."""
+        messages = build_query_messages(request, relevant_chunks, (summary, turns))
         
         # Check if OpenAI client is available, try to reinitialize if needed
-        global client
-        if not client:
-            print("Client not initialized, attempting to initialize now in /query endpoint...")
-            # Force reload environment variables
-            load_dotenv(override=True)
-            
-            # Try to get the key again - check all possible sources
-            openai_api_key = (
-                os.environ.get("OPENAI_API_KEY") or
-                os.environ.get("openai_api_key") or
-                os.environ.get("OPENAI_KEY") or
-                os.environ.get("openai_key")
-            )
-            
-            if openai_api_key:
-                print(f"Found API key in /query handler, length: {len(openai_api_key)}, starts with: {openai_api_key[:10]}")
-                print(f"API key preview: {openai_api_key[:20]}...{openai_api_key[-10:]}")
-                client = get_openai_client()
-                if client:
-                    print("✓ Client successfully initialized in /query handler")
-                else:
-                    print("✗ Client initialization failed in /query handler - check logs above for error details")
-            
-            if not client:
-                # Last attempt - check all env vars and provide detailed error
-                all_vars = dict(os.environ)
-                openai_related = {}
-                for k, v in all_vars.items():
-                    if 'OPENAI' in k.upper() or 'API' in k.upper():
-                        # Show key name and value length, but not the actual value for security
-                        openai_related[k] = f"length:{len(v)}, starts_with:{v[:5] if len(v) > 5 else 'empty'}"
-                
-                print(f"Failed to initialize client. OpenAI-related env vars: {openai_related}")
-                print(f"Total env vars: {len(all_vars)}")
-                
-                # Check if the key exists but is empty
-                key_value = os.environ.get("OPENAI_API_KEY", "")
-                if "OPENAI_API_KEY" in all_vars:
-                    if not key_value or not key_value.strip():
-                        error_msg = f"OPENAI_API_KEY exists but is EMPTY. Please set a valid API key value in Railway Variables."
-                    else:
-                        # Try to initialize one more time to get the actual error
-                        try:
-                            # Initialize without any extra parameters to avoid 'proxies' error
-                            test_client = openai.OpenAI(api_key=key_value.strip())
-                            error_msg = f"Client initialization succeeded but client is None. This is unexpected. Please check Railway logs."
-                        except Exception as init_error:
-                            error_msg = f"OPENAI_API_KEY found (length: {len(key_value)}) but client initialization failed: {str(init_error)}. Please verify the API key is valid and has proper permissions."
-                        else:
-                            error_msg = f"OPENAI_API_KEY found (length: {len(key_value)}) but client initialization failed. Check Railway deployment logs for the detailed error message."
-                else:
-                    error_msg = f"OPENAI_API_KEY not found. Found {len(openai_related)} related variables: {list(openai_related.keys())}. Please add OPENAI_API_KEY in Railway Variables."
-                
-                raise HTTPException(status_code=500, detail=error_msg)
+        ensure_openai_client("/query")
         
-        # Call OpenAI API
-        try:
-            response = client.chat.completions.create(
+        async def answer():
+            response = await get_llm_client().chat(
                 model="gpt-4o",
-                messages=[
-                    {"role": "system", "content": system_prompt},
-                    {"role": "user", "content": f"Context:\n{context}\n\nQuestion: {request.query}"}
-                ],
+                messages=messages,
                 temperature=0.7
             )
+            answer_cache.put(
+                cache_key,
+                {"response": response.choices[0].message.content, "sources": sources},
+                {chunk["doc_id"] for chunk in relevant_chunks}
+            )
+            return response
+        
+        # Call OpenAI API (async, so other requests keep being served); identical
+        # questions already waiting on the LLM share that call instead
+        try:
+            with timer.stage("llm"):
+                response, coalesced = await query_flights.run(cache_key, answer)
             
             response_text = response.choices[0].message.content
+            usage = TokenUsage(context_tokens=context_tokens, history_tokens=history_tokens)
+            # Like cache hits, coalesced answers used no tokens of their own
+            if response.usage is not None and not coalesced:
+                usage.prompt_tokens = response.usage.prompt_tokens
+                usage.completion_tokens = response.usage.completion_tokens
+                usage.total_tokens = response.usage.total_tokens
         except openai.AuthenticationError as e:
             raise HTTPException(
                 status_code=500,
@@ -371,29 +1276,24 @@ If no relevant information is found, politely inform the user that the informati
                 detail=f"Error calling OpenAI API: {str(e)}"
             )
         
-        sources = list(set([chunk["doc_name"] for chunk in relevant_chunks]))
+        with timer.stage("history"):
+            remember_turn(request.session_id, request.query, response_text)
         
         # Response time
-        response_time = (datetime.now() - start_time).total_seconds()
+        response_time = time.perf_counter() - start_time
         
         # Update analytics
-        analytics_db["total_queries"] += 1
-        analytics_db["avg_response_time"] = (
-            (analytics_db["avg_response_time"] * (analytics_db["total_queries"] - 1) + response_time)
-            / analytics_db["total_queries"]
-        )
-        analytics_db["top_questions"].append({
-            "query": request.query,
-            "timestamp": datetime.now().isoformat()
-        })
-        
-        for source in sources:
-            analytics_db["documents_used"][source] = analytics_db["documents_used"].get(source, 0) + 1
+        with timer.stage("analytics"):
+            record_query_analytics(request.query, sources, response_time)
+        timer.finish()
+        add_server_timing(http_response, timer)
         
         return QueryResponse(
             response=response_text,
             sources=sources,
-            response_time=response_time
+            response_time=response_time,
+            citations=citations,
+            usage=usage
         )
         
     except HTTPException:
@@ -408,65 +1308,132 @@ If no relevant information is found, politely inform the user that the informati
         raise HTTPException(status_code=500, detail=f"An unexpected error occurred: {error_details}")
 
 
+@app.post("/query/stream")
+async def query_documents_stream(request: QueryRequest):
+    """Query the uploaded documents, streaming the answer as Server-Sent Events.
+    
+    Events, in order: `sources` (retrieved document names and chunk
+    citations), any number of `token` events with incremental completion
+    text, then `done` with `response_time`, `time_to_first_token` and token
+    `usage`. Failures after the stream has started are reported as an
+    `error` event. Like /query, the session's history is used and the
+    completed turn is added to it (and cached); the query is counted in
+    analytics however the stream ends, client disconnects included. Only
+    the stages before the stream starts fit in the Server-Timing header;
+    the rest reach /metrics when the stream ends.
+    """
+    start_time = time.perf_counter()
+    timer = StageTimer(metrics, query_stage_seconds)
+    collections = query_collections(request)
+    
+    relevant_chunks, context_tokens, summary, turns, history_tokens = await retrieve_with_history(request, timer, collections)
+    answerable = bool(relevant_chunks or summary or turns)
+    sources = list(set([chunk["doc_name"] for chunk in relevant_chunks]))
+    cache_key = AnswerCache.make_key(
+        request.query, request.language,
+        [(chunk["doc_id"], chunk["position"]) for chunk in relevant_chunks],
+        history_key(summary, turns)
+    )
+    with timer.stage("cache"):
+        cached = answer_cache.get(cache_key) if answerable else None
+    if answerable and cached is None:
+        messages = build_query_messages(request, relevant_chunks, (summary, turns))
+        ensure_openai_client("/query/stream")
+    
+    async def event_stream():
+        yield sse_event("sources", {"sources": sources, "citations": chunk_citations(relevant_chunks)})
+        
+        if not answerable:
+            yield sse_event("token", {"content": "I couldn't find relevant information in the documents."})
+            yield sse_event("done", {"response_time": 0, "time_to_first_token": 0})
+            return
+        
+        parts = []
+        time_to_first_token = None
+        usage = {}
+        recorded = False
+        
+        def record(complete: bool) -> float:
+            """Record the query's analytics and timings, and a complete answer's cache entry and turn."""
+            nonlocal recorded
+            recorded = True
+            response_time = time.perf_counter() - start_time
+            if complete:
+                answer = "".join(parts)
+                if cached is None:
+                    answer_cache.put(
+                        cache_key,
+                        {"response": answer, "sources": sources},
+                        {chunk["doc_id"] for chunk in relevant_chunks}
+                    )
+                with timer.stage("history"):
+                    remember_turn(request.session_id, request.query, answer)
+            with timer.stage("analytics"):
+                record_query_analytics(request.query, sources, response_time)
+            timer.finish()
+            return response_time
+        
+        try:
+            if cached is not None:
+                time_to_first_token = time.perf_counter() - start_time
+                parts.append(cached["response"])
+                yield sse_event("token", {"content": cached["response"]})
+            else:
+                llm_start = time.perf_counter()
+                try:
+                    async for delta in get_llm_client().stream_chat(
+                        usage=usage,
+                        model="gpt-4o",
+                        messages=messages,
+                        temperature=0.7
+                    ):
+                        if time_to_first_token is None:
+                            time_to_first_token = time.perf_counter() - start_time
+                        parts.append(delta)
+                        yield sse_event("token", {"content": delta})
+                except openai.AuthenticationError as e:
+                    yield sse_event("error", {"detail": f"OpenAI authentication failed: {str(e)}. Please check your API key."})
+                    return
+                except openai.APIError as e:
+                    yield sse_event("error", {"detail": f"OpenAI API error: {str(e)}"})
+                    return
+                except Exception as e:
+                    print(f"Unexpected error in query stream: {e}")
+                    yield sse_event("error", {"detail": f"Error calling OpenAI API: {str(e)}"})
+                    return
+                finally:
+                    # Includes the time the client took to consume the tokens
+                    timer.add("llm", time.perf_counter() - llm_start)
+            
+            # Recorded before `done`, so a follow-up sent on `done` sees this turn
+            response_time = record(complete=True)
+            yield sse_event("done", {
+                "response_time": response_time,
+                "time_to_first_token": time_to_first_token if time_to_first_token is not None else response_time,
+                "usage": TokenUsage(context_tokens=context_tokens, history_tokens=history_tokens, **usage).dict()
+            })
+        finally:
+            # The LLM call failed or the client went away: the query still counts
+            if not recorded:
+                record(complete=False)
+    
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    if SERVER_TIMING:
+        headers["Server-Timing"] = timer.server_timing()
+    return StreamingResponse(event_stream(), media_type="text/event-stream", headers=headers)
+
+
 @app.post("/summarize")
 async def summarize_document(request: SummaryRequest):
-    """Generate a short summary of a document."""
-    global client
+    """Generate a short summary of a document (reused while its content is unchanged)."""
     if request.document_id not in documents_db:
         raise HTTPException(status_code=404, detail="Document not found.")
+    validate_summary_mode(request.mode)
     
     try:
         # Check if OpenAI client is available, try to reinitialize if needed
-        global client
-        if not client:
-            print("Client not initialized, attempting to initialize now in /summarize endpoint...")
-            load_dotenv(override=True)
-            openai_api_key = (
-                os.environ.get("OPENAI_API_KEY") or
-                os.environ.get("openai_api_key") or
-                os.environ.get("OPENAI_KEY") or
-                os.environ.get("openai_key")
-            )
-            if openai_api_key:
-                client = get_openai_client()
-            if not client:
-                raise HTTPException(
-                    status_code=500, 
-                    detail="OpenAI API key not configured. Please set OPENAI_API_KEY environment variable in Railway."
-                )
-        
-        doc = documents_db[request.document_id]
-        content = doc["content"][:8000]  # limit content length
-        
-        try:
-            response = client.chat.completions.create(
-                model="gpt-4o",
-                messages=[
-                    {"role": "user", "content": f"Please summarize this document in 3-5 bullet points:\n\n{content}"}
-                ],
-                max_tokens=1000
-            )
-            
-            summary = response.choices[0].message.content
-            documents_db[request.document_id]["summary"] = summary
-            
-            return {"success": True, "summary": summary}
-        except openai.AuthenticationError as e:
-            raise HTTPException(
-                status_code=500,
-                detail=f"OpenAI authentication failed: {str(e)}. Please check your API key."
-            )
-        except openai.APIError as e:
-            raise HTTPException(
-                status_code=500,
-                detail=f"OpenAI API error: {str(e)}"
-            )
-        except Exception as e:
-            raise HTTPException(
-                status_code=500,
-                detail=f"Error calling OpenAI API: {str(e)}"
-            )
-    
+        ensure_openai_client("/summarize")
+        return await summarize_stored_document(request.document_id, request.mode)
     except HTTPException:
         raise
     except Exception as e:
@@ -477,10 +1444,113 @@ async def summarize_document(request: SummaryRequest):
         raise HTTPException(status_code=500, detail=f"An unexpected error occurred: {error_details}")
 
 
+@app.post("/summarize/batch")
+async def summarize_documents_batch(request: BatchSummaryRequest):
+    """Summarize several documents concurrently; failures are reported per document."""
+    validate_summary_mode(request.mode)
+    ensure_openai_client("/summarize/batch")
+    
+    semaphore = asyncio.Semaphore(SUMMARY_BATCH_CONCURRENCY)
+    
+    async def summarize_one(document_id: str) -> dict:
+        async with semaphore:
+            try:
+                result = await summarize_stored_document(document_id, request.mode)
+            except HTTPException as e:
+                return {"document_id": document_id, "success": False, "error": e.detail}
+            except Exception as e:
+                print(f"Unexpected error summarizing {document_id}: {e}")
+                return {"document_id": document_id, "success": False, "error": str(e)}
+        return {"document_id": document_id, **result}
+    
+    # Duplicate IDs are summarized once
+    results = await asyncio.gather(*[summarize_one(doc_id) for doc_id in dict.fromkeys(request.document_ids)])
+    return {"results": results}
+
+
 @app.get("/documents")
-async def list_documents():
-    """List all uploaded documents."""
-    return {"documents": list(documents_db.values())}
+async def list_documents(
+    response: Response,
+    limit: int = DOCUMENT_PAGE_SIZE,
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    collection: Optional[str] = None,
+    if_none_match: Optional[str] = Header(None)
+):
+    """List uploaded documents, oldest first, one page at a time.
+    
+    Only metadata is returned (by default id, name, collection, size,
+    chunk_count, upload_date and has_summary; `fields` selects others), from
+    every collection unless `collection` is given. Pass the returned
+    `next_cursor` back as `cursor` for the next page. The ETag changes with
+    every upload, delete or new summary, so unchanged listings are answered
+    with 304 Not Modified.
+    """
+    if not 1 <= limit <= MAX_DOCUMENT_PAGE_SIZE:
+        raise HTTPException(status_code=400, detail=f"limit must be between 1 and {MAX_DOCUMENT_PAGE_SIZE}.")
+    selected = tuple(field.strip() for field in fields.split(",")) if fields else DEFAULT_DOCUMENT_FIELDS
+    unknown = [field for field in selected if field not in DOCUMENT_FIELDS]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}. Use any of: {', '.join(DOCUMENT_FIELDS)}.")
+    
+    await sync_changes()
+    # No awaits below, so the listing matches the change-log position in the ETag
+    etag = f'"docs-{last_change_seq}"'
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers={"ETag": etag, "Cache-Control": "no-cache"})
+    
+    order = ordered_documents()
+    if collection is not None:
+        order = [key for key in order if documents_db[key[1]]["collection"] == collection]
+    start = bisect.bisect_right(order, decode_cursor(cursor)) if cursor else 0
+    page = order[start:start + limit]
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "no-cache"
+    return {
+        "documents": [project_document(documents_db[doc_id], selected) for _, doc_id in page],
+        "total": len(order),
+        "next_cursor": encode_cursor(page[-1]) if start + limit < len(order) else None
+    }
+
+
+@app.get("/documents/{document_id}/content")
+async def get_document_content(
+    document_id: str,
+    response: Response,
+    start: int = 0,
+    end: Optional[int] = None,
+    if_none_match: Optional[str] = Header(None)
+):
+    """Return characters [start, end) of a document (at most MAX_CONTENT_RANGE of them).
+    
+    Offsets are the same character offsets used by query citations. A
+    document's content never changes, so the ETag only depends on the range.
+    """
+    doc = documents_db.get(document_id)
+    if doc is None:
+        raise HTTPException(status_code=404, detail="Document not found.")
+    if end is None:
+        end = start + MAX_CONTENT_RANGE
+    if start < 0 or end < start:
+        raise HTTPException(status_code=400, detail="Invalid range.")
+    end = min(end, start + MAX_CONTENT_RANGE)
+    
+    etag = f'"{doc["content_hash"]}-{start}-{end}"'
+    if etag_matches(if_none_match, etag):
+        return Response(status_code=304, headers={"ETag": etag})
+    
+    result = await asyncio.to_thread(document_store.get_content_range, document_id, start, end)
+    if result is None:
+        raise HTTPException(status_code=404, detail="Document not found.")
+    content, length = result
+    response.headers["ETag"] = etag
+    return {
+        "id": document_id,
+        "start": start,
+        "end": min(end, length),
+        "length": length,
+        "content": content
+    }
 
 
 @app.delete("/documents/{document_id}")
@@ -489,52 +1559,68 @@ async def delete_document(document_id: str):
     if document_id not in documents_db:
         raise HTTPException(status_code=404, detail="Document not found.")
     
-    del documents_db[document_id]
+    await remove_document(document_id)
     return {"success": True, "message": "Document deleted."}
 
 
+@app.get("/collections")
+async def list_collections():
+    """Collections with their document and chunk counts and limits."""
+    counts = {shard.name: [0, 0] for shard in shards}
+    for doc in documents_db.values():
+        count = counts.setdefault(doc["collection"], [0, 0])
+        count[0] += 1
+        count[1] += doc["chunk_count"]
+    return {
+        "collections": [
+            {"name": name, "documents": documents, "chunks": chunks, "limits": shards.limits_for(name).to_dict()}
+            for name, (documents, chunks) in sorted(counts.items())
+        ]
+    }
+
+
 @app.get("/analytics")
 async def get_analytics():
-    """Get usage analytics."""
-    return analytics_db
+    """Get usage analytics (bounded: top and recent questions, latency percentiles)."""
+    return {
+        **analytics_store.snapshot(),
+        "answer_cache": answer_cache.stats(),
+        "coalescing": {"query": query_flights.stats(), "summarize": summary_flights.stats()},
+        "conversations": len(conversation_store),
+    }
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """Latency histograms of all workers in the Prometheus text format."""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/health/live")
+async def liveness_probe():
+    """Liveness probe: the event loop is serving requests."""
+    return {"status": "alive"}
+
+
+@app.get("/health/ready")
+async def readiness_probe(response: Response):
+    """Readiness probe: 200 once warm-up has finished, 503 before (or if it failed)."""
+    if is_ready():
+        return {"status": "ready"}
+    response.status_code = 503
+    return {"status": "starting" if warmup_task is None or not warmup_task.done() else "failed"}
 
 
 @app.get("/health")
 async def health_check():
-    """Health check endpoint."""
-    global client
-    
-    # Try to get API key from multiple sources
-    openai_api_key = (
-        os.environ.get("OPENAI_API_KEY") or
-        os.environ.get("openai_api_key") or
-        os.environ.get("OPENAI_KEY") or
-        os.environ.get("openai_key")
-    )
-    
-    # Try to reinitialize client if not set
-    if not client and openai_api_key:
-        print("Attempting to reinitialize OpenAI client from /health endpoint...")
-        client = get_openai_client()
-    
-    client_status = "configured" if client else "not configured"
-    api_key_present = "yes" if openai_api_key else "no"
-    api_key_preview = openai_api_key[:10] + "..." if openai_api_key and len(openai_api_key) > 10 else "not set"
-    
-    # Check all environment variables for debugging
-    all_env_keys = list(os.environ.keys())
-    openai_related_keys = [k for k in all_env_keys if 'OPENAI' in k.upper() or 'API' in k.upper()]
-    
+    """Health check endpoint (reports configuration, never the key itself)."""
     return {
         "status": "healthy",
+        "ready": is_ready(),
         "documents_count": len(documents_db),
-        "total_queries": analytics_db["total_queries"],
-        "openai_client": client_status,
-        "openai_api_key_present": api_key_present,
-        "openai_api_key_preview": api_key_preview,
-        "openai_api_key_length": len(openai_api_key) if openai_api_key else 0,
-        "env_vars_with_openai_or_api": openai_related_keys,
-        "total_env_vars": len(all_env_keys)
+        "total_queries": analytics_store.total_queries(),
+        "openai_client": "configured" if openai_api_key else "not configured",
+        "openai_api_key_present": "yes" if openai_api_key else "no",
     }
 
 
@@ -547,7 +1633,7 @@ if os.path.exists(static_dir):
     async def serve_frontend(full_path: str):
         """Serve the React frontend."""
         # API routes should not be caught here
-        if full_path.startswith(("api", "upload", "query", "summarize", "documents", "analytics", "health")):
+        if full_path.startswith(("api", "upload", "query", "summarize", "documents", "analytics", "health", "jobs", "metrics", "collections")):
             raise HTTPException(status_code=404, detail="Not found")
         
         file_path = os.path.join(static_dir, full_path)
@@ -0,0 +1,154 @@
+import threading
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from db import connect, transaction
+
+
+# Seconds; chosen to separate sub-millisecond index work from multi-second LLM calls
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+class Histogram:
+    """Prometheus-style histogram with one label (e.g. `stage`)."""
+
+    def __init__(self, name: str, documentation: str, label: str, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.label = label
+        self.buckets = tuple(buckets)
+        # label value -> (per-bucket counts with a final +Inf bucket, sum of observations)
+        self.pending: Dict[str, Tuple[List[int], float]] = {}
+
+    def observe(self, label_value: str, seconds: float) -> None:
+        counts, total = self.pending.get(label_value) or ([0] * (len(self.buckets) + 1), 0.0)
+        index = next((i for i, bound in enumerate(self.buckets) if seconds <= bound), len(self.buckets))
+        counts[index] += 1
+        self.pending[label_value] = (counts, total + seconds)
+
+
+class MetricsRegistry:
+    """Histograms for /metrics, merged across worker processes through SQLite.
+
+    Observations are kept in memory and added to the shared `metrics_buckets`
+    table on `flush()` (the server flushes periodically and before every
+    scrape), so a scrape of any worker reports the totals of all of them.
+    """
+
+    def __init__(self, path: str):
+        self._lock = threading.Lock()
+        self.histograms: Dict[str, Histogram] = {}
+        self.conn = connect(path)
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS metrics_buckets (
+                name TEXT NOT NULL,
+                label TEXT NOT NULL,
+                bucket INTEGER NOT NULL,
+                count INTEGER NOT NULL,
+                PRIMARY KEY (name, label, bucket)
+            ) WITHOUT ROWID;
+            CREATE TABLE IF NOT EXISTS metrics_sums (
+                name TEXT NOT NULL,
+                label TEXT NOT NULL,
+                sum REAL NOT NULL,
+                PRIMARY KEY (name, label)
+            ) WITHOUT ROWID;
+        """)
+
+    def close(self) -> None:
+        self.flush()
+        self.conn.close()
+
+    def histogram(self, name: str, documentation: str, label: str, buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        histogram = Histogram(name, documentation, label, buckets)
+        self.histograms[name] = histogram
+        return histogram
+
+    def observe(self, histogram: Histogram, label_value: str, seconds: float) -> None:
+        with self._lock:
+            histogram.observe(label_value, seconds)
+
+    def flush(self) -> None:
+        """Add this worker's pending observations to the shared tables."""
+        with self._lock:
+            pending = [(histogram, histogram.pending) for histogram in self.histograms.values() if histogram.pending]
+            if not pending:
+                return
+            with transaction(self.conn):
+                for histogram, values in pending:
+                    for label_value, (counts, total) in values.items():
+                        self.conn.executemany(
+                            "INSERT INTO metrics_buckets (name, label, bucket, count) VALUES (?, ?, ?, ?)"
+                            " ON CONFLICT(name, label, bucket) DO UPDATE SET count = count + excluded.count",
+                            ((histogram.name, label_value, index, count) for index, count in enumerate(counts) if count),
+                        )
+                        self.conn.execute(
+                            "INSERT INTO metrics_sums (name, label, sum) VALUES (?, ?, ?)"
+                            " ON CONFLICT(name, label) DO UPDATE SET sum = sum + excluded.sum",
+                            (histogram.name, label_value, total),
+                        )
+            for histogram, _ in pending:
+                histogram.pending = {}
+
+    def render(self) -> str:
+        """All histograms in the Prometheus text exposition format."""
+        self.flush()
+        lines = []
+        for histogram in self.histograms.values():
+            lines.append(f"# HELP {histogram.name} {histogram.documentation}")
+            lines.append(f"# TYPE {histogram.name} histogram")
+            sums = dict(self.conn.execute("SELECT label, sum FROM metrics_sums WHERE name = ? ORDER BY label", (histogram.name,)))
+            counts: Dict[str, List[int]] = {label: [0] * (len(histogram.buckets) + 1) for label in sums}
+            for label, bucket, count in self.conn.execute(
+                "SELECT label, bucket, count FROM metrics_buckets WHERE name = ?", (histogram.name,)
+            ):
+                if label in counts and bucket < len(counts[label]):
+                    counts[label][bucket] = count
+            for label, bucket_counts in counts.items():
+                selector = f'{histogram.label}="{_escape(label)}"'
+                cumulative = 0
+                for bound, count in zip(histogram.buckets + (float("inf"),), bucket_counts):
+                    cumulative += count
+                    le = "+Inf" if bound == float("inf") else repr(float(bound))
+                    lines.append(f'{histogram.name}_bucket{{{selector},le="{le}"}} {cumulative}')
+                lines.append(f"{histogram.name}_sum{{{selector}}} {sums[label]}")
+                lines.append(f"{histogram.name}_count{{{selector}}} {cumulative}")
+        return "\n".join(lines) + "\n"
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class StageTimer:
+    """Monotonic per-stage timings for one request.
+
+    Time spent in a stage is accumulated (a stage can be entered many times,
+    e.g. once per upload block) and reported to `histogram` by `finish()`.
+    """
+
+    def __init__(self, registry: MetricsRegistry, histogram: Histogram):
+        self.registry = registry
+        self.histogram = histogram
+        self.stages: Dict[str, float] = {}
+
+    @contextmanager
+    def stage(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start)
+
+    def add(self, name: str, seconds: float) -> None:
+        self.stages[name] = self.stages.get(name, 0.0) + seconds
+
+    def finish(self) -> None:
+        for name, seconds in self.stages.items():
+            self.registry.observe(self.histogram, name, seconds)
+
+    def server_timing(self, stages: Optional[Sequence[str]] = None) -> str:
+        """Server-Timing header value, durations in milliseconds."""
+        names = stages if stages is not None else list(self.stages)
+        return ", ".join(f"{name};dur={self.stages[name] * 1000:.1f}" for name in names if name in self.stages)
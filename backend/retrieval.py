@@ -0,0 +1,154 @@
+import asyncio
+import importlib.util
+import re
+import time
+from abc import ABC, abstractmethod
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from search_index import ChunkKey
+
+
+_WORD_RE = re.compile(r"\w+")
+
+SEARCH_BACKENDS = ("bm25", "vector", "hybrid")
+RERANKERS = ("none", "overlap", "cross-encoder")
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[ChunkKey]], k: int = 60) -> List[Tuple[ChunkKey, float]]:
+    """Merge ranked lists with RRF: score = sum of 1 / (k + rank) over the lists.
+
+    Only ranks are used, so BM25 and cosine scores need no normalisation.
+    Ties keep the order in which chunks were first seen.
+    """
+    scores: Dict[ChunkKey, float] = {}
+    for ranking in rankings:
+        for rank, key in enumerate(ranking, start=1):
+            scores[key] = scores.get(key, 0.0) + 1.0 / (k + rank)
+    fused = sorted(scores.items(), key=lambda item: -item[1])
+    return [(key, round(score, 6)) for key, score in fused]
+
+
+async def run_stages(stages: Dict[str, Callable[[], list]], budget: float) -> Tuple[Dict[str, list], Dict[str, float]]:
+    """Run candidate stages concurrently in worker threads, within `budget` seconds.
+
+    Returns the results of the stages that finished in time and every
+    stage's duration (the budget, for stages that overran). If no stage
+    finishes within the budget, the first one to finish is waited for so
+    there is always something to return.
+    """
+    durations: Dict[str, float] = {}
+    if not stages:
+        return {}, durations
+    # Written by the stage threads, including ones still running after we return
+    measured: Dict[str, float] = {}
+
+    def timed(name: str, stage: Callable[[], list]) -> list:
+        start = time.perf_counter()
+        try:
+            return stage()
+        finally:
+            measured[name] = time.perf_counter() - start
+
+    tasks = {asyncio.ensure_future(asyncio.to_thread(timed, name, stage)): name for name, stage in stages.items()}
+    done, pending = await asyncio.wait(tasks, timeout=budget)
+    if not done and pending:
+        done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+    durations.update(measured)
+    for task in pending:
+        name = tasks[task]
+        durations.setdefault(name, budget)
+        print(f"Retrieval stage '{name}' exceeded its {budget * 1000:.0f} ms budget; using the other results")
+        # The thread cannot be interrupted; its result is simply dropped
+        task.add_done_callback(lambda t: t.cancelled() or t.exception())
+
+    results = {}
+    for task in done:
+        if task.exception() is not None:
+            print(f"Retrieval stage '{tasks[task]}' failed: {task.exception()}")
+            continue
+        results[tasks[task]] = task.result()
+    return results, durations
+
+
+# -----------------------------
+# Re-rankers
+# -----------------------------
+class Reranker(ABC):
+    """Scores (query, chunk text) pairs; higher is more relevant."""
+
+    name = "base"
+
+    @abstractmethod
+    def score(self, query: str, texts: Sequence[str]) -> List[float]:
+        """One score per text, in order."""
+
+
+class OverlapReranker(Reranker):
+    """Cheap lexical re-ranker: query-term coverage plus a bonus for terms close together.
+
+    Unlike BM25 over whitespace tokens it ignores punctuation and rewards
+    chunks that contain most of the query's words in one short window.
+    """
+
+    name = "overlap"
+
+    def score(self, query: str, texts: Sequence[str]) -> List[float]:
+        terms = set(_WORD_RE.findall(query.lower()))
+        if not terms:
+            return [0.0] * len(texts)
+        scores = []
+        for text in texts:
+            words = _WORD_RE.findall(text.lower())
+            positions = [i for i, word in enumerate(words) if word in terms]
+            matched = {words[i] for i in positions}
+            coverage = len(matched) / len(terms)
+            scores.append(coverage + 0.5 * coverage * self._proximity(words, positions, len(matched)))
+        return scores
+
+    @staticmethod
+    def _proximity(words: List[str], positions: List[int], distinct: int) -> float:
+        """1 / length of the shortest window holding every matched term (0..1]."""
+        if distinct < 2:
+            return 0.0
+        best = len(words)
+        seen: Dict[str, int] = {}
+        left = 0
+        for right, position in enumerate(positions):
+            seen[words[position]] = seen.get(words[position], 0) + 1
+            while len(seen) == distinct:
+                best = min(best, position - positions[left] + 1)
+                word = words[positions[left]]
+                seen[word] -= 1
+                if not seen[word]:
+                    del seen[word]
+                left += 1
+        return distinct / best
+
+
+class CrossEncoderReranker(Reranker):
+    """Local cross-encoder (sentence-transformers), loaded on first use."""
+
+    def __init__(self, model: str = "cross-encoder/ms-marco-MiniLM-L-6-v2"):
+        self.model_name = model
+        self.name = f"cross-encoder-{model}"
+        self._model = None
+
+    def score(self, query: str, texts: Sequence[str]) -> List[float]:
+        if self._model is None:
+            from sentence_transformers import CrossEncoder
+            self._model = CrossEncoder(self.model_name, device="cpu")
+        return [float(score) for score in self._model.predict([(query, text) for text in texts])]
+
+
+def build_reranker(kind: str, model: Optional[str] = None) -> Optional[Reranker]:
+    """Create the re-ranker selected by the RERANKER setting ("none" disables it)."""
+    if kind == "overlap":
+        return OverlapReranker()
+    if kind == "cross-encoder":
+        if importlib.util.find_spec("sentence_transformers") is None:
+            print("WARNING: RERANKER=cross-encoder needs the sentence-transformers package; re-ranking disabled.")
+            return None
+        return CrossEncoderReranker(model) if model else CrossEncoderReranker()
+    if kind != "none":
+        print(f"WARNING: Unknown RERANKER '{kind}' (use one of: {', '.join(RERANKERS)}); re-ranking disabled.")
+    return None
@@ -0,0 +1,122 @@
+import heapq
+import math
+from collections import Counter
+from typing import Dict, Iterable, List, Tuple
+
+
+# A chunk is addressed by the document it belongs to and its position in it
+ChunkKey = Tuple[str, int]
+
+
+def tokenize(text: str) -> List[str]:
+    """Split text into lowercase terms (same rules the search has always used)."""
+    return text.lower().split()
+
+
+class InvertedIndex:
+    """Token -> posting-list index over document chunks, ranked with BM25.
+
+    Chunks are indexed once when a document is uploaded and removed again
+    when it is deleted. Term frequencies, document frequencies and chunk
+    lengths are maintained incrementally on both paths, so a query only has
+    to touch the posting lists of its own terms.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        # term -> {chunk: term frequency in that chunk}
+        self.postings: Dict[str, Dict[ChunkKey, int]] = {}
+        # doc_id -> chunk keys belonging to it
+        self.doc_chunks: Dict[str, List[ChunkKey]] = {}
+        # chunk -> number of terms (length normalisation) and distinct terms (removal)
+        self.chunk_lengths: Dict[ChunkKey, int] = {}
+        self.chunk_terms: Dict[ChunkKey, Tuple[str, ...]] = {}
+        # Insertion order, used to keep ties in upload order
+        self.chunk_order: Dict[ChunkKey, int] = {}
+        self.total_length = 0
+        self._next_order = 0
+
+    def __len__(self) -> int:
+        return len(self.chunk_lengths)
+
+    @property
+    def avg_chunk_length(self) -> float:
+        return self.total_length / len(self.chunk_lengths) if self.chunk_lengths else 0.0
+
+    def add_document(self, doc_id: str, chunks: Iterable[str]) -> None:
+        """Index every chunk of a document."""
+        if doc_id in self.doc_chunks:
+            self.remove_document(doc_id)
+        for position, chunk in enumerate(chunks):
+            self.add_chunk(doc_id, position, chunk)
+
+    def add_chunk(self, doc_id: str, position: int, chunk: str) -> None:
+        """Index one chunk; lets uploads be indexed while they are still being read."""
+        self.add_chunk_terms(doc_id, position, Counter(tokenize(chunk)))
+
+    def add_chunk_terms(self, doc_id: str, position: int, counts: Dict[str, int]) -> None:
+        """Index one chunk from precomputed term counts (e.g. from an ingestion worker process)."""
+        key = (doc_id, position)
+        length = sum(counts.values())
+        for term, tf in counts.items():
+            self.postings.setdefault(term, {})[key] = tf
+        self.chunk_lengths[key] = length
+        self.chunk_terms[key] = tuple(counts)
+        self.chunk_order[key] = self._next_order
+        self.total_length += length
+        self._next_order += 1
+        self.doc_chunks.setdefault(doc_id, []).append(key)
+
+    def remove_document(self, doc_id: str) -> None:
+        """Drop a document's chunks and roll back their term statistics."""
+        for key in self.doc_chunks.pop(doc_id, []):
+            for term in self.chunk_terms.pop(key, ()):
+                posting = self.postings.get(term)
+                if posting is None:
+                    continue
+                posting.pop(key, None)
+                if not posting:
+                    del self.postings[term]
+            self.total_length -= self.chunk_lengths.pop(key, 0)
+            self.chunk_order.pop(key, None)
+
+    def idf(self, term: str) -> float:
+        """BM25 inverse document frequency (always positive)."""
+        n = len(self.chunk_lengths)
+        df = len(self.postings.get(term, ()))
+        return math.log(1 + (n - df + 0.5) / (df + 0.5))
+
+    def search(self, query: str, top_k: int = 5) -> List[Tuple[ChunkKey, float]]:
+        """Return the top_k chunks by BM25 score against the query terms.
+
+        Safe to run in a worker thread while the event loop keeps indexing:
+        posting lists are copied before they are walked and chunks removed
+        meanwhile are skipped.
+        """
+        if not self.chunk_lengths or top_k <= 0:
+            return []
+
+        k1, b = self.k1, self.b
+        avgdl = self.avg_chunk_length or 1.0
+        chunk_lengths = self.chunk_lengths
+        scores: Dict[ChunkKey, float] = {}
+        for term in set(tokenize(query)):
+            posting = self.postings.get(term)
+            if not posting:
+                continue
+            idf = self.idf(term)
+            for key, tf in list(posting.items()):
+                length = chunk_lengths.get(key)
+                if length is None:
+                    continue
+                norm = k1 * (1 - b + b * length / avgdl)
+                scores[key] = scores.get(key, 0.0) + idf * tf * (k1 + 1) / (tf + norm)
+
+        # Heap selection instead of sorting every scored chunk
+        best = heapq.nsmallest(
+            top_k,
+            scores.items(),
+            key=lambda item: (-item[1], self.chunk_order.get(item[0], 0)),
+        )
+        return [(key, round(score, 4)) for key, score in best]
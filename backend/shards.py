@@ -0,0 +1,121 @@
+import json
+import os
+import re
+import threading
+from typing import Dict, Iterator, Optional
+
+from search_index import InvertedIndex
+from vector_store import Embedder, VectorStore
+
+
+DEFAULT_COLLECTION = "default"
+EVICTION_POLICIES = ("reject", "oldest")
+
+_NAME_RE = re.compile(r"[A-Za-z0-9][A-Za-z0-9_.-]{0,63}")
+
+
+def valid_collection_name(name: str) -> bool:
+    """Collection names double as directory names: letters, digits, '_', '.', '-'."""
+    return _NAME_RE.fullmatch(name) is not None
+
+
+class CollectionLimits:
+    """Size caps for one collection; 0 means unlimited.
+
+    `max_chunks` bounds the shard's in-memory index. When an upload would
+    exceed a cap, `eviction` decides: "reject" the upload, or delete the
+    collection's "oldest" documents until it fits.
+    """
+
+    def __init__(self, max_documents: int = 0, max_chunks: int = 0, eviction: str = "reject"):
+        if eviction not in EVICTION_POLICIES:
+            raise ValueError(f"Unknown eviction policy '{eviction}'. Use one of: {', '.join(EVICTION_POLICIES)}.")
+        self.max_documents = max_documents
+        self.max_chunks = max_chunks
+        self.eviction = eviction
+
+    def to_dict(self) -> dict:
+        return {"max_documents": self.max_documents, "max_chunks": self.max_chunks, "eviction": self.eviction}
+
+
+def parse_collection_limits(raw: str, default: CollectionLimits) -> Dict[str, CollectionLimits]:
+    """Parse COLLECTION_LIMITS: a JSON object of collection name -> limits.
+
+    Fields left out fall back to `default`, e.g.
+    {"support": {"max_documents": 500, "eviction": "oldest"}}.
+    """
+    if not raw.strip():
+        return {}
+    limits = {}
+    for name, values in json.loads(raw).items():
+        limits[name] = CollectionLimits(
+            max_documents=int(values.get("max_documents", default.max_documents)),
+            max_chunks=int(values.get("max_chunks", default.max_chunks)),
+            eviction=values.get("eviction", default.eviction),
+        )
+    return limits
+
+
+class Shard:
+    """One collection's indexes: BM25 over its chunks and its own vector store."""
+
+    def __init__(self, name: str, index: InvertedIndex, vectors: VectorStore):
+        self.name = name
+        self.index = index
+        self.vectors = vectors
+
+
+class ShardRegistry:
+    """Index shards keyed by collection name, created on first use.
+
+    The default collection keeps its vectors in `directory` itself, so
+    indexes built before collections existed are picked up unchanged;
+    other collections use `directory/collections/<name>`.
+    """
+
+    def __init__(self, directory: str, embedder: Embedder, limits: Optional[Dict[str, CollectionLimits]] = None,
+                 default_limits: Optional[CollectionLimits] = None):
+        self.directory = directory
+        self.embedder = embedder
+        self.limits = limits or {}
+        self.default_limits = default_limits or CollectionLimits()
+        self._shards: Dict[str, Shard] = {}
+        self._lock = threading.Lock()
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._shards
+
+    def __iter__(self) -> Iterator[Shard]:
+        return iter(list(self._shards.values()))
+
+    def __len__(self) -> int:
+        return len(self._shards)
+
+    def get(self, name: str) -> Shard:
+        """The collection's shard, creating (or loading from disk) it if needed."""
+        shard = self._shards.get(name)
+        if shard is not None:
+            return shard
+        with self._lock:
+            if name not in self._shards:
+                if name == DEFAULT_COLLECTION:
+                    directory = self.directory
+                else:
+                    directory = os.path.join(self.directory, "collections", name)
+                self._shards[name] = Shard(name, InvertedIndex(), VectorStore(directory, self.embedder))
+            return self._shards[name]
+
+    def find(self, name: str) -> Optional[Shard]:
+        return self._shards.get(name)
+
+    def limits_for(self, name: str) -> CollectionLimits:
+        return self.limits.get(name, self.default_limits)
+
+    def refresh(self) -> None:
+        """Re-map vector stores that another worker process has written."""
+        for shard in self:
+            shard.vectors.refresh()
+
+    def warm(self) -> None:
+        for shard in self:
+            shard.vectors.warm()
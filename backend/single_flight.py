@@ -0,0 +1,48 @@
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Tuple
+
+
+class SingleFlight:
+    """Coalesces concurrent async calls that share a key into one call.
+
+    The first caller for a key starts `factory()` as a task; callers arriving
+    while it runs wait for the same task and get its result (or exception).
+    The call runs as its own task, so a caller that disconnects does not
+    cancel it for the others. Nothing is kept once the call finishes; repeat
+    requests after that are the caches' job.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._calls: Dict[str, asyncio.Task] = {}
+        self.calls = 0
+        self.coalesced = 0
+
+    def __len__(self) -> int:
+        return len(self._calls)
+
+    async def run(self, key: str, factory: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """Return (result, coalesced): coalesced is True if another caller's call was shared."""
+        task = self._calls.get(key)
+        coalesced = task is not None
+        if coalesced:
+            self.coalesced += 1
+        else:
+            task = asyncio.ensure_future(factory())
+            self._calls[key] = task
+            self.calls += 1
+            task.add_done_callback(lambda t: self._finished(key, t))
+        return await asyncio.shield(task), coalesced
+
+    def _finished(self, key: str, task: asyncio.Task) -> None:
+        if self._calls.get(key) is task:
+            del self._calls[key]
+        # Mark the exception as retrieved in case every caller went away
+        task.cancelled() or task.exception()
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": len(self._calls),
+            "calls": self.calls,
+            "coalesced": self.coalesced,
+        }
@@ -0,0 +1,430 @@
+import hashlib
+import json
+import os
+import re
+import threading
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from search_index import ChunkKey
+
+try:
+    import fcntl
+except ImportError:  # Windows: single-process use only
+    fcntl = None
+
+
+_WORD_RE = re.compile(r"\w+")
+
+
+# -----------------------------
+# Embedders
+# -----------------------------
+class Embedder(ABC):
+    """Turns texts into L2-normalised float32 vectors of a fixed dimension."""
+
+    name = "base"
+    dim = 0
+
+    @abstractmethod
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        """One row per text, in order."""
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (vectors / norms).astype(np.float32, copy=False)
+
+
+class HashingEmbedder(Embedder):
+    """Deterministic feature-hashing embedder that works fully offline.
+
+    Each word (and each adjacent word pair) is hashed into one of `dim`
+    buckets with a +/-1 sign. It is no substitute for a learned model but it
+    is stable across processes, so it can be used for tests and as a
+    zero-cost default.
+    """
+
+    def __init__(self, dim: int = 384):
+        self.dim = dim
+        self.name = f"hashing-{dim}"
+
+    def _bucket(self, feature: str) -> Tuple[int, float]:
+        digest = int.from_bytes(hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest(), "little")
+        return digest % self.dim, (1.0 if digest >> 63 else -1.0)
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            words = _WORD_RE.findall(text.lower())
+            features = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+            for feature in features:
+                bucket, sign = self._bucket(feature)
+                vectors[row, bucket] += sign
+        return _normalize(vectors)
+
+
+class OpenAIEmbedder(Embedder):
+    """Embeds texts with the OpenAI embeddings API."""
+
+    def __init__(self, get_client: Callable[[], object], model: str = "text-embedding-3-small", dim: int = 1536):
+        self.get_client = get_client
+        self.model = model
+        self.dim = dim
+        self.name = f"openai-{model}-{dim}"
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        client = self.get_client()
+        if client is None:
+            raise RuntimeError("OpenAI client not configured; cannot compute embeddings.")
+        response = client.embeddings.create(model=self.model, input=list(texts), dimensions=self.dim)
+        vectors = np.array([item.embedding for item in response.data], dtype=np.float32)
+        return _normalize(vectors)
+
+
+def build_embedder(kind: str, get_client: Callable[[], object]) -> Embedder:
+    """Create the embedder selected by the EMBEDDER setting."""
+    if kind == "openai":
+        return OpenAIEmbedder(get_client, model=os.environ.get("EMBEDDING_MODEL", "text-embedding-3-small"))
+    return HashingEmbedder(int(os.environ.get("EMBEDDING_DIM", 384)))
+
+
+# -----------------------------
+# Vector store
+# -----------------------------
+class VectorStore:
+    """Chunk embeddings in one contiguous, memory-mapped float32 matrix.
+
+    Rows are appended at upload time and tombstoned on delete; once the share
+    of dead rows passes `compact_ratio` the matrix is rewritten without them.
+    The matrix and its row -> chunk mapping live in `directory`, so a restart
+    maps the existing file instead of re-embedding anything.
+
+    The mapping is an append-only log (`vectors.log`, one JSON record per
+    added or removed document) next to a small header (`vectors.json`), so
+    an add or remove costs one appended line however large the index is.
+    Only compaction rewrites the files.
+
+    Several worker processes can share one directory: writes take an
+    exclusive file lock and start from the latest on-disk state, and
+    `refresh()` replays the records another process has appended since.
+    """
+
+    def __init__(self, directory: str, embedder: Embedder, compact_ratio: float = 0.25, batch_size: int = 64):
+        self.directory = directory
+        self.embedder = embedder
+        self.compact_ratio = compact_ratio
+        self.batch_size = batch_size
+        self.matrix_path = os.path.join(directory, "vectors.f32")
+        self.meta_path = os.path.join(directory, "vectors.json")
+        self.log_path = os.path.join(directory, "vectors.log")
+        self.lock_path = os.path.join(directory, "vectors.lock")
+        # Guards the in-memory state against searches running in worker threads
+        self._state_lock = threading.RLock()
+
+        self._reset()
+        os.makedirs(directory, exist_ok=True)
+        self._load()
+        if self.count:
+            print(f"✓ Loaded vector index: {len(self)} vectors from {self.directory}")
+
+    def _reset(self) -> None:
+        self.matrix: Optional[np.memmap] = None
+        self.capacity = 0
+        self.count = 0
+        self.keys: List[Optional[ChunkKey]] = []
+        self.alive = np.zeros(0, dtype=bool)
+        self.doc_rows: Dict[str, List[int]] = {}
+        self._signature = None
+        # Bytes of vectors.log already applied
+        self._log_offset = 0
+        # Set when the files on disk are missing, unreadable or for another embedder
+        self._stale = False
+
+    def __len__(self) -> int:
+        return len(self.keys) - self.tombstones
+
+    @property
+    def tombstones(self) -> int:
+        return int(self.count - self.alive[:self.count].sum())
+
+    # -- persistence -------------------------------------------------
+    def _files_signature(self) -> Optional[Tuple[int, int, int]]:
+        """Identity of the header and log files; it changes only when they are rewritten."""
+        try:
+            meta = os.stat(self.meta_path)
+            log = os.stat(self.log_path)
+        except FileNotFoundError:
+            return None
+        return (meta.st_ino, meta.st_mtime_ns, log.st_ino)
+
+    @contextmanager
+    def _exclusive(self):
+        """Hold the cross-process write lock, starting from the latest on-disk state."""
+        with open(self.lock_path, "a") as lock_file:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                with self._state_lock:
+                    self.refresh()
+                    if self._stale:
+                        self._rewrite_log()
+                    yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def warm(self) -> None:
+        """Read the mapped matrix once so the first searches don't fault it in from disk."""
+        with self._state_lock:
+            if self.count:
+                np.add.reduce(self.matrix[:self.count], axis=None)
+
+    def refresh(self) -> bool:
+        """Catch up with writes another process has made since we last looked.
+
+        Appended log records are replayed; a rewritten index (compaction,
+        embedder change) is re-loaded from scratch.
+        """
+        if not self._changed():
+            return False
+        with self._state_lock:
+            # A write from this process may have caught us up in the meantime
+            signature = self._files_signature()
+            if signature != self._signature:
+                self._release()
+                self._reset()
+                self._load()
+            elif self._changed():
+                self._read_log()
+            else:
+                return False
+        return True
+
+    def _changed(self) -> bool:
+        signature = self._files_signature()
+        if signature != self._signature:
+            return True
+        if signature is None or self._stale:
+            # The log on disk is not ours to replay until the next write rewrites it
+            return False
+        try:
+            return os.path.getsize(self.log_path) > self._log_offset
+        except FileNotFoundError:
+            return True
+
+    def _load(self) -> None:
+        if not os.path.exists(self.meta_path) or not os.path.exists(self.matrix_path):
+            # Nothing usable on disk: the first write starts a new index
+            self._stale = True
+            return
+        self._signature = self._files_signature()
+        try:
+            with open(self.meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"WARNING: Could not read vector index metadata, starting empty: {e}")
+            self._stale = True
+            return
+        if meta.get("embedder") != self.embedder.name or meta.get("dim") != self.embedder.dim:
+            print(f"Vector index was built with {meta.get('embedder')}, now using {self.embedder.name}; rebuilding.")
+            self._stale = True
+            return
+
+        self.capacity = os.path.getsize(self.matrix_path) // (4 * self.embedder.dim)
+        self.matrix = self._map(self.capacity)
+        self.alive = np.zeros(self.capacity, dtype=bool)
+        self._read_log()
+
+    def _read_log(self) -> None:
+        """Apply the complete records appended to the log since the last read."""
+        try:
+            with open(self.log_path, "rb") as f:
+                f.seek(self._log_offset)
+                data = f.read()
+        except FileNotFoundError:
+            return
+        # A writer may be half-way through a line; leave it for the next read
+        end = data.rfind(b"\n") + 1
+        for line in data[:end].splitlines():
+            if line.strip():
+                self._apply(json.loads(line))
+        self._log_offset += end
+
+    def _apply(self, record: dict) -> None:
+        if "add" in record:
+            doc_id, start, chunk_count = record["add"], record["row"], record["count"]
+            if start + chunk_count > self.capacity:
+                # Another process grew the matrix file
+                self._release()
+                self.capacity = os.path.getsize(self.matrix_path) // (4 * self.embedder.dim)
+                self.matrix = self._map(self.capacity)
+                self._grow_alive(self.capacity)
+                if start + chunk_count > self.capacity:
+                    print(f"WARNING: Vector index file is shorter than its log, skipping '{doc_id}'.")
+                    return
+            if len(self.keys) < start:
+                self.keys.extend([None] * (start - len(self.keys)))
+            self.keys[start:start + chunk_count] = [(doc_id, position) for position in range(chunk_count)]
+            self.alive[start:start + chunk_count] = True
+            self.doc_rows[doc_id] = list(range(start, start + chunk_count))
+            self.count = len(self.keys)
+        elif "remove" in record:
+            rows = self.doc_rows.pop(record["remove"], None)
+            if rows:
+                for row in rows:
+                    self.keys[row] = None
+                self.alive[rows] = False
+
+    def _append_log(self, record: dict) -> None:
+        line = (json.dumps(record) + "\n").encode("utf-8")
+        with open(self.log_path, "ab") as f:
+            f.write(line)
+        self._apply(record)
+        self._log_offset += len(line)
+
+    def _rewrite_log(self) -> None:
+        """Write the header and a fresh log describing the current rows."""
+        records = [
+            {"add": doc_id, "row": rows[0], "count": len(rows)}
+            for doc_id, rows in sorted(self.doc_rows.items(), key=lambda item: item[1][0])
+        ]
+        tmp_path = self.log_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for record in records:
+                f.write(json.dumps(record) + "\n")
+        os.replace(tmp_path, self.log_path)
+        self._log_offset = os.path.getsize(self.log_path)
+
+        meta = {"embedder": self.embedder.name, "dim": self.embedder.dim}
+        tmp_path = self.meta_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, self.meta_path)
+        self._signature = self._files_signature()
+        self._stale = False
+
+    def _map(self, capacity: int) -> Optional[np.memmap]:
+        if capacity == 0:
+            return None
+        return np.memmap(self.matrix_path, dtype=np.float32, mode="r+", shape=(capacity, self.embedder.dim))
+
+    def _release(self) -> None:
+        if self.matrix is not None:
+            self.matrix.flush()
+            self.matrix = None
+
+    def _grow_alive(self, capacity: int) -> None:
+        alive = np.zeros(capacity, dtype=bool)
+        alive[:len(self.alive)] = self.alive
+        self.alive = alive
+
+    def _ensure_capacity(self, rows: int) -> None:
+        if rows <= self.capacity:
+            return
+        new_capacity = max(rows, self.capacity * 2, 1024)
+        self._release()
+        with open(self.matrix_path, "ab") as f:
+            f.truncate(new_capacity * self.embedder.dim * 4)
+        self.capacity = new_capacity
+        self.matrix = self._map(new_capacity)
+        self._grow_alive(new_capacity)
+
+    # -- mutation ----------------------------------------------------
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        """Embed texts in batches of `batch_size`."""
+        if not texts:
+            return np.zeros((0, self.embedder.dim), dtype=np.float32)
+        batches = [
+            self.embedder.embed(texts[start:start + self.batch_size])
+            for start in range(0, len(texts), self.batch_size)
+        ]
+        return np.vstack(batches)
+
+    def add_document(self, doc_id: str, chunks: Sequence[str]) -> None:
+        """Embed and append every chunk of a document (no-op if it is already stored)."""
+        chunks = list(chunks)
+        if not chunks or doc_id in self.doc_rows:
+            return
+
+        self.add_vectors(doc_id, self.embed(chunks))
+
+    def add_vectors(self, doc_id: str, vectors: np.ndarray) -> None:
+        """Append precomputed embeddings for a document's chunks, in chunk order."""
+        if not len(vectors):
+            return
+        with self._exclusive():
+            # Another worker may have added it while we were embedding
+            if doc_id not in self.doc_rows:
+                self._append(doc_id, vectors)
+
+    def _append(self, doc_id: str, vectors: np.ndarray) -> None:
+        chunk_count = len(vectors)
+        start = self.count
+        self._ensure_capacity(start + chunk_count)
+        self.matrix[start:start + chunk_count] = vectors
+        self.matrix.flush()
+        # Rows are on disk before the record that makes them visible
+        self._append_log({"add": doc_id, "row": start, "count": chunk_count})
+
+    def remove_document(self, doc_id: str) -> None:
+        """Tombstone a document's rows, compacting once enough are dead."""
+        with self._exclusive():
+            if doc_id not in self.doc_rows:
+                return
+            self._append_log({"remove": doc_id})
+            if self.tombstones > self.compact_ratio * self.count:
+                self._compact()
+
+    def compact(self) -> None:
+        """Rewrite the matrix with only live rows."""
+        with self._exclusive():
+            self._compact()
+
+    def _compact(self) -> None:
+        live = np.flatnonzero(self.alive[:self.count])
+        data = np.array(self.matrix[live]) if self.matrix is not None else np.zeros((0, self.embedder.dim), np.float32)
+        self._release()
+
+        tmp_path = self.matrix_path + ".tmp"
+        data.tofile(tmp_path)
+        os.replace(tmp_path, self.matrix_path)
+
+        self.keys = [self.keys[row] for row in live]
+        self.count = self.capacity = len(self.keys)
+        self.alive = np.ones(self.count, dtype=bool)
+        self.doc_rows = {}
+        for row, key in enumerate(self.keys):
+            self.doc_rows.setdefault(key[0], []).append(row)
+        self.matrix = self._map(self.capacity)
+        self._rewrite_log()
+
+    # -- query -------------------------------------------------------
+    def search(self, query: str, top_k: int = 5) -> List[Tuple[ChunkKey, float]]:
+        """Return the top_k live chunks by cosine similarity to the query.
+
+        Works on a snapshot of the matrix and row mapping, so it can run in a
+        worker thread while the event loop appends or removes documents.
+        """
+        with self._state_lock:
+            count, matrix, alive, keys = self.count, self.matrix, self.alive, self.keys
+        if matrix is None or top_k <= 0 or count == 0:
+            return []
+
+        query_vector = self.embedder.embed([query])[0]
+        scores = np.asarray(matrix[:count] @ query_vector)
+        scores[~alive[:count]] = -np.inf
+
+        k = min(top_k, count)
+        candidates = np.argpartition(-scores, k - 1)[:k]
+        # Best score first; ties keep upload order
+        candidates = candidates[np.lexsort((candidates, -scores[candidates]))]
+        return [
+            (keys[row], round(float(scores[row]), 4))
+            for row in candidates
+            if scores[row] > 0 and keys[row] is not None
+        ]
@@ -7,6 +7,8 @@ const API_URL = process.env.REACT_APP_API_URL || window.location.origin;
 function App() {
   const [activeTab, setActiveTab] = useState('chat');
   const [documents, setDocuments] = useState([]);
+  const [documentsTotal, setDocumentsTotal] = useState(0);
+  const [nextCursor, setNextCursor] = useState(null);
   const [query, setQuery] = useState('');
   const [messages, setMessages] = useState([]);
   const [chatSessions, setChatSessions] = useState([
@@ -32,16 +34,31 @@ function App() {
     document.body.classList.toggle('light-theme', theme === 'light');
   }, [theme]);
 
-  // Fetch documents
+  // Fetch the first page of documents; later pages load on demand
   const fetchDocuments = async () => {
     try {
       const response = await axios.get(`${API_URL}/documents`);
       setDocuments(response.data.documents);
+      setDocumentsTotal(response.data.total);
+      setNextCursor(response.data.next_cursor);
     } catch (error) {
       console.error('Failed to fetch documents');
     }
   };
 
+  // Append the next page of documents
+  const loadMoreDocuments = async () => {
+    if (!nextCursor) return;
+    try {
+      const response = await axios.get(`${API_URL}/documents`, { params: { cursor: nextCursor } });
+      setDocuments(prev => [...prev, ...response.data.documents]);
+      setDocumentsTotal(response.data.total);
+      setNextCursor(response.data.next_cursor);
+    } catch (error) {
+      console.error('Failed to fetch more documents');
+    }
+  };
+
   // Upload multiple documents
   const handleMultipleFileUpload = async () => {
     if (selectedFiles.length === 0) return;
@@ -340,7 +357,7 @@ function App() {
             {/* Documents List */}
             {documents.length > 0 && (
               <div className="documents-section-content">
-                <h3 className="subsection-title">Uploaded Documents ({documents.length})</h3>
+                <h3 className="subsection-title">Uploaded Documents ({documentsTotal})</h3>
                 <div className="documents-list">
                   {documents.map(doc => (
                     <div key={doc.id} className="document-item">
@@ -351,6 +368,11 @@ function App() {
                     </div>
                   ))}
                 </div>
+                {nextCursor && (
+                  <button onClick={loadMoreDocuments} className="btn btn-secondary">
+                    Load more ({documentsTotal - documents.length} remaining)
+                  </button>
+                )}
               </div>
             )}
           </section>
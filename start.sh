@@ -21,6 +21,7 @@ else
     exit 1
 fi
 
-echo "Starting FastAPI server on port ${PORT:-8080}..."
+# Workers share documents, indexes and analytics through the SQLite store in backend/
+echo "Starting FastAPI server on port ${PORT:-8080} with ${WEB_CONCURRENCY:-1} worker(s)..."
 cd backend
-exec python -m uvicorn main:app --host 0.0.0.0 --port ${PORT:-8080} --workers 1
+exec python -m uvicorn main:app --host 0.0.0.0 --port ${PORT:-8080} --workers ${WEB_CONCURRENCY:-1}
@@ -0,0 +1,101 @@
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import time
+
+import pytest
+
+# Backend modules import each other as top-level modules
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BACKEND_DIR = os.path.join(ROOT, "backend")
+sys.path.insert(0, BACKEND_DIR)
+# ...and the stub OpenAI server can also run in-process (tools/stub_openai_server.create_app)
+sys.path.insert(0, os.path.join(ROOT, "tools"))
+
+STUB = os.path.join(ROOT, "tools", "stub_openai_server.py")
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_port(port: int, timeout: float = 15.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.2).close()
+            return
+        except OSError:
+            time.sleep(0.05)
+    raise RuntimeError(f"stub server did not start on port {port}")
+
+
+def start_stub(*args: str):
+    """Run tools/stub_openai_server.py on a free port. Returns (process, base URL)."""
+    port = free_port()
+    stub = subprocess.Popen(
+        [sys.executable, STUB, "--port", str(port), *args], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        wait_for_port(port)
+    except BaseException:
+        stub.terminate()
+        raise
+    return stub, f"http://127.0.0.1:{port}/v1"
+
+
+@pytest.fixture(scope="session")
+def app_module(tmp_path_factory):
+    """The backend's main module, configured against a stub OpenAI server in a scratch directory."""
+    stub, base_url = start_stub()
+    workdir = tmp_path_factory.mktemp("app")
+    cwd, environ = os.getcwd(), dict(os.environ)
+    try:
+        # The app reads its settings, and opens its stores, at import time
+        os.environ.update({
+            "OPENAI_API_KEY": "sk-test",
+            "OPENAI_BASE_URL": base_url,
+            "DOCUMENT_STORE_PATH": str(workdir / "documents.db"),
+            "VECTOR_INDEX_DIR": str(workdir / "index"),
+            "INGEST_PROCESSES": "1",
+        })
+        os.chdir(workdir)
+        import main
+        yield main
+    finally:
+        os.chdir(cwd)
+        os.environ.clear()
+        os.environ.update(environ)
+        stub.terminate()
+        stub.wait(timeout=10)
+
+
+@pytest.fixture(scope="session")
+def run_app(app_module):
+    """Start the app once; run_app(scenario) awaits scenario(client) against it.
+
+    The app's background tasks and clients belong to one event loop, so
+    every scenario runs on the same loop.
+    """
+    httpx = pytest.importorskip("httpx")
+    app = app_module.app
+    loop = asyncio.new_event_loop()
+    lifespan = app.router.lifespan_context(app)
+    loop.run_until_complete(lifespan.__aenter__())
+
+    def run(scenario):
+        async def with_client():
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=30) as client:
+                return await scenario(client)
+        return loop.run_until_complete(with_client())
+
+    try:
+        yield run
+    finally:
+        loop.run_until_complete(lifespan.__aexit__(None, None, None))
+        loop.close()
@@ -0,0 +1,30 @@
+from collections import Counter
+
+from analytics_store import AnalyticsStore, SpaceSaving
+
+
+def test_space_saving_keeps_heavy_hitters():
+    stream = ["hot"] * 300 + ["warm"] * 120 + [f"cold{i}" for i in range(500)]
+    stream = stream[::2] + stream[1::2]
+    sketch = SpaceSaving(capacity=20)
+    for item in stream:
+        sketch.add(item)
+    truth = Counter(stream)
+
+    assert len(sketch) == 20
+    top = sketch.top(2)
+    assert [item for item, _, _ in top] == ["hot", "warm"]
+    for item, count, error in sketch.top(len(sketch)):
+        # Counts over-estimate by at most the recorded error
+        assert count - error <= truth[item] <= count
+
+
+def test_analytics_documents_are_bounded(tmp_path):
+    store = AnalyticsStore(str(tmp_path / "analytics.db"), top_capacity=10)
+    for i in range(100):
+        store.record_query(f"question {i}", [f"doc{i}.txt", "hot.txt"], 0.01)
+        if i % 10 == 0:
+            store.flush()
+    documents = store.snapshot()["documents_used"]
+    assert len(documents) == 10
+    assert next(iter(documents)) == "hot.txt"
@@ -0,0 +1,40 @@
+import time
+
+from answer_cache import AnswerCache
+
+
+def test_answer_cache_key_ignores_chunk_order_but_not_history():
+    key = AnswerCache.make_key("What is the refund policy?", "en", [("a", 1), ("b", 0)])
+    assert key == AnswerCache.make_key("what is the refund policy", "en", [("b", 0), ("a", 1)])
+    assert key != AnswerCache.make_key("What is the refund policy?", "fr", [("a", 1), ("b", 0)])
+    assert key != AnswerCache.make_key("What is the refund policy?", "en", [("a", 1), ("b", 0)], history="earlier turn")
+
+
+def test_answer_cache_invalidates_by_document():
+    cache = AnswerCache()
+    cache.put("k1", {"response": "one"}, ["a"])
+    cache.put("k2", {"response": "two"}, ["a", "b"])
+    cache.put("k3", {"response": "three"}, ["b"])
+    assert cache.invalidate_document("a") == 2
+    assert cache.get("k1") is None and cache.get("k2") is None
+    assert cache.get("k3") == {"response": "three"}
+    assert cache.invalidate_document("a") == 0
+
+
+def test_answer_cache_evicts_least_recently_used():
+    cache = AnswerCache(max_entries=2)
+    cache.put("k1", "one", ["a"])
+    cache.put("k2", "two", ["a"])
+    cache.get("k1")
+    cache.put("k3", "three", ["b"])
+    assert cache.get("k2") is None
+    assert cache.get("k1") == "one" and cache.get("k3") == "three"
+    # The evicted entry no longer counts as built from "a"
+    assert cache.invalidate_document("a") == 1
+
+
+def test_answer_cache_expires_entries():
+    cache = AnswerCache(ttl=0.01)
+    cache.put("k1", "one", ["a"])
+    time.sleep(0.02)
+    assert cache.get("k1") is None and len(cache) == 0
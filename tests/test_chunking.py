@@ -0,0 +1,83 @@
+import random
+
+import pytest
+
+from chunking import TokenChunker, chunk_document, count_tokens, span_text
+
+
+def _corpus(seed: int = 0) -> str:
+    rng = random.Random(seed)
+    words = ["alpha", "beta", "gamma", "delta", "epsilon", "zeta", "refund", "policy"]
+    paragraphs = []
+    for _ in range(40):
+        sentences = [" ".join(rng.choice(words) for _ in range(rng.randint(3, 30))).capitalize() + "."
+                     for _ in range(rng.randint(1, 6))]
+        paragraphs.append(" ".join(sentences))
+    return "\n\n".join(paragraphs)
+
+
+def _markdown() -> str:
+    sections = [f"# Section {i}\n\n" + _corpus(i)[:1500] for i in range(5)]
+    return "\n".join(sections)
+
+
+def _csv(seed: int = 0) -> str:
+    rng = random.Random(seed)
+    return "\n".join(",".join(f"{rng.random():.6f}" for _ in range(200)) for _ in range(20))
+
+
+def _dense(seed: int = 0) -> str:
+    rng = random.Random(seed)
+    return "".join(rng.choice("(){}[];:,.!?-+=*&^%$#@") + rng.choice("ab ") for _ in range(10000))
+
+
+def _fed(text: str, mode: str, block_size: int, max_tokens: int = 128, overlap_tokens: int = 16):
+    chunker = TokenChunker(max_tokens, overlap_tokens, mode)
+    chunks = []
+    for start in range(0, len(text), block_size):
+        chunks += chunker.feed(text[start:start + block_size])
+    return chunks + chunker.finish()
+
+
+CASES = [
+    ("text", _corpus()),
+    ("markdown", _markdown()),
+    ("csv", _csv()),
+    ("text", _dense()),
+    ("text", "x" * 3000 + " tail."),
+]
+
+
+@pytest.mark.parametrize("mode,text", CASES)
+@pytest.mark.parametrize("block_size", [1, 7, 100, 4096])
+def test_chunks_do_not_depend_on_block_boundaries(mode, text, block_size):
+    assert _fed(text, mode, block_size) == chunk_document(text, mode, 128, 16)
+
+
+@pytest.mark.parametrize("mode,text", CASES)
+def test_chunks_stay_within_max_tokens(mode, text):
+    chunks = chunk_document(text, mode, 128, 16)
+    assert chunks
+    assert max(count_tokens(chunk) for _, _, chunk in chunks) <= 128
+
+
+@pytest.mark.parametrize("mode,text", CASES)
+def test_chunk_offsets_point_into_the_document(mode, text):
+    chunks = chunk_document(text, mode, 128, 16)
+    for start, end, chunk in chunks:
+        assert span_text(text[start:end]) == chunk
+    # Every character is in some chunk
+    assert chunks[0][0] == 0 and chunks[-1][1] == len(text)
+    for (_, previous_end, _), (start, _, _) in zip(chunks, chunks[1:]):
+        assert start <= previous_end
+
+
+def test_wide_csv_rows_are_cut_by_tokens():
+    chunks = chunk_document(_csv(), "csv", 256, 32)
+    assert max(count_tokens(chunk) for _, _, chunk in chunks) <= 256
+
+
+def test_markdown_heading_starts_a_chunk():
+    chunks = chunk_document(_markdown(), "markdown", 512, 32)
+    headings = [chunk for _, _, chunk in chunks if "# Section" in chunk]
+    assert all(chunk.startswith("# Section") for chunk in headings)
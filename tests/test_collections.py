@@ -0,0 +1,109 @@
+"""Collection limits: rejection, eviction of the oldest documents, and rollback."""
+import os
+
+import pytest
+
+from document_store import CollectionFull, DocumentStore
+from shards import CollectionLimits
+
+
+def _doc(doc_id: str, collection: str = "notes", chunk_count: int = 1, date: str = "2024-01-01") -> dict:
+    return {
+        "id": doc_id, "name": f"{doc_id}.txt", "collection": collection, "content_hash": doc_id,
+        "upload_date": date, "chunk_count": chunk_count, "size": 10,
+    }
+
+
+def _add(store: DocumentStore, doc: dict, **limits):
+    return store.add_document(doc, "x" * 10, [(0, 10)] * doc["chunk_count"], **limits)
+
+
+# -- DocumentStore -----------------------------------------------------
+def test_full_collection_rejects_and_rolls_back(tmp_path):
+    store = DocumentStore(str(tmp_path / "documents.db"))
+    _add(store, _doc("a", date="2024-01-01"), max_documents=2)
+    _add(store, _doc("b", date="2024-01-02"), max_documents=2)
+    seq = store.latest_change()
+
+    with pytest.raises(CollectionFull):
+        _add(store, _doc("c", date="2024-01-03"), max_documents=2)
+    assert [doc["id"] for doc in store.iter_metadata()] == ["a", "b"]
+    assert store.get_content("c") is None
+    assert store.latest_change() == seq
+    # Other collections have their own room
+    assert _add(store, _doc("d", collection="other"), max_documents=2) == []
+
+
+def test_oldest_documents_are_evicted(tmp_path):
+    store = DocumentStore(str(tmp_path / "documents.db"))
+    for i, doc_id in enumerate("abc"):
+        _add(store, _doc(doc_id, chunk_count=2, date=f"2024-01-0{i + 1}"))
+
+    evicted = _add(store, _doc("d", chunk_count=3, date="2024-01-04"), max_chunks=6, evict=True)
+    assert evicted == ["a", "b"]
+    assert [doc["id"] for doc in store.iter_metadata()] == ["c", "d"]
+    assert [op for _, op, _ in store.changes_since(0)][-3:] == ["delete", "delete", "add"]
+
+
+def test_oversized_document_evicts_nothing(tmp_path):
+    store = DocumentStore(str(tmp_path / "documents.db"))
+    _add(store, _doc("a"))
+    with pytest.raises(CollectionFull):
+        _add(store, _doc("big", chunk_count=5), max_chunks=4, evict=True)
+    assert [doc["id"] for doc in store.iter_metadata()] == ["a"]
+
+
+# -- /upload -----------------------------------------------------------
+def _upload(client, name: str, collection: str, text: str = "Harbour tides turn twice a day."):
+    return client.post("/upload", files={"file": (name, text.encode())}, data={"collection": collection})
+
+
+def test_upload_evicts_oldest(app_module, run_app):
+    app_module.shards.limits["rolling"] = CollectionLimits(max_documents=2, eviction="oldest")
+
+    async def scenario(client):
+        ids = []
+        for name in ("one.txt", "two.txt", "three.txt"):
+            response = await _upload(client, name, "rolling")
+            assert response.status_code == 200, response.text
+            ids.append(response.json()["document_id"])
+        assert response.json()["evicted"] == ids[:1]
+        listing = (await client.get("/documents", params={"collection": "rolling"})).json()["documents"]
+        assert [doc["id"] for doc in listing] == ids[1:]
+
+    run_app(scenario)
+
+
+def test_full_collection_rejects_upload_before_embedding(app_module, run_app, monkeypatch):
+    app_module.shards.limits["capped"] = CollectionLimits(max_documents=1)
+
+    async def scenario(client):
+        assert (await _upload(client, "first.txt", "capped")).status_code == 200
+        shard = app_module.shards.get("capped")
+        monkeypatch.setattr(shard.vectors, "embed", lambda texts: pytest.fail("embedded a rejected upload"))
+        response = await _upload(client, "second.txt", "capped")
+        assert response.status_code == 409
+        assert "is full" in response.json()["detail"]
+
+    run_app(scenario)
+
+
+def test_upload_rolled_back_when_store_rejects_it(app_module, run_app, monkeypatch):
+    # As if another worker filled the collection after this worker's pre-check
+    app_module.shards.limits["raced"] = CollectionLimits(max_documents=1)
+    monkeypatch.setattr(app_module, "check_collection_room", lambda collection, chunk_count=0: None)
+
+    async def scenario(client):
+        assert (await _upload(client, "first.txt", "raced")).status_code == 200
+        shard = app_module.shards.get("raced")
+        chunks, rows = len(shard.index), len(shard.vectors)
+
+        response = await _upload(client, "second.txt", "raced")
+        assert response.status_code == 409
+        assert (len(shard.index), len(shard.vectors)) == (chunks, rows)
+        assert len(shard.vectors.doc_rows) == 1
+        assert not [name for name in os.listdir("uploads") if name.endswith(".part")]
+        listing = (await client.get("/documents", params={"collection": "raced"})).json()["documents"]
+        assert [doc["name"] for doc in listing] == ["first.txt"]
+
+    run_app(scenario)
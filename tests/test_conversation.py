@@ -0,0 +1,81 @@
+"""Conversation memory: recent turns, folding into the summary, and follow-up detection."""
+import pytest
+
+from conversation_store import ConversationStore, is_follow_up
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = ConversationStore(str(tmp_path / "conversations.db"), recent_turns=2, max_sessions=3)
+    yield store
+    store.close()
+
+
+def test_append_keeps_recent_turns_and_queues_older_ones(store):
+    assert store.append("s", "q1", "a1") is False
+    assert store.append("s", "q2", "a2") is False
+    assert store.append("s", "q3", "a3") is True
+
+    conversation = store.get("s")
+    assert conversation.turns == [(2, "q2", "a2"), (3, "q3", "a3")]
+    assert conversation.pending == [(1, "q1", "a1")]
+    assert conversation.last_question == "q3"
+
+
+def test_fold_replaces_summary_and_drops_folded_turns(store):
+    for i in range(1, 5):
+        store.append("s", f"q{i}", f"a{i}")
+    assert [turn[0] for turn in store.get("s").pending] == [1, 2]
+
+    store.fold("s", "talked about q1", 1)
+    conversation = store.get("s")
+    assert conversation.summary == "talked about q1"
+    assert [turn[0] for turn in conversation.pending] == [2]
+
+    # A summary older than the one stored (e.g. from a slower worker) is ignored
+    store.fold("s", "stale", 1)
+    assert store.get("s").summary == "talked about q1"
+    # Turns keep numbering on after a fold
+    store.append("s", "q5", "a5")
+    assert store.get("s").turns[-1][0] == 5
+
+
+def test_least_recently_used_sessions_are_dropped(store):
+    for session in ("a", "b", "c", "d"):
+        store.append(session, "q", "a")
+    assert len(store) == 3
+    assert not store.get("a")
+    assert store.get("d")
+
+
+def test_follow_up_detection():
+    assert is_follow_up("And for contractors?")
+    assert is_follow_up("What is its deadline for submitting claims?")
+    assert is_follow_up("How long?")
+    assert not is_follow_up("How many vacation days do full-time employees get each year?")
+    assert not is_follow_up("")
+
+
+def test_history_only_used_for_follow_ups(app_module, run_app):
+    async def scenario(client):
+        text = "Full-time employees get 25 vacation days each year. Contractors get no paid vacation days."
+        response = await client.post("/upload", files={"file": ("leave.txt", text.encode())}, data={"collection": "conversation"})
+        assert response.status_code == 200, response.text
+
+        async def ask(query, session_id):
+            body = {"query": query, "session_id": session_id, "collections": ["conversation"]}
+            response = await client.post("/query", json=body)
+            assert response.status_code == 200, response.text
+            return response.json()
+
+        await ask("How many vacation days do full-time employees get each year?", "s1")
+        # A standalone question is answered without the history, so it shares the sessionless cache entry
+        standalone = "Which employees get no paid vacation days at all?"
+        assert (await ask(standalone, "s1"))["usage"]["history_tokens"] == 0
+        hits = app_module.answer_cache.hits
+        await ask(standalone, "")
+        assert app_module.answer_cache.hits == hits + 1
+
+        assert (await ask("And contractors?", "s1"))["usage"]["history_tokens"] > 0
+
+    run_app(scenario)
@@ -0,0 +1,47 @@
+"""/documents pagination cursors, field selection, and conditional (304) responses."""
+
+
+def test_cursor_pagination_and_etags(run_app):
+    async def scenario(client):
+        ids = []
+        for i in range(5):
+            files = {"file": (f"page{i}.txt", f"Page {i} of the handbook.".encode())}
+            response = await client.post("/upload", files=files, data={"collection": "paged"})
+            assert response.status_code == 200, response.text
+            ids.append(response.json()["document_id"])
+
+        # Walking next_cursor visits every document once, oldest first
+        seen, cursor = [], None
+        while True:
+            params = {"collection": "paged", "limit": 2, **({"cursor": cursor} if cursor else {})}
+            page = (await client.get("/documents", params=params)).json()
+            assert page["total"] == 5 and len(page["documents"]) <= 2
+            seen += [doc["id"] for doc in page["documents"]]
+            cursor = page["next_cursor"]
+            if cursor is None:
+                break
+        assert seen == ids
+
+        page = (await client.get("/documents", params={"collection": "paged", "fields": "id,size"})).json()
+        assert set(page["documents"][0]) == {"id", "size"}
+        assert (await client.get("/documents", params={"fields": "content"})).status_code == 400
+        assert (await client.get("/documents", params={"limit": 0})).status_code == 400
+        assert (await client.get("/documents", params={"cursor": "not-a-cursor"})).status_code == 400
+
+        # Unchanged listings are answered with 304 until a document changes
+        response = await client.get("/documents")
+        etag = response.headers["etag"]
+        response = await client.get("/documents", headers={"If-None-Match": etag})
+        assert response.status_code == 304 and response.headers["etag"] == etag
+        assert (await client.delete(f"/documents/{ids[0]}")).status_code == 200
+        response = await client.get("/documents", headers={"If-None-Match": etag})
+        assert response.status_code == 200 and response.headers["etag"] != etag
+
+        # Content ranges have their own ETag
+        response = await client.get(f"/documents/{ids[1]}/content", params={"start": 0, "end": 6})
+        assert response.json()["content"] == "Page 1"
+        conditional = {"If-None-Match": response.headers["etag"]}
+        response = await client.get(f"/documents/{ids[1]}/content", params={"start": 0, "end": 6}, headers=conditional)
+        assert response.status_code == 304
+
+    run_app(scenario)
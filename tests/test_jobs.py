@@ -0,0 +1,75 @@
+"""Background ingestion: job status, the worker pool, and 429 when the queue is full."""
+import asyncio
+
+from jobs import JobStore, process_upload_file
+
+
+def test_job_store_round_trip(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.db"))
+    job_id = store.create("notes.txt")
+    job = store.get(job_id)
+    assert (job["filename"], job["status"], job["progress"]) == ("notes.txt", "queued", 0)
+
+    store.update(job_id, status="done", stage="done", progress=1.0, document_id="doc_1", chunk_count=2)
+    job = store.get(job_id)
+    assert (job["status"], job["document_id"], job["chunk_count"]) == ("done", "doc_1", 2)
+    assert job["updated_at"] >= job["created_at"]
+    assert store.get("job_missing") is None
+    store.close()
+
+
+def test_process_upload_file(tmp_path):
+    path = tmp_path / "notes.txt"
+    path.write_bytes("Ferries leave hourly.\nTickets are sold on board.".encode())
+    result = process_upload_file(str(path), max_tokens=4, overlap_tokens=0)
+    assert result["size"] == path.stat().st_size
+    assert len(result["spans"]) == len(result["chunks"]) == len(result["terms"]) > 1
+    assert result["vectors"] is None
+    for (start, end), chunk in zip(result["spans"], result["chunks"]):
+        assert result["text"][start:end].strip() == chunk.strip()
+
+
+async def _wait_for_job(client, job_id: str) -> dict:
+    for _ in range(200):
+        job = (await client.get(f"/jobs/{job_id}")).json()
+        if job["status"] in ("done", "failed"):
+            return job
+        await asyncio.sleep(0.05)
+    raise AssertionError(f"job {job_id} did not finish: {job}")
+
+
+def test_batch_upload_jobs(run_app):
+    async def scenario(client):
+        files = [
+            ("files", ("ferries.txt", b"Ferries leave the harbour every hour.")),
+            ("files", ("broken.txt", b"\xff\xfe not utf-8")),
+        ]
+        response = await client.post("/upload/batch", files=files, data={"collection": "batch"})
+        assert response.status_code == 202, response.text
+        jobs = response.json()["jobs"]
+        assert [job["status"] for job in jobs] == ["queued", "queued"]
+
+        done, failed = [await _wait_for_job(client, job["job_id"]) for job in jobs]
+        assert done["status"] == "done" and done["chunk_count"] == 1
+        assert failed["status"] == "failed" and "UTF-8" in failed["error"]
+        listing = (await client.get("/documents", params={"collection": "batch"})).json()["documents"]
+        assert [doc["id"] for doc in listing] == [done["document_id"]]
+        assert (await client.get("/jobs/job_missing")).status_code == 404
+
+    run_app(scenario)
+
+
+def test_full_queue_is_rejected_with_429(app_module, run_app, monkeypatch):
+    async def scenario(client):
+        # A queue with one free slot that no worker drains
+        monkeypatch.setattr(app_module.ingest_queue, "queue", asyncio.Queue(maxsize=1))
+        files = [("files", (f"note{i}.txt", b"Queued note.")) for i in range(2)]
+        response = await client.post("/upload/batch", files=files)
+        assert response.status_code == 429
+        assert response.headers["retry-after"] == "5"
+
+        response = await client.post("/upload/batch", files=files[:1])
+        assert response.status_code == 202
+        assert app_module.ingest_queue.free_slots == 0
+
+    run_app(scenario)
@@ -0,0 +1,124 @@
+"""LLMClient retries, backoff and concurrency cap, against an in-process stub OpenAI server."""
+import asyncio
+
+import httpx
+import openai
+import pytest
+
+import stub_openai_server
+from llm import LLMClient
+
+
+class InFlight:
+    """ASGI wrapper counting the requests being handled at once."""
+
+    def __init__(self, app):
+        self.app = app
+        self.current = 0
+        self.peak = 0
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        self.current += 1
+        self.peak = max(self.peak, self.current)
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.current -= 1
+
+
+def _client(stub, **options) -> LLMClient:
+    llm = LLMClient("sk-test", base_url="http://stub/v1", backoff_base=0.001, backoff_max=0.01, **options)
+    llm.client = openai.AsyncOpenAI(
+        api_key="sk-test", base_url="http://stub/v1", max_retries=0,
+        http_client=httpx.AsyncClient(transport=httpx.ASGITransport(app=stub)),
+    )
+    return llm
+
+
+def _fail_first(monkeypatch, failures: int) -> None:
+    """Make the stub fail its first `failures` calls (with a random 429/500/503)."""
+    draws = iter([0.0] * failures)
+    monkeypatch.setattr(stub_openai_server.random, "random", lambda: next(draws, 1.0))
+
+
+def test_transient_failures_are_retried(monkeypatch):
+    stub = stub_openai_server.create_app(fail_rate=0.5)
+    _fail_first(monkeypatch, 2)
+
+    async def scenario():
+        llm = _client(stub, max_retries=3)
+        response = await llm.chat(model="gpt-4o", messages=[{"role": "user", "content": "hi"}])
+        await llm.close()
+        return response
+
+    assert asyncio.run(scenario()).choices[0].message.content.startswith("Stub answer")
+    assert stub.state.calls == 3
+
+
+def test_retries_give_up_after_max_retries():
+    stub = stub_openai_server.create_app(fail_rate=1.0)
+
+    async def scenario():
+        llm = _client(stub, max_retries=2)
+        try:
+            await llm.chat(model="gpt-4o", messages=[{"role": "user", "content": "hi"}])
+        finally:
+            await llm.close()
+
+    with pytest.raises((openai.RateLimitError, openai.InternalServerError)):
+        asyncio.run(scenario())
+    assert stub.state.calls == 3
+
+
+def test_opening_a_stream_is_retried(monkeypatch):
+    stub = stub_openai_server.create_app(fail_rate=0.5)
+    _fail_first(monkeypatch, 1)
+
+    async def scenario():
+        llm = _client(stub, max_retries=1)
+        usage = {}
+        text = "".join([delta async for delta in llm.stream_chat(usage=usage, model="gpt-4o", messages=[{"role": "user", "content": "hi"}])])
+        await llm.close()
+        return text, usage
+
+    text, usage = asyncio.run(scenario())
+    assert text.startswith("Stub answer")
+    assert usage["total_tokens"] > 0
+    assert stub.state.calls == 2
+
+
+def test_backoff_is_jittered_capped_and_honours_retry_after():
+    llm = LLMClient("sk-test", backoff_base=0.5, backoff_max=8.0)
+    error = openai.APIConnectionError(request=httpx.Request("POST", "http://stub/v1/chat/completions"))
+    for attempt in range(8):
+        assert 0 <= llm._backoff(attempt, error) <= min(8.0, 0.5 * 2 ** attempt)
+
+    def rate_limited(retry_after: str) -> openai.RateLimitError:
+        request = httpx.Request("POST", "http://stub/v1/chat/completions")
+        response = httpx.Response(429, headers={"retry-after": retry_after}, request=request)
+        return openai.RateLimitError("slow down", response=response, body=None)
+
+    assert llm._backoff(0, rate_limited("3")) == 3.0
+    assert llm._backoff(0, rate_limited("120")) == 8.0
+
+
+def test_concurrency_is_capped():
+    stub = InFlight(stub_openai_server.create_app(latency=0.02))
+
+    async def scenario():
+        llm = _client(stub, max_concurrency=2)
+        messages = [{"role": "user", "content": "hi"}]
+        await asyncio.gather(*(llm.chat(model="gpt-4o", messages=messages) for _ in range(6)))
+        assert stub.peak == 2
+        # An abandoned stream gives its slot back
+        stream = llm.stream_chat(model="gpt-4o", messages=messages)
+        await stream.__anext__()
+        await stream.aclose()
+        stub.peak = 0
+        await asyncio.gather(*(llm.chat(model="gpt-4o", messages=messages) for _ in range(4)))
+        assert stub.peak == 2
+        await llm.close()
+
+    asyncio.run(scenario())
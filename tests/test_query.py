@@ -0,0 +1,28 @@
+"""One /query round trip through the app against tools/stub_openai_server.py."""
+
+
+def test_query_round_trip(app_module, run_app):
+    async def scenario(client):
+        text = "The refund policy allows returns within 30 days. Shipping takes five business days."
+        response = await client.post("/upload", files={"file": ("policy.txt", text.encode())})
+        assert response.status_code == 200, response.text
+        document_id = response.json()["document_id"]
+
+        body = {"query": "What does the refund policy allow?", "session_id": ""}
+        response = await client.post("/query", json=body)
+        assert response.status_code == 200, response.text
+        answer = response.json()
+        assert answer["response"].startswith("Stub answer"), answer
+        assert answer["sources"] == ["policy.txt"]
+        assert answer["citations"][0]["doc_id"] == document_id
+
+        # The same question is answered from the cache until the document changes
+        calls = app_module.answer_cache.hits
+        assert (await client.post("/query", json=body)).status_code == 200
+        assert app_module.answer_cache.hits == calls + 1
+
+        response = await client.delete(f"/documents/{document_id}")
+        assert response.status_code == 200
+        assert (await client.post("/query", json=body)).status_code == 400
+
+    run_app(scenario)
@@ -0,0 +1,74 @@
+import asyncio
+import time
+
+import pytest
+
+from retrieval import OverlapReranker, Reranker, build_reranker, reciprocal_rank_fusion, run_stages
+
+
+def test_rrf_sums_reciprocal_ranks():
+    fused = reciprocal_rank_fusion([[("a", 0), ("b", 0), ("c", 0)], [("b", 0), ("d", 0)]], k=60)
+    assert [key for key, _ in fused] == [("b", 0), ("a", 0), ("d", 0), ("c", 0)]
+    assert fused[0][1] == round(1 / 62 + 1 / 61, 6)
+    assert fused[1][1] == round(1 / 61, 6)
+
+
+def test_rrf_ties_keep_first_seen_order():
+    fused = reciprocal_rank_fusion([[("a", 0)], [("b", 0)]])
+    assert [key for key, _ in fused] == [("a", 0), ("b", 0)]
+    assert reciprocal_rank_fusion([]) == []
+
+
+def test_run_stages_returns_every_stage_within_budget():
+    results, durations = asyncio.run(run_stages({"one": lambda: [1], "two": lambda: [2]}, budget=1.0))
+    assert results == {"one": [1], "two": [2]}
+    assert set(durations) == {"one", "two"}
+
+
+def test_run_stages_drops_a_stage_over_budget():
+    def slow():
+        time.sleep(0.3)
+        return ["slow"]
+
+    start = time.perf_counter()
+    results, durations = asyncio.run(run_stages({"fast": lambda: ["fast"], "slow": slow}, budget=0.05))
+    assert results == {"fast": ["fast"]}
+    assert durations["slow"] == 0.05
+    assert time.perf_counter() - start < 0.3 + 0.25
+
+
+def test_run_stages_waits_for_the_first_stage_if_all_overrun():
+    def slow(value, seconds):
+        def stage():
+            time.sleep(seconds)
+            return [value]
+        return stage
+
+    results, _ = asyncio.run(run_stages({"a": slow("a", 0.1), "b": slow("b", 0.4)}, budget=0.01))
+    assert results == {"a": ["a"]}
+
+
+def test_run_stages_skips_failed_stages():
+    def broken():
+        raise RuntimeError("boom")
+
+    results, _ = asyncio.run(run_stages({"ok": lambda: [1], "broken": broken}, budget=1.0))
+    assert results == {"ok": [1]}
+    assert asyncio.run(run_stages({}, budget=1.0)) == ({}, {})
+
+
+def test_overlap_reranker_prefers_covering_close_terms():
+    scores = OverlapReranker().score("refund policy", [
+        "our refund policy is simple",
+        "refund requests go through the support policy team",
+        "shipping takes five days",
+    ])
+    assert scores[0] > scores[1] > scores[2] == 0.0
+
+
+def test_build_reranker():
+    assert isinstance(build_reranker("overlap"), OverlapReranker)
+    assert build_reranker("none") is None
+    assert build_reranker("typo") is None
+    with pytest.raises(TypeError):
+        Reranker()
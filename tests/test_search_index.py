@@ -0,0 +1,53 @@
+from search_index import InvertedIndex
+
+DOC_A = ["the refund policy allows returns", "refunds take five days"]
+DOC_B = ["team alpha deploys on fridays", "the deploy uses blue green rollouts", "alpha alpha alpha"]
+
+
+def _stats(index: InvertedIndex):
+    return index.postings, index.chunk_lengths, index.chunk_terms, index.total_length, index.doc_chunks
+
+
+def test_statistics_follow_adds():
+    index = InvertedIndex()
+    index.add_document("a", DOC_A)
+    index.add_document("b", DOC_B)
+    assert len(index) == 5
+    assert index.total_length == sum(len(chunk.split()) for chunk in DOC_A + DOC_B)
+    assert index.avg_chunk_length == index.total_length / 5
+    assert index.postings["alpha"] == {("b", 0): 1, ("b", 2): 3}
+    assert index.postings["the"] == {("a", 0): 1, ("b", 1): 1}
+
+
+def test_remove_rolls_statistics_back():
+    index = InvertedIndex()
+    index.add_document("a", DOC_A)
+    index.add_document("b", DOC_B)
+    index.remove_document("a")
+
+    expected = InvertedIndex()
+    expected.add_document("b", DOC_B)
+    assert _stats(index) == _stats(expected)
+    assert "refund" not in index.postings
+    assert all(key[0] == "b" for key, _ in index.search("the refund policy", top_k=10))
+
+    index.remove_document("b")
+    assert len(index) == 0 and index.total_length == 0 and not index.postings
+
+
+def test_re_adding_a_document_replaces_it():
+    index = InvertedIndex()
+    index.add_document("a", DOC_A)
+    index.add_document("a", DOC_B)
+    expected = InvertedIndex()
+    expected.add_document("a", DOC_B)
+    assert _stats(index) == _stats(expected)
+
+
+def test_search_ranks_by_bm25():
+    index = InvertedIndex()
+    index.add_document("a", DOC_A)
+    index.add_document("b", DOC_B)
+    hits = index.search("alpha deploys", top_k=2)
+    assert [key for key, _ in hits] == [("b", 0), ("b", 2)]
+    assert hits[0][1] > hits[1][1] > 0
@@ -0,0 +1,63 @@
+import asyncio
+
+import pytest
+
+from single_flight import SingleFlight
+
+
+def test_single_flight_coalesces_concurrent_calls():
+    async def scenario():
+        flights = SingleFlight("test")
+        calls = 0
+
+        async def work():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            return "answer"
+
+        results = await asyncio.gather(*[flights.run("key", work) for _ in range(5)])
+        assert calls == 1
+        assert [result for result, _ in results] == ["answer"] * 5
+        assert sum(coalesced for _, coalesced in results) == 4
+        assert len(flights) == 0
+
+        # Nothing is kept once the call finished
+        await flights.run("key", work)
+        assert calls == 2
+
+    asyncio.run(scenario())
+
+
+def test_single_flight_shares_errors():
+    async def scenario():
+        flights = SingleFlight("test")
+
+        async def fail():
+            await asyncio.sleep(0.01)
+            raise ValueError("boom")
+
+        results = await asyncio.gather(*[flights.run("key", fail) for _ in range(3)], return_exceptions=True)
+        assert all(isinstance(result, ValueError) for result in results)
+        assert len(flights) == 0
+
+    asyncio.run(scenario())
+
+
+def test_single_flight_survives_a_cancelled_caller():
+    async def scenario():
+        flights = SingleFlight("test")
+
+        async def work():
+            await asyncio.sleep(0.05)
+            return "answer"
+
+        first = asyncio.ensure_future(flights.run("key", work))
+        second = asyncio.ensure_future(flights.run("key", work))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await first
+        assert await second == ("answer", True)
+
+    asyncio.run(scenario())
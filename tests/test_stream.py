@@ -0,0 +1,64 @@
+"""/query/stream: Server-Sent Events order, and bookkeeping however the stream ends."""
+import json
+
+import pytest
+
+
+def _events(body: str):
+    """(event, data) pairs of an SSE body."""
+    events = []
+    for message in body.strip().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in message.splitlines())
+        events.append((fields["event"], json.loads(fields["data"])))
+    return events
+
+
+@pytest.fixture(scope="module")
+def streaming_doc(run_app):
+    async def upload(client):
+        text = "The cafeteria opens at eight and closes at three on weekdays."
+        response = await client.post("/upload", files={"file": ("cafeteria.txt", text.encode())}, data={"collection": "stream"})
+        assert response.status_code == 200, response.text
+
+    run_app(upload)
+
+
+def test_stream_event_order(app_module, run_app, streaming_doc):
+    body = {"query": "When does the cafeteria open on weekdays?", "session_id": "", "collections": ["stream"]}
+
+    async def scenario(client):
+        for _ in range(2):  # answered by the LLM, then from the answer cache
+            response = await client.post("/query/stream", json=body)
+            assert response.status_code == 200
+            assert response.headers["content-type"].startswith("text/event-stream")
+            events = _events(response.text)
+            names = [name for name, _ in events]
+            assert names[0] == "sources" and names[-1] == "done"
+            assert set(names[1:-1]) == {"token"}
+            assert events[0][1]["sources"] == ["cafeteria.txt"]
+            assert "".join(data["content"] for name, data in events if name == "token").startswith("Stub answer")
+            assert events[-1][1]["time_to_first_token"] <= events[-1][1]["response_time"]
+
+    hits = app_module.answer_cache.hits
+    run_app(scenario)
+    assert app_module.answer_cache.hits == hits + 1
+
+
+def test_disconnected_stream_still_counts_query(app_module, run_app, streaming_doc):
+    request = app_module.QueryRequest(query="When does the cafeteria close?", session_id="", collections=["stream"])
+
+    async def scenario(client):
+        before = app_module.analytics_store.total_queries()
+        response = await app_module.query_documents_stream(request)
+        stream = response.body_iterator
+        assert (await stream.__anext__()).startswith("event: sources")
+        assert (await stream.__anext__()).startswith("event: token")
+        # The client goes away mid-answer
+        await stream.aclose()
+        assert app_module.analytics_store.total_queries() == before + 1
+        # An incomplete answer is neither cached nor remembered
+        return await client.post("/query", json=request.dict())
+
+    hits = app_module.answer_cache.hits
+    assert run_app(scenario).status_code == 200
+    assert app_module.answer_cache.hits == hits
@@ -0,0 +1,32 @@
+"""Workers pick up documents that other workers add to or delete from the shared store."""
+from datetime import datetime
+
+from document_store import DocumentStore
+
+
+def test_changes_from_another_worker_are_applied(app_module, run_app):
+    other = DocumentStore(app_module.document_store.path)
+    text = "Lighthouse keepers log every passing ship."
+    doc = {
+        "id": "doc_other_worker", "name": "lighthouse.txt", "collection": "synced",
+        "content_hash": "x", "upload_date": datetime.now().isoformat(), "chunk_count": 1, "size": len(text),
+    }
+    body = {"query": "Who logs passing ships?", "session_id": "", "collections": ["synced"]}
+
+    async def scenario(client):
+        other.add_document(doc, text, [(0, len(text))])
+        response = await client.get("/documents", params={"collection": "synced"})
+        assert [item["id"] for item in response.json()["documents"]] == ["doc_other_worker"]
+        response = await client.post("/query", json=body)
+        assert response.status_code == 200, response.text
+        assert response.json()["sources"] == ["lighthouse.txt"]
+
+        other.delete_document("doc_other_worker")
+        response = await client.get("/documents", params={"collection": "synced"})
+        assert response.json()["documents"] == []
+        assert (await client.post("/query", json=body)).status_code == 400
+
+    try:
+        run_app(scenario)
+    finally:
+        other.close()
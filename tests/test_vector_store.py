@@ -0,0 +1,86 @@
+import json
+import os
+
+import numpy as np
+
+from vector_store import HashingEmbedder, VectorStore
+
+EMBEDDER = HashingEmbedder(64)
+
+
+def _store(path, **kwargs) -> VectorStore:
+    return VectorStore(str(path), EMBEDDER, **kwargs)
+
+
+def test_add_and_search(tmp_path):
+    store = _store(tmp_path)
+    store.add_document("a", ["the refund policy", "returns within thirty days"])
+    store.add_document("b", ["team alpha deploys on fridays"])
+    assert len(store) == 3
+    assert store.search("team alpha deploys on fridays", top_k=1)[0][0] == ("b", 0)
+    assert store.doc_rows == {"a": [0, 1], "b": [2]}
+
+
+def test_remove_tombstones_rows(tmp_path):
+    store = _store(tmp_path, compact_ratio=0.9)
+    for i in range(5):
+        store.add_document(f"d{i}", [f"document {i} text", "shared text"])
+    store.remove_document("d1")
+    assert store.tombstones == 2 and store.count == 10 and len(store) == 8
+    assert "d1" not in store.doc_rows
+    assert all(key[0] != "d1" for key, _ in store.search("document 1 text", top_k=10))
+
+
+def test_compaction_drops_dead_rows(tmp_path):
+    store = _store(tmp_path, compact_ratio=0.25)
+    for i in range(4):
+        store.add_document(f"d{i}", [f"document {i}", f"more about {i}"])
+    store.remove_document("d0")
+    assert store.tombstones == 2
+    store.remove_document("d2")  # 4 of 8 rows dead: compacts
+    assert store.tombstones == 0 and store.count == 4
+    assert store.keys == [("d1", 0), ("d1", 1), ("d3", 0), ("d3", 1)]
+    assert store.doc_rows == {"d1": [0, 1], "d3": [2, 3]}
+    assert store.search("document 3", top_k=1)[0][0] == ("d3", 0)
+
+    reopened = _store(tmp_path)
+    assert reopened.keys == store.keys
+    assert np.allclose(reopened.matrix[:4], store.matrix[:4])
+
+
+def test_writes_append_to_the_log(tmp_path):
+    store = _store(tmp_path, compact_ratio=0.9)
+    store.add_document("a", ["one"])
+    size = os.path.getsize(store.log_path)
+    store.add_document("b", ["two"])
+    store.remove_document("a")
+    with open(store.log_path) as f:
+        records = [json.loads(line) for line in f]
+    assert records[-2:] == [{"add": "b", "row": 1, "count": 1}, {"remove": "a"}]
+    assert os.path.getsize(store.log_path) > size
+
+
+def test_other_instances_catch_up(tmp_path):
+    writer = _store(tmp_path, compact_ratio=0.9)
+    reader = _store(tmp_path, compact_ratio=0.9)
+    writer.add_document("a", ["alpha text"])
+    writer.add_document("b", ["beta text"])
+    assert reader.refresh()
+    assert reader.keys == writer.keys
+    writer.remove_document("a")
+    assert reader.refresh()
+    assert reader.doc_rows == {"b": [1]} and reader.tombstones == 1
+    assert not reader.refresh()
+
+    # A compaction rewrites the files; the reader re-loads them
+    writer.compact()
+    assert reader.refresh()
+    assert reader.keys == [("b", 0)] and reader.tombstones == 0
+
+
+def test_embedder_change_starts_over(tmp_path):
+    _store(tmp_path).add_document("a", ["alpha"])
+    other = VectorStore(str(tmp_path), HashingEmbedder(32))
+    assert len(other) == 0
+    other.add_document("b", ["beta"])
+    assert VectorStore(str(tmp_path), HashingEmbedder(32)).doc_rows == {"b": [0]}
@@ -0,0 +1,413 @@
+"""Benchmarks for chunking, indexing, retrieval and the /query path.
+
+Builds a synthetic corpus (Zipf-distributed pseudo-words, so term statistics
+look like real text), then measures:
+
+  * chunking throughput of the token chunker
+  * index build time and memory for the BM25 and vector indexes
+  * retrieval latency percentiles for both indexes
+  * /upload throughput and /query latency under concurrent load, driven
+    through the FastAPI app in-process against tools/stub_openai_server.py
+
+Results are written as JSON so runs can be compared across commits:
+
+    python tools/benchmark.py run --chunks 100000 --output before.json
+    python tools/benchmark.py run --chunks 100000 --output after.json
+    python tools/benchmark.py compare before.json after.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence
+
+import numpy as np
+
+TOOLS_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(TOOLS_DIR)
+BACKEND_DIR = os.path.join(REPO_DIR, "backend")
+sys.path.insert(0, BACKEND_DIR)
+
+from chunking import chunk_document  # noqa: E402
+from search_index import InvertedIndex  # noqa: E402
+from vector_store import HashingEmbedder, VectorStore  # noqa: E402
+
+
+# -----------------------------
+# Synthetic corpus
+# -----------------------------
+_SYLLABLES = ["ka", "lo", "mi", "ne", "ru", "ta", "vo", "si", "de", "pa", "zu", "ri", "ho", "be", "gi", "fo"]
+
+
+class Corpus:
+    """Deterministic synthetic text with a Zipf word distribution."""
+
+    def __init__(self, vocabulary: int = 20000, zipf: float = 1.1, seed: int = 0):
+        self.rng = np.random.default_rng(seed)
+        words = set()
+        while len(words) < vocabulary:
+            length = int(self.rng.integers(1, 5))
+            words.add("".join(self.rng.choice(_SYLLABLES, size=length)))
+        self.words = np.array(sorted(words))
+        self.rng.shuffle(self.words)
+        weights = 1.0 / np.arange(1, vocabulary + 1) ** zipf
+        self.probabilities = weights / weights.sum()
+
+    def sentence(self, rng: np.random.Generator) -> str:
+        words = rng.choice(self.words, size=int(rng.integers(6, 20)), p=self.probabilities)
+        return " ".join(words).capitalize() + "."
+
+    def chunk_texts(self, count: int, words_per_chunk: int = 48, seed: int = 1) -> List[str]:
+        """`count` chunk-sized texts, generated in bulk."""
+        rng = np.random.default_rng(seed)
+        words = rng.choice(self.words, size=(count, words_per_chunk), p=self.probabilities)
+        return [" ".join(row) for row in words]
+
+    def document(self, sentences: int, seed: int) -> str:
+        rng = np.random.default_rng(seed)
+        paragraphs = []
+        for _ in range(max(1, sentences // 6)):
+            paragraphs.append(" ".join(self.sentence(rng) for _ in range(6)))
+        return "\n\n".join(paragraphs)
+
+    def queries(self, count: int, seed: int = 2) -> List[str]:
+        """Queries of 2-5 words, skewed towards mid-frequency terms like real questions."""
+        rng = np.random.default_rng(seed)
+        ranks = np.clip(rng.zipf(1.3, size=(count, 5)) + 20, 0, len(self.words) - 1)
+        lengths = rng.integers(2, 6, size=count)
+        return [" ".join(self.words[row[:length]]) for row, length in zip(ranks, lengths)]
+
+
+# -----------------------------
+# Measurement helpers
+# -----------------------------
+def latency_summary(samples: Sequence[float]) -> Dict[str, float]:
+    """Latency percentiles in milliseconds."""
+    if not samples:
+        return {"count": 0}
+    values = np.asarray(samples) * 1000
+    return {
+        "count": len(values),
+        "mean_ms": round(float(values.mean()), 3),
+        "p50_ms": round(float(np.percentile(values, 50)), 3),
+        "p95_ms": round(float(np.percentile(values, 95)), 3),
+        "p99_ms": round(float(np.percentile(values, 99)), 3),
+        "max_ms": round(float(values.max()), 3),
+    }
+
+
+def rss_bytes() -> int:
+    """Current resident set size (Linux), falling back to the peak RSS elsewhere."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=REPO_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_port(port: int, timeout: float = 15.0) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f"Mock OpenAI server did not start on port {port}")
+
+
+# -----------------------------
+# Benchmarks
+# -----------------------------
+def bench_chunking(corpus: Corpus, args) -> dict:
+    text = "\n\n".join(corpus.document(600, seed) for seed in range(args.chunk_documents))
+    start = time.perf_counter()
+    chunks = chunk_document(text, "text", args.chunk_tokens, args.overlap_tokens)
+    elapsed = time.perf_counter() - start
+    return {
+        "characters": len(text),
+        "chunks": len(chunks),
+        "seconds": round(elapsed, 4),
+        "mb_per_second": round(len(text) / elapsed / 1e6, 3),
+    }
+
+
+def bench_indexes(corpus: Corpus, args, workdir: str) -> dict:
+    print(f"Generating {args.chunks} chunks...")
+    texts = corpus.chunk_texts(args.chunks, args.words_per_chunk)
+    doc_size = args.chunks_per_document
+    queries = corpus.queries(args.queries)
+    results = {}
+
+    rss_before = rss_bytes()
+    index = InvertedIndex()
+    start = time.perf_counter()
+    for first in range(0, len(texts), doc_size):
+        index.add_document(f"doc_{first}", texts[first:first + doc_size])
+    elapsed = time.perf_counter() - start
+    results["bm25_build"] = {
+        "chunks": len(texts),
+        "seconds": round(elapsed, 4),
+        "chunks_per_second": round(len(texts) / elapsed, 1),
+        "terms": len(index.postings),
+        "rss_delta_bytes": rss_bytes() - rss_before,
+    }
+
+    rss_before = rss_bytes()
+    store = VectorStore(os.path.join(workdir, "bench-index"), HashingEmbedder(args.embedding_dim))
+    start = time.perf_counter()
+    for first in range(0, len(texts), doc_size):
+        store.add_document(f"doc_{first}", texts[first:first + doc_size])
+    elapsed = time.perf_counter() - start
+    results["vector_build"] = {
+        "chunks": len(texts),
+        "seconds": round(elapsed, 4),
+        "chunks_per_second": round(len(texts) / elapsed, 1),
+        "matrix_bytes": store.count * store.embedder.dim * 4,
+        "rss_delta_bytes": rss_bytes() - rss_before,
+    }
+
+    for name, search in (("bm25_search", index.search), ("vector_search", store.search)):
+        search(queries[0], top_k=args.top_k)  # warm-up
+        samples = []
+        for query in queries:
+            start = time.perf_counter()
+            search(query, top_k=args.top_k)
+            samples.append(time.perf_counter() - start)
+        results[name] = latency_summary(samples)
+    return results
+
+
+async def bench_app(corpus: Corpus, args, workdir: str) -> dict:
+    """Upload documents and run concurrent /query load through the FastAPI app."""
+    import httpx
+
+    port = free_port()
+    stub = subprocess.Popen(
+        [sys.executable, os.path.join(TOOLS_DIR, "stub_openai_server.py"), "--port", str(port),
+         "--latency", str(args.llm_latency), "--token-latency", str(args.token_latency)],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    cwd = os.getcwd()
+    try:
+        wait_for_port(port)
+        # The app reads its settings at import time
+        os.environ.update({
+            "OPENAI_API_KEY": "sk-benchmark",
+            "OPENAI_BASE_URL": f"http://127.0.0.1:{port}/v1",
+            "DOCUMENT_STORE_PATH": os.path.join(workdir, "documents.db"),
+            "VECTOR_INDEX_DIR": os.path.join(workdir, "index"),
+            "SEARCH_BACKEND": args.search_backend,
+            "ANSWER_CACHE_MAX_ENTRIES": "0" if not args.answer_cache else os.environ.get("ANSWER_CACHE_MAX_ENTRIES", "1024"),
+            "LLM_MAX_CONCURRENCY": str(args.concurrency),
+            "INGEST_PROCESSES": "1",
+            "SERVER_TIMING": "true",
+            "CHUNK_MAX_TOKENS": str(args.chunk_tokens),
+            "CHUNK_OVERLAP_TOKENS": str(args.overlap_tokens),
+        })
+        os.chdir(workdir)
+        import main
+
+        await main.app.router.startup()
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=300) as client:
+            results = {"upload": await run_uploads(client, corpus, args)}
+            results["query"] = await run_queries(client, corpus, args)
+            results["app_rss_bytes"] = rss_bytes()
+        await main.app.router.shutdown()
+        return results
+    finally:
+        os.chdir(cwd)
+        stub.terminate()
+        stub.wait()
+
+
+async def run_uploads(client, corpus: Corpus, args) -> dict:
+    documents = [corpus.document(args.document_sentences, seed) for seed in range(args.documents)]
+    semaphore = asyncio.Semaphore(args.upload_concurrency)
+    samples, chunk_counts = [], []
+
+    async def upload(number: int, text: str) -> None:
+        async with semaphore:
+            start = time.perf_counter()
+            response = await client.post("/upload", files={"file": (f"bench_{number}.txt", text.encode("utf-8"))})
+            samples.append(time.perf_counter() - start)
+            response.raise_for_status()
+            chunk_counts.append(response.json()["chunk_count"])
+
+    start = time.perf_counter()
+    await asyncio.gather(*[upload(number, text) for number, text in enumerate(documents)])
+    elapsed = time.perf_counter() - start
+    total_bytes = sum(len(text.encode("utf-8")) for text in documents)
+    return {
+        "documents": len(documents),
+        "chunks": sum(chunk_counts),
+        "bytes": total_bytes,
+        "seconds": round(elapsed, 4),
+        "mb_per_second": round(total_bytes / elapsed / 1e6, 3),
+        "chunks_per_second": round(sum(chunk_counts) / elapsed, 1),
+        "latency": latency_summary(samples),
+    }
+
+
+async def run_queries(client, corpus: Corpus, args) -> dict:
+    queries = corpus.queries(args.requests, seed=3)
+    semaphore = asyncio.Semaphore(args.concurrency)
+    samples: List[float] = []
+    stages: Dict[str, List[float]] = {}
+    errors: Dict[str, int] = {}
+
+    # No session: every query is independent, as in a stateless load test
+    async def query(text: str) -> None:
+        async with semaphore:
+            start = time.perf_counter()
+            response = await client.post("/query", json={"query": text, "session_id": ""})
+            samples.append(time.perf_counter() - start)
+            if response.status_code != 200:
+                errors[str(response.status_code)] = errors.get(str(response.status_code), 0) + 1
+                return
+            for entry in response.headers.get("server-timing", "").split(","):
+                name, _, duration = entry.strip().partition(";dur=")
+                if duration:
+                    stages.setdefault(name, []).append(float(duration) / 1000)
+
+    # Warm-up: opens the connection pool to the mock server
+    await client.post("/query", json={"query": queries[0], "session_id": ""})
+    start = time.perf_counter()
+    await asyncio.gather(*[query(text) for text in queries])
+    elapsed = time.perf_counter() - start
+    return {
+        "requests": len(queries),
+        "concurrency": args.concurrency,
+        "llm_latency": args.llm_latency,
+        "seconds": round(elapsed, 4),
+        "requests_per_second": round(len(queries) / elapsed, 2),
+        "errors": errors,
+        "latency": latency_summary(samples),
+        "stages": {name: latency_summary(values) for name, values in sorted(stages.items())},
+    }
+
+
+# -----------------------------
+# Commands
+# -----------------------------
+def run(args) -> None:
+    corpus = Corpus(args.vocabulary, seed=args.seed)
+    workdir = tempfile.mkdtemp(prefix="rag-bench-")
+    results = {}
+    try:
+        if "chunking" in args.only:
+            print("Benchmarking chunking...")
+            results["chunking"] = bench_chunking(corpus, args)
+        if "retrieval" in args.only:
+            print("Benchmarking indexing and retrieval...")
+            results.update(bench_indexes(corpus, args, workdir))
+        if "app" in args.only:
+            print("Benchmarking /upload and /query through the app...")
+            results.update(asyncio.run(bench_app(corpus, args, workdir)))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        "commit": git_commit(),
+        "timestamp": datetime.now().isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {key: value for key, value in vars(args).items() if key != "func"},
+        "results": results,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(json.dumps(results, indent=2))
+    print(f"Results written to {args.output}")
+
+
+def flatten(results: dict, prefix: str = "") -> Dict[str, float]:
+    values = {}
+    for key, value in results.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            values.update(flatten(value, f"{name}."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            values[name] = value
+    return values
+
+
+def compare(args) -> None:
+    with open(args.base, encoding="utf-8") as f:
+        base = json.load(f)
+    with open(args.head, encoding="utf-8") as f:
+        head = json.load(f)
+    base_values, head_values = flatten(base["results"]), flatten(head["results"])
+    print(f"{'metric':<44} {'base':>14} {'head':>14} {'change':>9}")
+    for name in sorted(base_values.keys() & head_values.keys()):
+        old, new = base_values[name], head_values[name]
+        change = f"{(new - old) / old * 100:+.1f}%" if old else "n/a"
+        print(f"{name:<44} {old:>14g} {new:>14g} {change:>9}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="run the benchmarks and write a JSON report")
+    run_parser.add_argument("--only", nargs="+", default=["chunking", "retrieval", "app"], choices=["chunking", "retrieval", "app"])
+    run_parser.add_argument("--output", default="benchmark_results.json")
+    run_parser.add_argument("--seed", type=int, default=0)
+    run_parser.add_argument("--vocabulary", type=int, default=20000, help="distinct words in the synthetic corpus")
+    run_parser.add_argument("--chunks", type=int, default=10000, help="chunks indexed for the retrieval benchmark (1k-1M)")
+    run_parser.add_argument("--words-per-chunk", type=int, default=48)
+    run_parser.add_argument("--chunks-per-document", type=int, default=50)
+    run_parser.add_argument("--embedding-dim", type=int, default=384)
+    run_parser.add_argument("--queries", type=int, default=500, help="queries for the retrieval benchmark")
+    run_parser.add_argument("--top-k", type=int, default=10)
+    run_parser.add_argument("--chunk-documents", type=int, default=20, help="documents chunked by the chunking benchmark")
+    run_parser.add_argument("--chunk-tokens", type=int, default=256)
+    run_parser.add_argument("--overlap-tokens", type=int, default=32)
+    run_parser.add_argument("--documents", type=int, default=100, help="documents uploaded through the app")
+    run_parser.add_argument("--document-sentences", type=int, default=300)
+    run_parser.add_argument("--upload-concurrency", type=int, default=1)
+    run_parser.add_argument("--requests", type=int, default=500, help="/query requests sent through the app")
+    run_parser.add_argument("--concurrency", type=int, default=16, help="concurrent /query requests")
+    run_parser.add_argument("--search-backend", default="bm25", choices=["hybrid", "bm25", "vector"])
+    run_parser.add_argument("--answer-cache", action="store_true", help="leave the answer cache on")
+    run_parser.add_argument("--llm-latency", type=float, default=0.2, help="mock LLM seconds per call")
+    run_parser.add_argument("--token-latency", type=float, default=0.0)
+    run_parser.set_defaults(func=run)
+
+    compare_parser = commands.add_parser("compare", help="compare two JSON reports")
+    compare_parser.add_argument("base")
+    compare_parser.add_argument("head")
+    compare_parser.set_defaults(func=compare)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
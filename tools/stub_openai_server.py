@@ -0,0 +1,100 @@
+"""Minimal OpenAI-compatible server for local testing.
+
+Point the backend at it with OPENAI_BASE_URL=http://localhost:9000/v1 (any
+OPENAI_API_KEY value works). Latency and failure injection are configurable
+so timeouts, retries and concurrency limits can be exercised without
+calling the real API:
+
+    python tools/stub_openai_server.py --port 9000 --latency 0.5 --fail-rate 0.2
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from typing import Optional
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+
+def create_app(latency: float = 0.0, fail_rate: float = 0.0, token_latency: float = 0.0) -> FastAPI:
+    app = FastAPI(title="Stub OpenAI API")
+    app.state.calls = 0
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        app.state.calls += 1
+        await asyncio.sleep(latency)
+
+        if random.random() < fail_rate:
+            status = random.choice([429, 500, 503])
+            return JSONResponse(
+                status_code=status,
+                content={"error": {"message": f"stub injected {status}", "type": "stub_error"}},
+            )
+
+        prompt = body["messages"][-1]["content"]
+        text = f"Stub answer ({len(prompt)} prompt chars)."
+        usage = {
+            "prompt_tokens": len(prompt) // 4,
+            "completion_tokens": len(text) // 4,
+            "total_tokens": (len(prompt) + len(text)) // 4,
+        }
+        if body.get("stream"):
+            include_usage = (body.get("stream_options") or {}).get("include_usage", False)
+            return StreamingResponse(
+                _stream(app.state.calls, body.get("model", "gpt-4o"), text, usage if include_usage else None),
+                media_type="text/event-stream",
+            )
+        return {
+            "id": f"chatcmpl-stub-{app.state.calls}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "gpt-4o"),
+            "choices": [{
+                "index": 0,
+                "message": {"role": "assistant", "content": text},
+                "finish_reason": "stop",
+            }],
+            "usage": usage,
+        }
+
+    async def _stream(call: int, model: str, text: str, usage: Optional[dict]):
+        for word in text.split(" "):
+            chunk = {
+                "id": f"chatcmpl-stub-{call}",
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "delta": {"content": word + " "}, "finish_reason": None}],
+            }
+            yield f"data: {json.dumps(chunk)}\n\n"
+            await asyncio.sleep(token_latency)
+        if usage is not None:
+            chunk = {
+                "id": f"chatcmpl-stub-{call}",
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [],
+                "usage": usage,
+            }
+            yield f"data: {json.dumps(chunk)}\n\n"
+        yield "data: [DONE]\n\n"
+
+    return app
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--latency", type=float, default=0.0, help="seconds to wait before answering")
+    parser.add_argument("--token-latency", type=float, default=0.0, help="seconds between streamed tokens")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="share of calls answered with 429/5xx")
+    args = parser.parse_args()
+    uvicorn.run(create_app(args.latency, args.fail_rate, args.token_latency), host=args.host, port=args.port)